@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserGroup, UserGroupMembership, CustomRoutine, AdminActivity, VideoUploadSession, UserApprovalRequest, PasswordResetApproval, Video, RoutineVideo
+from .models import UserGroup, UserGroupMembership, CustomRoutine, AdminActivity, VideoUploadSession, UserApprovalRequest, PasswordResetApproval, Video, RoutineVideo, RoutineTemplate, RoutineTemplateVideo, MonthlyUserMetrics
 
 
 @admin.register(UserGroup)
@@ -52,6 +52,22 @@ class CustomRoutineAdmin(admin.ModelAdmin):
     )
 
 
+class RoutineTemplateVideoInline(admin.TabularInline):
+    model = RoutineTemplateVideo
+    extra = 0
+    ordering = ['order']
+    raw_id_fields = ['video']
+
+
+@admin.register(RoutineTemplate)
+class RoutineTemplateAdmin(admin.ModelAdmin):
+    list_display = ['title', 'group', 'weekday', 'start_date', 'end_date', 'is_active', 'created_by']
+    list_filter = ['is_active', 'weekday', 'group']
+    search_fields = ['title', 'description', 'group__name']
+    readonly_fields = ['created_at', 'updated_at']
+    inlines = [RoutineTemplateVideoInline]
+
+
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
     list_display = ['title', 'filename', 'get_duration_formatted', 'get_file_size_formatted', 'is_active', 'created_by', 'created_at']
@@ -190,3 +206,18 @@ class PasswordResetApprovalAdmin(admin.ModelAdmin):
             elif obj.status == 'rejected':
                 obj.reject(request.user, obj.notes)
         super().save_model(request, obj, form, change)
+
+
+@admin.register(MonthlyUserMetrics)
+class MonthlyUserMetricsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'year', 'month', 'exercise_count', 'workday_target', 'progress', 'current_streak', 'best_streak', 'is_closed', 'is_stale', 'computed_at']
+    list_filter = ['year', 'month', 'is_closed', 'is_stale']
+    search_fields = ['user__username', 'user__first_name', 'user__last_name', 'user__email']
+    ordering = ['-year', '-month', 'user__username']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # Las filas las escribe el comando snapshot_monthly_metrics
+        return False
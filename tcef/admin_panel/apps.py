@@ -5,3 +5,7 @@ class AdminPanelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admin_panel'
     verbose_name = 'Panel de Administración'
+
+    def ready(self):
+        # Registrar las señales que mantienen al día las métricas mensuales
+        from . import signals  # noqa: F401
@@ -0,0 +1,200 @@
+"""
+Contadores y listas del dashboard (y solicitudes pendientes de la barra de
+notificaciones) guardados en caché.
+
+Los contadores se ajustan con incrementos atómicos (``cache.incr``) desde
+las señales de ``admin_panel.signals`` al confirmar la transacción en que se
+crea, elimina o cambia de estado un registro, así que el dashboard no
+necesita contar tablas. Si una clave no está en caché se recalcula con un
+COUNT. Las claves expiran tras COUNTER_CACHE_TIMEOUT, así que un desvío (por
+ejemplo, tras un ``QuerySet.update()`` que no dispara señales y no invalida)
+dura como mucho ese tiempo; el comando ``reconcile_dashboard_counters`` lo
+corrige antes.
+
+Los valores solo son exactos si todos los workers ven los mismos incrementos,
+es decir, con una caché compartida (``settings.SHARED_CACHE``). Sin ella
+(locmem, una por proceso) contadores y listas no se guardan en caché: cada
+lectura hace el COUNT o la consulta.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+
+from app.models import UserProfile
+from .models import AdminActivity, CustomRoutine, PasswordResetApproval, RoutineTemplate, UserApprovalRequest, UserGroup
+
+
+_KEY_PREFIX = 'dashboard:'
+
+# Contador -> (modelo, campo, valor): cuenta las filas con ese valor en el campo,
+# o todas las filas si el campo es None
+COUNTERS = {
+    'total_users': (User, None, None),
+    'active_users': (UserProfile, 'is_approved', True),
+    'total_groups': (UserGroup, 'is_active', True),
+    'total_routines': (CustomRoutine, 'is_active', True),
+    'pending_password_resets': (PasswordResetApproval, 'status', 'pending'),
+    'pending_user_approvals': (UserApprovalRequest, 'status', 'pending'),
+}
+
+DASHBOARD_COUNTERS = ('total_users', 'active_users', 'total_groups', 'total_routines')
+NOTIFICATION_COUNTERS = ('pending_password_resets', 'pending_user_approvals')
+
+# Duración de los contadores en caché (las señales los ajustan mientras tanto)
+COUNTER_CACHE_TIMEOUT = 60 * 60
+
+# Duración de las listas del dashboard (las señales las invalidan antes)
+LIST_CACHE_TIMEOUT = 60 * 10
+
+
+def _key(name):
+    return f'{_KEY_PREFIX}{name}'
+
+
+def _cache_enabled():
+    return getattr(settings, 'SHARED_CACHE', False)
+
+
+def _changed_key(name):
+    return f'{_KEY_PREFIX}{name}:changed'
+
+
+def _mark_changed(names):
+    """Registra una escritura para que un COUNT en curso no se guarde"""
+    stamp = time.time_ns()
+    cache.set_many({_changed_key(name): stamp for name in names}, COUNTER_CACHE_TIMEOUT)
+
+
+def count_counter(name):
+    """Calcula el valor exacto de un contador con un COUNT"""
+    model, field, value = COUNTERS[name]
+    queryset = model.objects.all()
+    if field:
+        queryset = queryset.filter(**{field: value})
+    return queryset.count()
+
+
+def get_counters(names=DASHBOARD_COUNTERS):
+    """Contadores pedidos; solo cuenta en la base los que faltan en caché"""
+    if not _cache_enabled():
+        return {name: count_counter(name) for name in names}
+
+    keys = {name: _key(name) for name in names}
+    changed_keys = {name: _changed_key(name) for name in names}
+    cached = cache.get_many([*keys.values(), *changed_keys.values()])
+    counters = {}
+    missing = []
+    for name, key in keys.items():
+        if key in cached:
+            counters[name] = cached[key]
+        else:
+            counters[name] = count_counter(name)
+            # add() no pisa un valor que otra petición haya guardado mientras tanto
+            cache.add(key, counters[name], COUNTER_CACHE_TIMEOUT)
+            missing.append(name)
+    
+    if missing:
+        # Un incr entre el COUNT y el add() falla porque la clave aún no existe
+        # y su delta se perdería: si hubo escrituras, descartar lo guardado
+        changed = cache.get_many([changed_keys[name] for name in missing])
+        stale = [
+            name for name in missing
+            if changed.get(changed_keys[name]) != cached.get(changed_keys[name])
+        ]
+        if stale:
+            cache.delete_many([keys[name] for name in stale])
+    return counters
+
+
+def adjust_counter(name, delta):
+    """Suma ``delta`` al contador; si no está en caché se calculará al leerlo"""
+    if not delta:
+        return
+    # Antes del incr, para que un get_counters concurrente vea la escritura
+    _mark_changed([name])
+    try:
+        cache.incr(_key(name), delta)
+    except ValueError:
+        pass
+
+
+def invalidate_counters(*names):
+    """Descarta contadores para que se recalculen (tras operaciones masivas)"""
+    names = names or tuple(COUNTERS)
+    _mark_changed(names)
+    cache.delete_many([_key(name) for name in names])
+
+
+def reconcile_counters():
+    """Recalcula todos los contadores; retorna {nombre: (valor en caché, valor real)}"""
+    report = {}
+    for name in COUNTERS:
+        actual = count_counter(name)
+        report[name] = (cache.get(_key(name)), actual)
+        cache.set(_key(name), actual, COUNTER_CACHE_TIMEOUT)
+    return report
+
+
+def notification_counts():
+    """Solicitudes pendientes (desde caché) en el formato del contador de la barra"""
+    counts = get_counters(NOTIFICATION_COUNTERS)
+    return {
+        'total': counts['pending_password_resets'] + counts['pending_user_approvals'],
+        'password_reset': counts['pending_password_resets'],
+        'user_approval': counts['pending_user_approvals'],
+    }
+
+
+def _cached_list(name, build):
+    if not _cache_enabled():
+        return list(build())
+
+    key = _key(name)
+    value = cache.get(key)
+    if value is None:
+        value = list(build())
+        cache.set(key, value, LIST_CACHE_TIMEOUT)
+    return value
+
+
+def invalidate_lists(*names):
+    cache.delete_many([_key(name) for name in names])
+
+
+def recent_activities():
+    """Últimas 10 acciones administrativas"""
+    return _cached_list(
+        'recent_activities',
+        lambda: AdminActivity.objects.select_related('admin_user')[:10],
+    )
+
+
+def recent_users():
+    """Últimos 5 usuarios registrados"""
+    return _cached_list(
+        'recent_users',
+        lambda: User.objects.select_related('userprofile').order_by('-date_joined')[:5],
+    )
+
+
+def today_routines():
+    """Rutinas activas asignadas para hoy"""
+    today = timezone.now().date()
+    return _cached_list(
+        f'today_routines:{today.isoformat()}',
+        lambda: CustomRoutine.objects.filter(assigned_date=today, is_active=True).select_related('group'),
+    )
+
+
+def today_template_routines():
+    """Plantillas recurrentes que generan rutina hoy en grupos sin rutina explícita"""
+    today = timezone.now().date()
+    return _cached_list(f'today_template_routines:{today.isoformat()}', lambda: RoutineTemplate.for_day(today))
+
+
+def invalidate_today_routines():
+    today = timezone.now().date().isoformat()
+    invalidate_lists(f'today_routines:{today}', f'today_template_routines:{today}')
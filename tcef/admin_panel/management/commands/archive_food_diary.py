@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+from app.models import FoodDiary, FoodDiaryArchive
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las entradas antiguas del diario de alimentación a archivos comprimidos '
+        '(una fila por usuario y año). Cada (usuario, año) se procesa en su propia '
+        'transacción, por lo que el comando puede interrumpirse y volver a ejecutarse.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'FOOD_DIARY_ARCHIVE_DAYS', 180),
+            help='Archivar entradas con más de N días de antigüedad (por defecto FOOD_DIARY_ARCHIVE_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Número de pares (usuario, año) procesados por lote'
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=0,
+            help='Detenerse después de N lotes (0 = sin límite)'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.0,
+            help='Segundos de espera entre lotes'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra cuántas entradas se archivarían'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        batch_size = options['batch_size']
+        if days < 35:
+            # La interfaz del miembro muestra las últimas 5 semanas
+            raise CommandError('El horizonte debe ser de al menos 35 días.')
+        if batch_size < 1:
+            raise CommandError('--batch-size debe ser mayor que 0.')
+
+        cutoff = date.today() - timedelta(days=days)
+        pending = (
+            FoodDiary.objects.filter(meal_date__lt=cutoff)
+            .annotate(year=ExtractYear('meal_date'))
+            .values('user_id', 'year')
+            .annotate(entries=Count('id'))
+            .order_by('user_id', 'year')
+        )
+
+        if options['dry_run']:
+            units = list(pending)
+            total = sum(unit['entries'] for unit in units)
+            self.stdout.write(
+                self.style.WARNING(
+                    f'DRY-RUN: se archivarían {total} entradas anteriores a {cutoff} '
+                    f'en {len(units)} pares (usuario, año).'
+                )
+            )
+            return
+
+        archived_entries = 0
+        archived_units = 0
+        batches = 0
+        while True:
+            # Las unidades ya archivadas desaparecen de la consulta, así que cada
+            # lote continúa donde terminó el anterior (también tras una interrupción)
+            units = list(pending[:batch_size])
+            if not units:
+                break
+
+            for unit in units:
+                archived_entries += self._archive_unit(unit['user_id'], unit['year'], cutoff)
+                archived_units += 1
+
+            batches += 1
+            self.stdout.write(
+                f'Lote {batches}: {archived_units} pares (usuario, año), {archived_entries} entradas archivadas'
+            )
+            if options['max_batches'] and batches >= options['max_batches']:
+                self.stdout.write(self.style.WARNING('Límite de lotes alcanzado; vuelve a ejecutar para continuar.'))
+                break
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Proceso completado. {archived_entries} entradas anteriores a {cutoff} archivadas '
+                f'en {archived_units} pares (usuario, año).'
+            )
+        )
+
+    def _archive_unit(self, user_id, year, cutoff):
+        """Archiva las entradas de un usuario en un año; retorna cuántas se movieron"""
+        with transaction.atomic():
+            entries = list(
+                FoodDiary.objects.select_for_update()
+                .filter(user_id=user_id, meal_date__year=year, meal_date__lt=cutoff)
+                .order_by('meal_date', 'meal_time')
+            )
+            if not entries:
+                return 0
+
+            archive, _ = FoodDiaryArchive.objects.select_for_update().get_or_create(
+                user_id=user_id,
+                year=year,
+                defaults={'payload': b''},
+            )
+            archive.merge_entries([FoodDiaryArchive.serialize_entry(entry) for entry in entries])
+            archive.save()
+
+            FoodDiary.objects.filter(id__in=[entry.id for entry in entries]).delete()
+            return len(entries)
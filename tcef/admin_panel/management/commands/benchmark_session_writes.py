@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+
+# Configuraciones comparadas: nombre -> (SESSION_ENGINE, MESSAGE_STORAGE)
+CONFIGURATIONS = {
+    'db + session': (
+        'django.contrib.sessions.backends.db',
+        'django.contrib.messages.storage.session.SessionStorage',
+    ),
+    'db + fallback': (
+        'django.contrib.sessions.backends.db',
+        'django.contrib.messages.storage.fallback.FallbackStorage',
+    ),
+    'cached_db + fallback': (
+        'django.contrib.sessions.backends.cached_db',
+        'django.contrib.messages.storage.fallback.FallbackStorage',
+    ),
+    'signed_cookies + cookie': (
+        'django.contrib.sessions.backends.signed_cookies',
+        'django.contrib.messages.storage.cookie.CookieStorage',
+    ),
+}
+
+_BENCHMARK_PASSWORD = 'benchmark-session-writes'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide las escrituras en django_session por petición con cada configuración de '
+        'sesiones y mensajes: login, registro de una comida (mensaje + redirect) y las '
+        'páginas siguientes. Todo se ejecuta en una transacción que se revierte.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', type=str, help='Usuario para la prueba (por defecto el primero aprobado)')
+        parser.add_argument('--cycles', type=int, default=5, help='Comidas registradas por configuración')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True, userprofile__is_approved=True)
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No hay un usuario aprobado para la prueba.')
+
+        self.stdout.write(f'Usuario: {user.username}, {options["cycles"]} comidas por configuración\n')
+        self.stdout.write(f'{"Configuración":<26}{"Peticiones":>11}{"Escrituras sesión":>19}{"Por petición":>14}')
+        for name, (engine, storage) in CONFIGURATIONS.items():
+            requests, writes = self._measure(user, engine, storage, options['cycles'])
+            self.stdout.write(f'{name:<26}{requests:>11}{writes:>19}{writes / requests:>14.2f}')
+
+    def _measure(self, user, engine, storage, cycles):
+        with override_settings(SESSION_ENGINE=engine, MESSAGE_STORAGE=storage):
+            try:
+                with transaction.atomic():
+                    result = self._run_cycles(user, cycles)
+                    raise _Rollback
+            except _Rollback:
+                pass
+        return result
+
+    def _run_cycles(self, user, cycles):
+        # Contraseña conocida para pasar por el formulario de login (se revierte al final)
+        user.set_password(_BENCHMARK_PASSWORD)
+        user.save(update_fields=['password'])
+
+        client = Client(SERVER_NAME='localhost')
+        with CaptureQueriesContext(connection) as queries:
+            responses = [client.post(
+                reverse('login'), {'username': user.username, 'password': _BENCHMARK_PASSWORD, 'remember_me': 'on'},
+                follow=True,
+            )]
+            today = timezone.localdate()
+            for cycle in range(cycles):
+                responses.append(client.post(
+                    reverse('app:add_food_entry'),
+                    {
+                        'meal_date': (today - timedelta(days=cycle)).isoformat(),
+                        'meal_time': '23:59',
+                        'meal_type': 'snack',
+                        'description': 'Prueba de escrituras de sesión',
+                    },
+                    follow=True,
+                ))
+
+        requests = sum(len(response.redirect_chain) + 1 for response in responses)
+        writes = sum(
+            1 for query in queries.captured_queries
+            if 'django_session' in query['sql']
+            and query['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        )
+        return requests, writes
@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.member_import import MemberImportError, import_members, read_members_csv, validate_members
+from admin_panel.models import UserGroup
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa miembros desde un CSV (username, email, first_name, last_name, gender, '
+        'password, group, hipopresivos). Valida todo el archivo antes de escribir y crea '
+        'usuarios, perfiles, membresías y auditoría en una sola transacción.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='Ruta del archivo CSV')
+        parser.add_argument('--admin', type=str, required=True, help='Administrador que registra la importación')
+        parser.add_argument('--group', type=str, help='Grupo (nombre) para las filas sin grupo')
+        parser.add_argument('--workers', type=int, help='Procesos para hashear contraseñas (por defecto, uno por CPU)')
+        parser.add_argument('--dry-run', action='store_true', help='Solo validar el archivo')
+
+    def handle(self, *args, **options):
+        try:
+            admin_user = User.objects.get(username=options['admin'], is_staff=True)
+        except User.DoesNotExist:
+            raise CommandError(f'No existe el administrador {options["admin"]}.')
+
+        default_group = None
+        if options['group']:
+            default_group = UserGroup.objects.filter(name=options['group']).first()
+            if default_group is None:
+                raise CommandError(f'No existe el grupo {options["group"]}.')
+
+        try:
+            with open(options['csv_file'], encoding='utf-8-sig', newline='') as file:
+                rows = read_members_csv(file)
+            if options['dry_run']:
+                validate_members(rows, default_group)
+                self.stdout.write(self.style.SUCCESS(f'{len(rows)} filas válidas.'))
+                return
+
+            started = time.monotonic()
+            workers = options['workers'] or os.cpu_count() or 1
+            users = import_members(rows, admin_user, default_group, workers=workers)
+        except OSError as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+        except MemberImportError as e:
+            for line, message in e.errors:
+                self.stdout.write(self.style.WARNING(f'Línea {line}: {message}'))
+            raise CommandError(f'{e}; no se importó ningún miembro.')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(users)} miembros importados en {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from admin_panel.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula los contadores del dashboard guardados en caché y reporta los '
+        'desvíos. Pensado para ejecutarse periódicamente (cron).'
+    )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for name, (cached, actual) in reconcile_counters().items():
+            if cached is None:
+                self.stdout.write(f'{name}: {actual} (no estaba en caché)')
+            elif cached != actual:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'{name}: {cached} -> {actual}'))
+            else:
+                self.stdout.write(f'{name}: {actual}')
+
+        if drifted:
+            self.stdout.write(self.style.WARNING(f'{drifted} contadores corregidos.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Contadores al día.'))
@@ -0,0 +1,83 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_panel.models import MonthlyUserMetrics
+from admin_panel.monitoring import snapshot_month
+from app.calendar_utils import shift_month
+
+
+class Command(BaseCommand):
+    help = (
+        'Guarda las métricas mensuales de los usuarios en MonthlyUserMetrics. '
+        'Por defecto recalcula el mes abierto, los meses que quedaron abiertos en '
+        'la última ejecución y los marcados como desactualizados por registros tardíos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            type=str,
+            help='Recalcular completo un mes específico (formato YYYY-MM)'
+        )
+        parser.add_argument(
+            '--backfill-from',
+            type=str,
+            help='Recalcular todos los meses desde YYYY-MM hasta el actual'
+        )
+
+    def _parse_month(self, value):
+        try:
+            year, month = (int(part) for part in value.split('-'))
+            date(year, month, 1)
+        except ValueError:
+            raise CommandError(f'Mes inválido: {value}. Usa el formato YYYY-MM.')
+        return year, month
+
+    def handle(self, *args, **options):
+        today = date.today()
+        current = (today.year, today.month)
+
+        if options['month']:
+            year, month = self._parse_month(options['month'])
+            self._snapshot(year, month, today=today)
+            return
+
+        if options['backfill_from']:
+            period = self._parse_month(options['backfill_from'])
+            if period > current:
+                raise CommandError('El mes inicial no puede ser posterior al actual.')
+            while period <= current:
+                self._snapshot(*period, today=today)
+                period = shift_month(*period, 1)
+            return
+
+        # Mes abierto: siempre completo
+        self._snapshot(*current, today=today)
+
+        # Meses ya terminados que se calcularon mientras seguían abiertos
+        reopened = (
+            MonthlyUserMetrics.objects.filter(is_closed=False)
+            .exclude(year=today.year, month=today.month)
+            .values_list('year', 'month')
+            .distinct()
+        )
+        for year, month in reopened:
+            self._snapshot(year, month, today=today)
+
+        # Meses cerrados tocados por ediciones tardías: solo los usuarios afectados
+        stale = {}
+        for user_id, year, month in (
+            MonthlyUserMetrics.objects.filter(is_stale=True)
+            .values_list('user_id', 'year', 'month')
+        ):
+            stale.setdefault((year, month), []).append(user_id)
+        for (year, month), user_ids in sorted(stale.items()):
+            self._snapshot(year, month, user_ids=user_ids, today=today)
+
+        self.stdout.write(self.style.SUCCESS('Métricas mensuales actualizadas.'))
+
+    def _snapshot(self, year, month, user_ids=None, today=None):
+        written = snapshot_month(year, month, user_ids=user_ids, today=today)
+        scope = f'{len(user_ids)} usuarios' if user_ids is not None else 'todos los usuarios'
+        self.stdout.write(f'{year}-{month:02d} ({scope}): {written} filas')
@@ -0,0 +1,98 @@
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from admin_panel.models import VideoUploadSession
+from app.models import PasswordResetRequest
+
+
+# Evita que dos ejecuciones (p. ej. cron cada pocos minutos) se solapen; requiere un CACHE_URL compartido
+_LOCK_KEY = 'sweep_expired_data:lock'
+_LOCK_TIMEOUT = 60 * 30
+
+
+class Command(BaseCommand):
+    help = (
+        'Elimina por lotes las sesiones expiradas, las solicitudes de reseteo de contraseña '
+        'completadas o con el token vencido y las subidas de video abandonadas. Cada lote es '
+        'un rango de claves primarias con una pausa entre lotes; se puede ejecutar desde cron '
+        'cada pocos minutos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote (default: 1000)')
+        parser.add_argument('--sleep', type=float, default=0.2, help='Pausa entre lotes en segundos (default: 0.2)')
+        parser.add_argument(
+            '--max-batches', type=int, default=50,
+            help='Lotes como máximo por categoría en cada ejecución (default: 50)'
+        )
+        parser.add_argument(
+            '--reset-retention-days', type=int, default=30,
+            help='Días que se conservan las solicitudes de reseteo completadas o vencidas (default: 30)'
+        )
+        parser.add_argument(
+            '--upload-stale-hours', type=int, default=24,
+            help='Horas tras las que una subida en curso o fallida se considera abandonada (default: 24)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar lo que se eliminaría')
+
+    def handle(self, *args, **options):
+        if not options['dry_run'] and not cache.add(_LOCK_KEY, True, _LOCK_TIMEOUT):
+            self.stdout.write(self.style.WARNING('Otra ejecución sigue en curso; no se hace nada.'))
+            return
+
+        try:
+            now = timezone.now()
+            reset_cutoff = now - timedelta(days=options['reset_retention_days'])
+            categories = [
+                ('Sesiones expiradas', Session.objects.filter(expire_date__lt=now)),
+                ('Solicitudes de reseteo', PasswordResetRequest.objects.filter(
+                    Q(status='completed', completed_at__lt=reset_cutoff)
+                    | Q(status='approved', token_expires_at__lt=reset_cutoff)
+                )),
+                ('Subidas de video abandonadas', VideoUploadSession.objects.filter(
+                    status__in=['uploading', 'failed'],
+                    started_at__lt=now - timedelta(hours=options['upload_stale_hours']),
+                )),
+            ]
+
+            total = 0
+            for label, queryset in categories:
+                deleted = self._sweep(queryset, options)
+                total += deleted
+                verb = 'por eliminar' if options['dry_run'] else 'eliminadas'
+                self.stdout.write(f'{label}: {deleted} {verb}')
+        finally:
+            if not options['dry_run']:
+                cache.delete(_LOCK_KEY)
+
+        self.stdout.write(self.style.SUCCESS(f'Barrido terminado: {total} filas.'))
+
+    def _sweep(self, queryset, options):
+        """Elimina las filas del queryset por rangos de pk; retorna cuántas eliminó"""
+        if options['dry_run']:
+            return queryset.count()
+
+        deleted = 0
+        last_pk = None
+        for _ in range(options['max_batches']):
+            batch = queryset.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+
+            # El rango acota el DELETE aunque entren filas nuevas mientras tanto
+            _, per_model = queryset.filter(pk__gte=pks[0], pk__lte=pks[-1]).delete()
+            deleted += per_model.get(queryset.model._meta.label, 0)
+            last_pk = pks[-1]
+            if len(pks) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+        return deleted
@@ -0,0 +1,285 @@
+"""
+Importación masiva de miembros desde un CSV.
+
+Todas las filas se validan antes de escribir nada, con consultas por
+conjunto (usernames y emails existentes, grupos por nombre) en lugar de una
+por fila. Usuarios, perfiles, membresías y registros de auditoría se
+insertan con ``bulk_create`` en una sola transacción.
+
+Hashear cada contraseña (PBKDF2) toma una fracción de segundo. El comando
+``import_members`` las hashea en paralelo en un ``ProcessPoolExecutor``; la
+vista del panel las hashea en serie dentro del worker web y por eso acepta
+como mucho WEB_MAX_ROWS filas.
+
+Columnas: username, email, first_name, last_name, gender (M/F), password,
+group (nombre o id, opcional) y hipopresivos (si/no, opcional). Una
+contraseña vacía crea al usuario sin contraseña utilizable; podrá pedir un
+reseteo desde el login.
+"""
+import csv
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from app.models import UserProfile
+from . import counters
+from .models import AdminActivity, UserGroup, UserGroupMembership
+
+
+IMPORT_COLUMNS = ('username', 'email', 'first_name', 'last_name', 'gender', 'password', 'group', 'hipopresivos')
+REQUIRED_COLUMNS = ('username', 'email', 'gender')
+MIN_PASSWORD_LENGTH = 8
+
+# Por debajo de este número de contraseñas no vale la pena levantar procesos
+PARALLEL_HASH_THRESHOLD = 20
+
+# Filas por importación desde la vista web: el hash en serie debe terminar
+# antes del timeout de los workers; archivos más grandes van por el comando
+WEB_MAX_ROWS = 50
+
+BULK_BATCH_SIZE = 500
+
+_TRUE_VALUES = {'1', 'si', 'sí', 'true', 'x', 'yes'}
+
+
+class MemberImportError(Exception):
+    """El CSV tiene errores; ``errors`` es una lista de (línea, mensaje)"""
+
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} errores en el archivo')
+        self.errors = errors
+
+
+def read_members_csv(file):
+    """Filas del CSV como diccionarios, con el número de línea en ``line``"""
+    if isinstance(file, bytes):
+        file = io.StringIO(file.decode('utf-8-sig'))
+    reader = csv.DictReader(file)
+    if reader.fieldnames is None:
+        raise MemberImportError([(1, 'El archivo está vacío.')])
+
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+    if missing:
+        raise MemberImportError([(1, f'Faltan columnas: {", ".join(missing)}')])
+
+    rows = []
+    for row in reader:
+        cleaned = {column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS}
+        cleaned['line'] = reader.line_num
+        rows.append(cleaned)
+    return rows
+
+
+def _resolve_groups(rows, default_group=None):
+    """Grupo de cada fila (por nombre o id) con una sola consulta"""
+    keys = {row['group'] for row in rows if row['group']}
+    groups_by_key = {}
+    if keys:
+        ids = [int(key) for key in keys if key.isdigit()]
+        for group in UserGroup.objects.filter(Q(name__in=keys) | Q(pk__in=ids)):
+            groups_by_key[group.name.lower()] = group
+            groups_by_key[str(group.pk)] = group
+    return {
+        row['line']: groups_by_key.get(row['group'].lower()) if row['group'] else default_group
+        for row in rows
+    }
+
+
+def _field_errors(field_name, value):
+    """Mensajes de los validadores del campo de User (formato y longitud máxima)"""
+    if not value:
+        return []
+    try:
+        User._meta.get_field(field_name).run_validators(value)
+    except ValidationError as e:
+        return e.messages
+    return []
+
+
+def validate_members(rows, default_group=None):
+    """
+    Valida todas las filas; retorna {línea: grupo} o lanza MemberImportError.
+
+    Los duplicados (dentro del archivo y contra la base) se detectan con
+    conjuntos y dos consultas, sin importar cuántas filas haya.
+    """
+    errors = []
+    if not rows:
+        raise MemberImportError([(1, 'El archivo no tiene filas.')])
+
+    usernames = [row['username'].lower() for row in rows]
+    emails = [row['email'].lower() for row in rows]
+    # Sin distinguir mayúsculas, igual que el login (índices sobre LOWER())
+    existing_usernames = set(
+        User.objects.annotate(username_lower=Lower('username'))
+        .filter(username_lower__in=usernames)
+        .values_list('username_lower', flat=True)
+    )
+    existing_emails = set(
+        User.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=emails)
+        .values_list('email_lower', flat=True)
+    ) if emails else set()
+    groups = _resolve_groups(rows, default_group)
+
+    seen_usernames, seen_emails = set(), set()
+    for row in rows:
+        line, username, email = row['line'], row['username'], row['email'].lower()
+
+        username_errors = _field_errors('username', username)
+        if not username:
+            errors.append((line, 'El nombre de usuario es requerido.'))
+        elif username_errors:
+            errors.append((line, f'El usuario {username} no es válido: {" ".join(username_errors)}'))
+        elif username.lower() in existing_usernames:
+            errors.append((line, f'El usuario {username} ya existe.'))
+        elif username.lower() in seen_usernames:
+            errors.append((line, f'El usuario {username} está repetido en el archivo.'))
+        seen_usernames.add(username.lower())
+
+        if not email:
+            errors.append((line, 'El email es requerido.'))
+        else:
+            email_errors = _field_errors('email', row['email'])
+            if email_errors:
+                errors.append((line, f'El email {row["email"]} no es válido: {" ".join(email_errors)}'))
+            if email in existing_emails:
+                errors.append((line, f'El email {row["email"]} ya está registrado.'))
+            elif email in seen_emails:
+                errors.append((line, f'El email {row["email"]} está repetido en el archivo.'))
+            seen_emails.add(email)
+
+        for field_name in ('first_name', 'last_name'):
+            for message in _field_errors(field_name, row[field_name]):
+                errors.append((line, f'{User._meta.get_field(field_name).verbose_name.capitalize()}: {message}'))
+
+        if row['gender'].upper() not in ('M', 'F'):
+            errors.append((line, 'El género debe ser M o F.'))
+        if row['password'] and len(row['password']) < MIN_PASSWORD_LENGTH:
+            errors.append((line, f'La contraseña debe tener al menos {MIN_PASSWORD_LENGTH} caracteres.'))
+        if row['group'] and groups[line] is None:
+            errors.append((line, f'El grupo {row["group"]} no existe.'))
+
+    if errors:
+        raise MemberImportError(errors)
+    return groups
+
+
+def hash_passwords(passwords, workers=1):
+    """
+    Hashea las contraseñas; las vacías quedan como no utilizables.
+
+    Con ``workers`` > 1 usa un pool de procesos. Solo el comando
+    ``import_members`` lo pide: un pool creado desde un worker web lo
+    bifurcaría con sus conexiones y hilos.
+    """
+    if len(passwords) < PARALLEL_HASH_THRESHOLD or workers <= 1:
+        return [make_password(password or None) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (workers * 4))
+    # django.setup() en cada proceso para cuando no se heredan los settings (spawn)
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+        return list(executor.map(make_password, [password or None for password in passwords], chunksize=chunksize))
+
+
+def import_members(rows, admin_user, default_group=None, workers=1):
+    """
+    Valida e importa las filas; retorna los usuarios creados.
+
+    Lanza MemberImportError sin escribir nada si alguna fila es inválida,
+    también si otra petición crea el mismo usuario o email entre la
+    validación y la inserción.
+    """
+    groups = validate_members(rows, default_group)
+    hashes = hash_passwords([row['password'] for row in rows], workers)
+    now = timezone.now()
+
+    try:
+        users = _create_members(rows, hashes, groups, admin_user, now)
+    except IntegrityError:
+        raise MemberImportError([
+            (1, 'Otro usuario con el mismo nombre o email se registró durante la importación; '
+                'vuelve a validar el archivo.'),
+        ])
+
+    # bulk_create no dispara las señales que mantienen los contadores del dashboard
+    transaction.on_commit(_invalidate_dashboard)
+    return users
+
+
+def _create_members(rows, hashes, groups, admin_user, now):
+    """Inserta usuarios, perfiles, membresías y auditoría en una transacción"""
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=row['username'],
+                    email=row['email'],
+                    first_name=row['first_name'],
+                    last_name=row['last_name'],
+                    password=password_hash,
+                    is_active=True,
+                    date_joined=now,
+                )
+                for row, password_hash in zip(rows, hashes)
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        if users and users[0].pk is None:
+            # La base no retorna los ids insertados
+            ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'pk'))
+            for user in users:
+                user.pk = ids[user.username]
+
+        UserProfile.objects.bulk_create(
+            [
+                UserProfile(
+                    user=user,
+                    is_approved=True,  # Los usuarios creados por admin están aprobados
+                    approval_date=now,
+                    approved_by=admin_user,
+                    terms_accepted=True,
+                    terms_accepted_date=now,
+                    gender=row['gender'].upper(),
+                    hipopresivos=row['hipopresivos'].lower() in _TRUE_VALUES,
+                )
+                for row, user in zip(rows, users)
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        UserGroupMembership.objects.bulk_create(
+            [
+                UserGroupMembership(user=user, group=groups[row['line']])
+                for row, user in zip(rows, users)
+                if groups[row['line']] is not None
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        AdminActivity.objects.bulk_create(
+            [
+                AdminActivity(
+                    admin_user=admin_user,
+                    action='user_created',
+                    target_model='User',
+                    target_id=user.pk,
+                    details=f'Usuario creado: {user.username} (importación CSV)',
+                )
+                for user in users
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+    return users
+
+
+def _invalidate_dashboard():
+    counters.invalidate_counters('total_users', 'active_users')
+    counters.invalidate_lists('recent_users', 'recent_activities')
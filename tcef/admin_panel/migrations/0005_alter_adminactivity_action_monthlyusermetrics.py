@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0004_alter_usergroupmembership_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adminactivity',
+            name='action',
+            field=models.CharField(choices=[('user_created', 'Usuario Creado'), ('user_updated', 'Usuario Actualizado'), ('user_deleted', 'Usuario Eliminado'), ('group_created', 'Grupo Creado'), ('group_updated', 'Grupo Actualizado'), ('group_deleted', 'Grupo Eliminado'), ('routine_created', 'Rutina Creada'), ('routine_updated', 'Rutina Actualizada'), ('routine_deleted', 'Rutina Eliminada'), ('video_uploaded', 'Video Subido'), ('video_deleted', 'Video Eliminado'), ('pwd_reset_approved', 'Reseteo Aprobado'), ('pwd_reset_rejected', 'Reseteo Rechazado')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='MonthlyUserMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('exercise_count', models.PositiveIntegerField(default=0)),
+                ('workday_target', models.PositiveSmallIntegerField(default=0, help_text='Días laborables del mes')),
+                ('progress', models.FloatField(default=0, help_text='Porcentaje de días laborables cubiertos (máx. 100)')),
+                ('current_streak', models.PositiveIntegerField(default=0, help_text='Racha de semanas al cierre del mes')),
+                ('best_streak', models.PositiveIntegerField(default=0, help_text='Mejor racha de semanas al cierre del mes')),
+                ('latest_weight', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('latest_bmi', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('latest_body_fat', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('latest_muscle', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('latest_ica', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('is_closed', models.BooleanField(default=False, help_text='El mes ya terminó cuando se calculó')),
+                ('is_stale', models.BooleanField(default=False, help_text='Un registro tardío cambió los datos del mes')),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_metrics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Métricas Mensuales de Usuario',
+                'verbose_name_plural': 'Métricas Mensuales de Usuarios',
+                'ordering': ['-year', '-month', 'user'],
+                'indexes': [models.Index(fields=['year', 'month'], name='monthly_metrics_period_idx'), models.Index(fields=['is_stale'], name='monthly_metrics_stale_idx')],
+                'unique_together': {('user', 'year', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_requested_at(apps, schema_editor):
+    PasswordResetApproval = apps.get_model('admin_panel', 'PasswordResetApproval')
+    PasswordResetRequest = apps.get_model('app', 'PasswordResetRequest')
+    PasswordResetApproval.objects.update(
+        requested_at=Subquery(
+            PasswordResetRequest.objects.filter(pk=OuterRef('reset_request_id')).values('requested_at')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0005_alter_adminactivity_action_monthlyusermetrics'),
+        ('app', '0011_fooddiaryarchive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Estado de Lectura de Notificaciones',
+                'verbose_name_plural': 'Estados de Lectura de Notificaciones',
+            },
+        ),
+        migrations.AddField(
+            model_name='passwordresetapproval',
+            name='requested_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Copia de la fecha de la solicitud de reseteo'),
+        ),
+        migrations.RunPython(copy_requested_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='passwordresetapproval',
+            index=models.Index(fields=['status', 'requested_at'], name='reset_approval_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userapprovalrequest',
+            index=models.Index(fields=['status', 'requested_at'], name='user_approval_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='notificationreadstate',
+            name='admin_user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_read_state', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
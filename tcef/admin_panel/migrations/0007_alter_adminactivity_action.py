@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0006_notification_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adminactivity',
+            name='action',
+            field=models.CharField(choices=[('user_created', 'Usuario Creado'), ('user_updated', 'Usuario Actualizado'), ('user_deleted', 'Usuario Eliminado'), ('group_created', 'Grupo Creado'), ('group_updated', 'Grupo Actualizado'), ('group_deleted', 'Grupo Eliminado'), ('routine_created', 'Rutina Creada'), ('routine_updated', 'Rutina Actualizada'), ('routine_deleted', 'Rutina Eliminada'), ('video_uploaded', 'Video Subido'), ('video_deleted', 'Video Eliminado'), ('pwd_reset_approved', 'Reseteo Aprobado'), ('pwd_reset_rejected', 'Reseteo Rechazado'), ('user_approved', 'Usuario Aprobado'), ('user_rejected', 'Usuario Rechazado')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0007_alter_adminactivity_action'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutineTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], help_text='Día de la semana en que se repite')),
+                ('start_date', models.DateField(help_text='Primera fecha en que aplica')),
+                ('end_date', models.DateField(blank=True, help_text='Última fecha en que aplica (vacío: sin fin)', null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_routine_templates', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routine_templates', to='admin_panel.usergroup')),
+            ],
+            options={
+                'verbose_name': 'Plantilla de Rutina',
+                'verbose_name_plural': 'Plantillas de Rutina',
+                'ordering': ['group', 'weekday', 'start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RoutineTemplateVideo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField(help_text='Orden del video en la rutina (1, 2, 3, etc.)')),
+                ('notes', models.TextField(blank=True, help_text='Notas específicas para este video en la rutina')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='template_videos', to='admin_panel.routinetemplate')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='template_assignments', to='admin_panel.video')),
+            ],
+            options={
+                'verbose_name': 'Video de Plantilla',
+                'verbose_name_plural': 'Videos de Plantilla',
+                'ordering': ['order'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='routinetemplate',
+            index=models.Index(fields=['group', 'is_active', 'start_date'], name='routine_template_group_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='routinetemplatevideo',
+            unique_together={('template', 'order')},
+        ),
+    ]
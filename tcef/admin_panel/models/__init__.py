@@ -3,20 +3,25 @@ Módulos de modelos organizados por dominio.
 Este archivo mantiene la compatibilidad con las importaciones existentes.
 """
 from .groups import UserGroup, UserGroupMembership
-from .routines import CustomRoutine, RoutineVideo
+from .routines import CustomRoutine, RoutineVideo, RoutineTemplate, RoutineTemplateVideo
 from .videos import Video, VideoUploadSession
-from .approvals import UserApprovalRequest, PasswordResetApproval
+from .approvals import UserApprovalRequest, PasswordResetApproval, NotificationReadState
 from .audit import AdminActivity
+from .metrics import MonthlyUserMetrics
 
 __all__ = [
     'UserGroup',
     'UserGroupMembership',
     'CustomRoutine',
     'RoutineVideo',
+    'RoutineTemplate',
+    'RoutineTemplateVideo',
     'Video',
     'VideoUploadSession',
     'UserApprovalRequest',
     'PasswordResetApproval',
+    'NotificationReadState',
     'AdminActivity',
+    'MonthlyUserMetrics',
 ]
 
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from app.models import UserProfile
+from .audit import AdminActivity
+
 
 class UserApprovalRequest(models.Model):
     """Solicitud de aprobación de usuario nuevo"""
@@ -22,6 +25,9 @@ class UserApprovalRequest(models.Model):
         verbose_name = 'Solicitud de Aprobación de Usuario'
         verbose_name_plural = 'Solicitudes de Aprobación de Usuarios'
         ordering = ['-requested_at']
+        indexes = [
+            models.Index(fields=['status', 'requested_at'], name='user_approval_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.get_status_display()}"
@@ -52,6 +58,65 @@ class UserApprovalRequest(models.Model):
         self.notes = notes
         self.save()
 
+    @classmethod
+    def bulk_approve(cls, request_ids, admin_user, notes=""):
+        """
+        Aprueba varias solicitudes pendientes a la vez.
+
+        Equivale a ``approve()`` por solicitud, pero con tres UPDATE en una
+        transacción (solicitudes, usuarios y perfiles) que también registra
+        la auditoría. No dispara señales.
+        Retorna [(id de solicitud, id de usuario, username)] de las aprobadas.
+        """
+        with transaction.atomic():
+            reviewed = cls._lock_pending(request_ids)
+            if reviewed:
+                now = timezone.now()
+                user_ids = [user_id for _, user_id, _ in reviewed]
+                cls.objects.filter(pk__in=[pk for pk, _, _ in reviewed]).update(
+                    status='approved', reviewed_at=now, reviewed_by=admin_user, notes=notes
+                )
+                User.objects.filter(pk__in=user_ids).update(is_active=True)
+                UserProfile.objects.filter(user_id__in=user_ids).update(
+                    is_approved=True, approval_date=now, approved_by=admin_user
+                )
+                cls._log_reviews(reviewed, admin_user, 'user_approved', 'aprobado')
+        return reviewed
+
+    @classmethod
+    def bulk_reject(cls, request_ids, admin_user, notes=""):
+        """Rechaza varias solicitudes pendientes con un UPDATE; retorna lo mismo que ``bulk_approve``"""
+        with transaction.atomic():
+            reviewed = cls._lock_pending(request_ids)
+            if reviewed:
+                cls.objects.filter(pk__in=[pk for pk, _, _ in reviewed]).update(
+                    status='rejected', reviewed_at=timezone.now(), reviewed_by=admin_user, notes=notes
+                )
+                cls._log_reviews(reviewed, admin_user, 'user_rejected', 'rechazado')
+        return reviewed
+
+    @staticmethod
+    def _log_reviews(reviewed, admin_user, action, verb):
+        AdminActivity.objects.bulk_create([
+            AdminActivity(
+                admin_user=admin_user,
+                action=action,
+                target_model='User',
+                target_id=user_id,
+                details=f'Usuario {verb}: {username}',
+            )
+            for _, user_id, username in reviewed
+        ])
+
+    @classmethod
+    def _lock_pending(cls, request_ids):
+        # Bloquear las solicitudes para que otro admin no las revise a la vez
+        return list(
+            cls.objects.select_for_update(of=('self',))
+            .filter(pk__in=request_ids, status='pending')
+            .values_list('pk', 'user_id', 'user__username')
+        )
+
 
 class PasswordResetApproval(models.Model):
     """Aprobación de reseteo de contraseña por admin"""
@@ -63,6 +128,7 @@ class PasswordResetApproval(models.Model):
     
     reset_request = models.OneToOneField('app.PasswordResetRequest', on_delete=models.CASCADE, related_name='admin_approval')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    requested_at = models.DateTimeField(default=timezone.now, help_text="Copia de la fecha de la solicitud de reseteo")
     reviewed_at = models.DateTimeField(null=True, blank=True)
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_resets')
     notes = models.TextField(blank=True, help_text="Notas del administrador")
@@ -71,6 +137,9 @@ class PasswordResetApproval(models.Model):
         verbose_name = 'Aprobación de Reseteo de Contraseña'
         verbose_name_plural = 'Aprobaciones de Reseteo de Contraseña'
         ordering = ['-reviewed_at']
+        indexes = [
+            models.Index(fields=['status', 'requested_at'], name='reset_approval_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.reset_request.user.username} - {self.get_status_display()}"
@@ -97,3 +166,31 @@ class PasswordResetApproval(models.Model):
         # Rechazar la solicitud de reseteo
         self.reset_request.reject_request(admin_user, notes)
 
+
+
+class NotificationReadState(models.Model):
+    """Hasta dónde leyó cada administrador las notificaciones pendientes"""
+    admin_user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_read_state')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Estado de Lectura de Notificaciones'
+        verbose_name_plural = 'Estados de Lectura de Notificaciones'
+
+    def __str__(self):
+        return f"{self.admin_user.username} - {self.last_read_at}"
+
+    @classmethod
+    def last_read(cls, admin_user):
+        """Fecha de la última lectura del administrador (None si nunca leyó)"""
+        return cls.objects.filter(admin_user=admin_user).values_list('last_read_at', flat=True).first()
+
+    @classmethod
+    def mark_read(cls, admin_user, until=None):
+        """Marca como leídas las notificaciones solicitadas hasta ``until``"""
+        until = until or timezone.now()
+        state, created = cls.objects.get_or_create(admin_user=admin_user, defaults={'last_read_at': until})
+        if not created and (state.last_read_at is None or state.last_read_at < until):
+            state.last_read_at = until
+            state.save(update_fields=['last_read_at'])
+        return state
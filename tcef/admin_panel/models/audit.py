@@ -18,6 +18,8 @@ class AdminActivity(models.Model):
         ('video_deleted', 'Video Eliminado'),
         ('pwd_reset_approved', 'Reseteo Aprobado'),
         ('pwd_reset_rejected', 'Reseteo Rechazado'),
+        ('user_approved', 'Usuario Aprobado'),
+        ('user_rejected', 'Usuario Rechazado'),
     ]
 
     admin_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='admin_activities')
@@ -0,0 +1,66 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+
+class MonthlyUserMetrics(models.Model):
+    """
+    Fotografía mensual de las métricas de monitoreo de un usuario.
+
+    La llena el comando ``snapshot_monthly_metrics``: el mes abierto se
+    recalcula en cada ejecución y los meses cerrados solo cuando un registro
+    tardío los marca como desactualizados (ver ``admin_panel.signals``).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_metrics')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    exercise_count = models.PositiveIntegerField(default=0)
+    workday_target = models.PositiveSmallIntegerField(default=0, help_text='Días laborables del mes')
+    progress = models.FloatField(default=0, help_text='Porcentaje de días laborables cubiertos (máx. 100)')
+    current_streak = models.PositiveIntegerField(default=0, help_text='Racha de semanas al cierre del mes')
+    best_streak = models.PositiveIntegerField(default=0, help_text='Mejor racha de semanas al cierre del mes')
+    latest_weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    latest_bmi = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    latest_body_fat = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    latest_muscle = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    latest_ica = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    is_closed = models.BooleanField(default=False, help_text='El mes ya terminó cuando se calculó')
+    is_stale = models.BooleanField(default=False, help_text='Un registro tardío cambió los datos del mes')
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Métricas Mensuales de Usuario'
+        verbose_name_plural = 'Métricas Mensuales de Usuarios'
+        unique_together = ['user', 'year', 'month']
+        ordering = ['-year', '-month', 'user']
+        indexes = [
+            models.Index(fields=['year', 'month'], name='monthly_metrics_period_idx'),
+            models.Index(fields=['is_stale'], name='monthly_metrics_stale_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.year}/{self.month:02d} ({self.progress:.1f}%)"
+
+    @classmethod
+    def mark_stale(cls, user_id, date_obj):
+        """
+        Marca como desactualizados los meses del usuario desde la fecha indicada.
+
+        Las rachas y las últimas medidas de un mes dependen de todo lo anterior,
+        por lo que un cambio afecta a su mes y a todos los siguientes.
+        """
+        return cls.objects.filter(
+            models.Q(year__gt=date_obj.year) | models.Q(year=date_obj.year, month__gte=date_obj.month),
+            user_id=user_id,
+            is_stale=False,
+        ).update(is_stale=True)
+
+    @classmethod
+    def get_range(cls, start_year, start_month, end_year, end_month, users=None):
+        """Métricas de un rango de meses (inclusive) para comparar mes a mes"""
+        queryset = cls.objects.filter(
+            models.Q(year__gt=start_year) | models.Q(year=start_year, month__gte=start_month),
+            models.Q(year__lt=end_year) | models.Q(year=end_year, month__lte=end_month),
+        )
+        if users is not None:
+            queryset = queryset.filter(user__in=users)
+        return queryset.order_by('user', 'year', 'month')
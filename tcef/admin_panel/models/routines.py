@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from collections import defaultdict
 from datetime import date
 
 
@@ -47,6 +48,55 @@ class CustomRoutine(models.Model):
         """Retorna los videos ordenados por el campo order"""
         return self.routine_videos.select_related('video').order_by('order')
 
+    def set_videos(self, videos):
+        """
+        Deja la rutina con ``videos`` en ese orden (1, 2, 3, ...) aplicando solo
+        la diferencia: inserta los nuevos, elimina los que ya no están y
+        renumera el resto. Las filas que se conservan mantienen sus notas y su
+        fecha de creación. Debe llamarse dentro de una transacción.
+        """
+        _sync_ordered_videos(
+            self.routine_videos, videos,
+            lambda video, order: RoutineVideo(routine=self, video=video, order=order),
+        )
+
+
+def _sync_ordered_videos(related_manager, videos, build):
+    """Aplica a ``related_manager`` la diferencia con la lista ordenada ``videos``"""
+    model = related_manager.model
+    existing = list(related_manager.order_by('order'))
+    rows_by_video = defaultdict(list)
+    for row in existing:
+        rows_by_video[row.video_id].append(row)
+
+    moved, to_create = [], []
+    for order, video in enumerate(videos, 1):
+        rows = rows_by_video.get(video.pk)
+        if rows:
+            row = rows.pop(0)
+            if row.order != order:
+                moved.append((row, order))
+        else:
+            to_create.append(build(video, order))
+
+    to_delete = [row.pk for rows in rows_by_video.values() for row in rows]
+    if to_delete:
+        model.objects.filter(pk__in=to_delete).delete()
+
+    if moved:
+        # Dos fases por unique_together (padre, order): primero a órdenes
+        # temporales fuera de ambos rangos, después a los definitivos
+        offset = max([len(videos)] + [row.order for row in existing])
+        for index, (row, _) in enumerate(moved, 1):
+            row.order = offset + index
+        model.objects.bulk_update([row for row, _ in moved], ['order'])
+        for row, order in moved:
+            row.order = order
+        model.objects.bulk_update([row for row, _ in moved], ['order'])
+
+    if to_create:
+        model.objects.bulk_create(to_create)
+
 
 class RoutineVideo(models.Model):
     """Relación entre rutinas y videos con orden específico"""
@@ -65,3 +115,95 @@ class RoutineVideo(models.Model):
     def __str__(self):
         return f"{self.routine.title} - Video {self.order}: {self.video.title}"
 
+
+
+class RoutineTemplate(models.Model):
+    """
+    Rutina recurrente: se repite cada semana en un día para un grupo, sin
+    crear una fila por fecha. Una CustomRoutine del mismo grupo y fecha la
+    reemplaza ese día (si está inactiva, ese día no hay rutina).
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    group = models.ForeignKey('admin_panel.UserGroup', on_delete=models.CASCADE, related_name='routine_templates')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES, help_text='Día de la semana en que se repite')
+    start_date = models.DateField(help_text='Primera fecha en que aplica')
+    end_date = models.DateField(blank=True, null=True, help_text='Última fecha en que aplica (vacío: sin fin)')
+    is_active = models.BooleanField(default=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_routine_templates')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Plantilla de Rutina'
+        verbose_name_plural = 'Plantillas de Rutina'
+        ordering = ['group', 'weekday', 'start_date']
+        indexes = [
+            models.Index(fields=['group', 'is_active', 'start_date'], name='routine_template_group_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} - {self.group.name} - {self.get_weekday_display()}"
+
+    def applies_on(self, day):
+        """True si la plantilla genera rutina en la fecha ``day``"""
+        return (
+            day.weekday() == self.weekday
+            and self.start_date <= day
+            and (self.end_date is None or day <= self.end_date)
+        )
+
+    def get_videos_ordered(self):
+        """Retorna los videos ordenados por el campo order"""
+        return self.template_videos.select_related('video').order_by('order')
+
+    @classmethod
+    def for_day(cls, day):
+        """Plantillas que generan rutina en ``day``, una por grupo sin CustomRoutine ese día"""
+        templates = (
+            cls.objects
+            .filter(is_active=True, weekday=day.weekday(), start_date__lte=day)
+            .filter(models.Q(end_date__isnull=True) | models.Q(end_date__gte=day))
+            .exclude(group__routines__assigned_date=day)
+            .select_related('group')
+            .order_by('group__name', '-start_date', 'pk')
+        )
+        by_group = {}
+        for template in templates:
+            by_group.setdefault(template.group_id, template)
+        return list(by_group.values())
+
+    def set_videos(self, videos):
+        """Igual que ``CustomRoutine.set_videos``; debe llamarse dentro de una transacción"""
+        _sync_ordered_videos(
+            self.template_videos, videos,
+            lambda video, order: RoutineTemplateVideo(template=self, video=video, order=order),
+        )
+
+
+class RoutineTemplateVideo(models.Model):
+    """Videos de una plantilla de rutina, con orden específico"""
+    template = models.ForeignKey(RoutineTemplate, on_delete=models.CASCADE, related_name='template_videos')
+    video = models.ForeignKey('admin_panel.Video', on_delete=models.CASCADE, related_name='template_assignments')
+    order = models.PositiveIntegerField(help_text='Orden del video en la rutina (1, 2, 3, etc.)')
+    notes = models.TextField(blank=True, help_text='Notas específicas para este video en la rutina')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Video de Plantilla'
+        verbose_name_plural = 'Videos de Plantilla'
+        unique_together = ['template', 'order']
+        ordering = ['order']
+
+    def __str__(self):
+        return f"{self.template.title} - Video {self.order}: {self.video.title}"
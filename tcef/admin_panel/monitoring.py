@@ -0,0 +1,294 @@
+"""
+Métricas de monitoreo de usuarios calculadas con consultas agregadas.
+
+``monitoring_queryset`` anota sobre un único queryset de usuarios los
+ejercicios del mes, el progreso mensual y las últimas medidas corporales,
+y ``attach_streaks`` completa las rachas semanales con una sola consulta
+adicional, sin importar cuántos usuarios haya.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db.models import Count, F, FilteredRelation, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat, Least, Lower
+
+from app.calendar_utils import month_bounds, workdays_in_month
+from app.models import BodyCompositionHistory, BodyMeasurements, ExerciseLog
+from .models import MonthlyUserMetrics, UserGroupMembership
+
+
+# Filas por página de la tabla de monitoreo
+MONITORING_PAGE_SIZE = 50
+
+# Usuarios leídos por lote al exportar (una consulta de rachas por lote)
+EXPORT_CHUNK_SIZE = 2000
+
+# Ordenamientos disponibles: clave -> (campo anotado, descendente)
+MONITORING_SORTS = {
+    'progress': ('monthly_progress', True),
+    'exercises': ('exercise_count', True),
+    'name': ('sort_name', False),
+}
+DEFAULT_MONITORING_SORT = 'progress'
+
+_CURSOR_SALT = 'admin_panel.monitoring.cursor'
+
+
+def monitoring_queryset(year, month, as_of=None):
+    """
+    Usuarios aprobados anotados con las métricas del mes indicado.
+
+    Con ``as_of`` las últimas medidas corporales se toman hasta esa fecha.
+    """
+    start_date, end_date = month_bounds(year, month)
+    workdays = workdays_in_month(year, month) or 1
+
+    latest_measurement = BodyMeasurements.objects.filter(user=OuterRef('pk'))
+    latest_composition = BodyCompositionHistory.objects.filter(user=OuterRef('pk'))
+    if as_of is not None:
+        latest_measurement = latest_measurement.filter(measurement_date__lte=as_of)
+        latest_composition = latest_composition.filter(measurement_date__lte=as_of)
+    latest_measurement = latest_measurement.order_by('-measurement_date')
+    latest_composition = latest_composition.order_by('-measurement_date')
+
+    return (
+        User.objects.filter(userprofile__is_approved=True)
+        .only('id', 'username', 'first_name', 'last_name', 'email')
+        .annotate(
+            # El rango del mes va en la condición del JOIN para usar el índice (user, exercise_date)
+            month_logs=FilteredRelation(
+                'exercise_logs',
+                condition=Q(
+                    exercise_logs__exercise_date__gte=start_date,
+                    exercise_logs__exercise_date__lte=end_date,
+                ),
+            ),
+        )
+        .annotate(
+            exercise_count=Count('month_logs'),
+            latest_weight=Subquery(latest_measurement.values('weight')[:1]),
+            latest_height=Subquery(latest_measurement.values('height')[:1]),
+            latest_body_fat=Subquery(latest_composition.values('body_fat_percentage')[:1]),
+            latest_muscle=Subquery(latest_composition.values('muscle_mass')[:1]),
+            latest_ica=Subquery(latest_composition.values('ica')[:1]),
+        )
+        .annotate(
+            monthly_progress=Least(
+                Cast(F('exercise_count'), FloatField()) * Value(100.0) / Value(float(workdays)),
+                Value(100.0),
+            ),
+        )
+    )
+
+
+def _bmi(weight, height):
+    """IMC con la misma fórmula que BodyMeasurements.bmi"""
+    if weight is None or not height:
+        return None
+    height_m = Decimal(height) / 100
+    return round(Decimal(weight) / (height_m ** 2), 2)
+
+
+def attach_streaks(users):
+    """Agrega current_streak y best_streak a cada usuario con una sola consulta"""
+    users = list(users)
+    streaks = ExerciseLog.get_week_streaks([user.pk for user in users]) if users else {}
+    for user in users:
+        user.current_streak, user.best_streak = streaks.get(user.pk, (0, 0))
+    return users
+
+
+def build_user_metrics(users):
+    """Convierte los usuarios anotados en las filas que usa la tabla de monitoreo"""
+    return [
+        {
+            'user': user,
+            'exercise_count': user.exercise_count,
+            'current_streak': user.current_streak,
+            'best_streak': user.best_streak,
+            'monthly_progress': round(user.monthly_progress or 0, 1),
+            'latest_weight': user.latest_weight,
+            'latest_bmi': _bmi(user.latest_weight, user.latest_height),
+            'latest_body_fat': user.latest_body_fat,
+            'latest_muscle': user.latest_muscle,
+            'latest_ica': user.latest_ica,
+        }
+        for user in attach_streaks(users)
+    ]
+
+
+def iter_user_metrics(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Genera las filas de ``build_user_metrics`` leyendo el queryset por lotes
+    con ``.iterator()``, de modo que la memoria no crece con el número de usuarios.
+    """
+    queryset = queryset.annotate(
+        group_name=Subquery(
+            UserGroupMembership.objects.filter(user=OuterRef('pk'), is_active=True)
+            .values('group__name')[:1]
+        ),
+    )
+    batch = []
+    for user in queryset.iterator(chunk_size=chunk_size):
+        batch.append(user)
+        if len(batch) >= chunk_size:
+            yield from build_user_metrics(batch)
+            batch = []
+    if batch:
+        yield from build_user_metrics(batch)
+
+
+def snapshot_month(year, month, user_ids=None, today=None):
+    """
+    Calcula y guarda las métricas del mes en ``MonthlyUserMetrics``.
+
+    Usa las mismas consultas agregadas que la tabla de monitoreo, con las
+    rachas y medidas al cierre del mes (o hasta hoy si el mes sigue abierto).
+    Retorna el número de filas escritas.
+    """
+    if today is None:
+        today = date.today()
+    start_date, end_date = month_bounds(year, month)
+    as_of = min(end_date, today)
+
+    users = monitoring_queryset(year, month, as_of=as_of)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    users = list(users)
+    if not users:
+        return 0
+    streaks = ExerciseLog.get_week_streaks([user.pk for user in users], today=as_of)
+
+    workdays = workdays_in_month(year, month)
+    is_closed = end_date < today
+    rows = []
+    for user in users:
+        current_streak, best_streak = streaks.get(user.pk, (0, 0))
+        rows.append(MonthlyUserMetrics(
+            user_id=user.pk,
+            year=year,
+            month=month,
+            exercise_count=user.exercise_count,
+            workday_target=workdays,
+            progress=round(user.monthly_progress or 0, 1),
+            current_streak=current_streak,
+            best_streak=best_streak,
+            latest_weight=user.latest_weight,
+            latest_bmi=_bmi(user.latest_weight, user.latest_height),
+            latest_body_fat=user.latest_body_fat,
+            latest_muscle=user.latest_muscle,
+            latest_ica=user.latest_ica,
+            is_closed=is_closed,
+            is_stale=False,
+        ))
+
+    # Un único INSERT ... ON CONFLICT DO UPDATE por mes
+    MonthlyUserMetrics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'year', 'month'],
+        update_fields=[
+            'exercise_count', 'workday_target', 'progress', 'current_streak',
+            'best_streak', 'latest_weight', 'latest_bmi', 'latest_body_fat',
+            'latest_muscle', 'latest_ica', 'is_closed', 'is_stale', 'computed_at',
+        ],
+    )
+    return len(rows)
+
+
+def _parse_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_monitoring_filters(params):
+    """Lee los filtros y el orden de la tabla desde request.GET"""
+    sort = params.get('sort', DEFAULT_MONITORING_SORT)
+    if sort not in MONITORING_SORTS:
+        sort = DEFAULT_MONITORING_SORT
+    group = params.get('group', '')
+    return {
+        'q': params.get('q', '').strip(),
+        'group': group if group.isdigit() else '',
+        'gender': params.get('gender', '') if params.get('gender') in ('M', 'F') else '',
+        'hipopresivos': params.get('hipopresivos', '') if params.get('hipopresivos') in ('1', '0') else '',
+        'min_progress': _parse_float(params.get('min_progress')),
+        'max_progress': _parse_float(params.get('max_progress')),
+        'sort': sort,
+    }
+
+
+def filter_monitoring_queryset(queryset, filters):
+    """Aplica búsqueda, grupo, sexo, hipopresivos y rango de adherencia en SQL"""
+    if filters['q']:
+        term = filters['q']
+        queryset = queryset.filter(
+            Q(username__icontains=term)
+            | Q(first_name__icontains=term)
+            | Q(last_name__icontains=term)
+            | Q(email__icontains=term)
+        )
+    if filters['group']:
+        queryset = queryset.filter(
+            group_membership__group_id=filters['group'],
+            group_membership__is_active=True,
+        )
+    if filters['gender']:
+        queryset = queryset.filter(userprofile__gender=filters['gender'])
+    if filters['hipopresivos']:
+        queryset = queryset.filter(userprofile__hipopresivos=filters['hipopresivos'] == '1')
+    # El progreso es un agregado, así que estos filtros terminan en el HAVING
+    if filters['min_progress'] is not None:
+        queryset = queryset.filter(monthly_progress__gte=filters['min_progress'])
+    if filters['max_progress'] is not None:
+        queryset = queryset.filter(monthly_progress__lte=filters['max_progress'])
+    return queryset
+
+
+def encode_cursor(value, pk):
+    """Cursor firmado con el último (valor de orden, id) de una página"""
+    return signing.dumps([value, pk], salt=_CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor):
+    """Retorna (valor, id) del cursor o None si falta o fue alterado"""
+    if not cursor:
+        return None
+    try:
+        value, pk = signing.loads(cursor, salt=_CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return value, pk
+
+
+def monitoring_page(queryset, sort, cursor=None, page_size=MONITORING_PAGE_SIZE):
+    """
+    Retorna (usuarios, siguiente cursor) de una página ordenada por ``sort``.
+
+    El id desempata valores iguales, así que (clave, id) identifica cada fila
+    y la página siguiente empieza justo después de la última mostrada.
+    """
+    field, descending = MONITORING_SORTS[sort]
+    if field == 'sort_name':
+        queryset = queryset.annotate(
+            sort_name=Lower(Concat('first_name', Value(' '), 'last_name', Value(' '), 'username')),
+        )
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        value, pk = position
+        lookup = f'{field}__lt' if descending else f'{field}__gt'
+        queryset = queryset.filter(Q(**{lookup: value}) | Q(**{field: value, 'id__gt': pk}))
+
+    order = f'-{field}' if descending else field
+    users = list(queryset.order_by(order, 'id')[:page_size + 1])
+    next_cursor = None
+    if len(users) > page_size:
+        users = users[:page_size]
+        last = users[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return users, next_cursor
@@ -0,0 +1,134 @@
+"""
+Feed incremental de las solicitudes pendientes (reseteos de contraseña y
+aprobaciones de usuarios).
+
+Cada lista se recorre por (requested_at, id) usando el índice
+(status, requested_at) de su modelo: el cliente guarda la posición del
+elemento más nuevo que ya tiene (``since_ts``/``since_id``) y solo pide lo
+que llegó después, además de los ids resueltos desde su última consulta.
+La página de notificaciones pagina hacia atrás con ``before_ts``/``before_id``.
+"""
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import PasswordResetApproval, UserApprovalRequest
+
+
+# Solicitudes por página en la página de notificaciones
+FEED_PAGE_SIZE = 20
+
+# Máximo de solicitudes nuevas por consulta incremental
+FEED_MAX_ITEMS = 100
+
+FEED_KINDS = ('password_reset', 'user_approval')
+
+
+def _base_queryset(kind):
+    if kind == 'password_reset':
+        return PasswordResetApproval.objects.select_related('reset_request__user')
+    return UserApprovalRequest.objects.select_related('user')
+
+
+def _request_user(kind, approval):
+    return approval.reset_request.user if kind == 'password_reset' else approval.user
+
+
+def parse_timestamp(value):
+    """Fecha ISO 8601 de un parámetro (None si viene vacío); ValueError si es inválida"""
+    if not value:
+        return None
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValueError(f'Fecha inválida: {value}')
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def parse_feed_cursor(params, prefix):
+    """
+    Lee el cursor ``<prefix>_ts``/``<prefix>_id`` de los parámetros.
+
+    Retorna (fecha, id), None si no viene, o lanza ValueError si es inválido.
+    """
+    timestamp = parse_timestamp(params.get(f'{prefix}_ts'))
+    if timestamp is None:
+        return None
+    return timestamp, int(params.get(f'{prefix}_id') or 0)
+
+
+def feed_cursor(approval):
+    """Posición de una solicitud en el feed"""
+    return {'ts': approval.requested_at.isoformat(), 'id': approval.pk}
+
+
+def serialize_item(kind, approval, last_read_at=None):
+    user = _request_user(kind, approval)
+    return {
+        'kind': kind,
+        'id': approval.pk,
+        'username': user.username,
+        'full_name': user.get_full_name(),
+        'email': user.email,
+        'requested_at': approval.requested_at.isoformat(),
+        'unread': is_unread(approval, last_read_at),
+    }
+
+
+def is_unread(approval, last_read_at):
+    return last_read_at is None or approval.requested_at > last_read_at
+
+
+def pending_page(kind, before=None, page_size=FEED_PAGE_SIZE):
+    """
+    Página de solicitudes pendientes, de la más nueva a la más antigua.
+
+    Retorna (solicitudes, cursor de la página siguiente o None).
+    """
+    queryset = _base_queryset(kind).filter(status='pending')
+    if before is not None:
+        timestamp, pk = before
+        queryset = queryset.filter(Q(requested_at__lt=timestamp) | Q(requested_at=timestamp, pk__lt=pk))
+    approvals = list(queryset.order_by('-requested_at', '-pk')[:page_size + 1])
+    if len(approvals) > page_size:
+        approvals = approvals[:page_size]
+        return approvals, feed_cursor(approvals[-1])
+    return approvals, None
+
+
+def pending_since(kind, since, limit=FEED_MAX_ITEMS):
+    """
+    Solicitudes pendientes posteriores a ``since``, de la más antigua a la más nueva.
+
+    Retorna (solicitudes, hay_más); con hay_más el cliente vuelve a pedir
+    desde la última recibida.
+    """
+    queryset = _base_queryset(kind).filter(status='pending')
+    if since is not None:
+        timestamp, pk = since
+        queryset = queryset.filter(Q(requested_at__gt=timestamp) | Q(requested_at=timestamp, pk__gt=pk))
+    approvals = list(queryset.order_by('requested_at', 'pk')[:limit + 1])
+    return approvals[:limit], len(approvals) > limit
+
+
+def resolved_since(kind, checked_at):
+    """Ids de solicitudes aprobadas o rechazadas después de ``checked_at``"""
+    model = PasswordResetApproval if kind == 'password_reset' else UserApprovalRequest
+    return list(
+        model.objects.filter(reviewed_at__gte=checked_at)
+        .exclude(status='pending')
+        .values_list('pk', flat=True)
+    )
+
+
+def unread_counts(last_read_at):
+    """Solicitudes pendientes que el administrador aún no vio, por tipo"""
+    counts = {}
+    for kind in FEED_KINDS:
+        queryset = _base_queryset(kind).filter(status='pending')
+        if last_read_at is not None:
+            queryset = queryset.filter(requested_at__gt=last_read_at)
+        counts[kind] = queryset.count()
+    counts['total'] = sum(counts[kind] for kind in FEED_KINDS)
+    return counts
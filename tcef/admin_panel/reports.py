@@ -0,0 +1,248 @@
+"""
+Reportes agregados del panel de administración.
+
+Los reportes se calculan con consultas agrupadas en la base de datos y se
+guardan en caché por (grupo, rango de fechas), de modo que abrirlos de nuevo
+durante una sesión de revisión no vuelve a consultar las tablas grandes.
+"""
+from datetime import timedelta
+import statistics
+
+from django.core.cache import cache
+from django.db.models import Count, DateField, ExpressionWrapper, F
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+
+from app.calendar_utils import iso_week, week_start
+from app.models import ExerciseLog, FoodDiary
+from .models import UserGroupMembership
+
+
+# Duración de la caché de reportes (segundos)
+REPORT_CACHE_TIMEOUT = 60 * 10
+
+# Rango máximo de días permitido en un reporte
+MAX_REPORT_DAYS = 186
+
+# Comidas principales que cuentan para un día completo
+MAIN_MEAL_TYPES = ('desayuno', 'almuerzo', 'cena')
+
+# Semanas por defecto y máximas del reporte de adherencia
+DEFAULT_ADHERENCE_WEEKS = 12
+MAX_ADHERENCE_WEEKS = 52
+
+# Semanas desde el ingreso al grupo que cubre la curva de abandono
+DROPOFF_WEEKS = 12
+
+
+def clamp_report_range(start_date, end_date):
+    """Ordena el rango y lo limita a MAX_REPORT_DAYS días"""
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    if (end_date - start_date).days >= MAX_REPORT_DAYS:
+        start_date = end_date - timedelta(days=MAX_REPORT_DAYS - 1)
+    return start_date, end_date
+
+
+def _group_members(group):
+    """Miembros activos del grupo ordenados por nombre (una consulta)"""
+    return list(
+        UserGroupMembership.objects.filter(group=group, is_active=True)
+        .order_by('user__first_name', 'user__last_name', 'user__username')
+        .values(
+            'user_id', 'user__username', 'user__first_name',
+            'user__last_name', 'user__email',
+        )
+    )
+
+
+def food_compliance_matrix(group, start_date, end_date):
+    """
+    Matriz (usuario × día × tipo de comida) del diario de alimentación de un grupo.
+
+    Se calcula con un único GROUP BY sobre FoodDiary filtrado por la membresía
+    del grupo y se guarda en caché por (grupo, rango).
+    """
+    start_date, end_date = clamp_report_range(start_date, end_date)
+    cache_key = f'reports:food_compliance:{group.id}:{start_date:%Y%m%d}:{end_date:%Y%m%d}'
+    report = cache.get(cache_key)
+    if report is not None:
+        return report
+
+    meal_types = [meal_type for meal_type, _ in FoodDiary.MEAL_TYPE_CHOICES]
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    day_index = {day: index for index, day in enumerate(days)}
+    meal_index = {meal_type: index for index, meal_type in enumerate(meal_types)}
+
+    members = _group_members(group)
+    counts = {member['user_id']: [[0] * len(meal_types) for _ in days] for member in members}
+
+    rows = (
+        FoodDiary.objects.filter(
+            user__group_membership__group=group,
+            user__group_membership__is_active=True,
+            meal_date__gte=start_date,
+            meal_date__lte=end_date,
+        )
+        .values('user_id', 'meal_date', 'meal_type')
+        .annotate(entries=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        user_cells = counts.get(row['user_id'])
+        if user_cells is None or row['meal_type'] not in meal_index:
+            continue
+        user_cells[day_index[row['meal_date']]][meal_index[row['meal_type']]] = row['entries']
+
+    main_indexes = [meal_index[meal_type] for meal_type in MAIN_MEAL_TYPES]
+    member_rows = []
+    for member in members:
+        cells = [tuple(cell) for cell in counts[member['user_id']]]
+        logged_days = sum(1 for cell in cells if any(cell))
+        complete_days = sum(1 for cell in cells if all(cell[i] for i in main_indexes))
+        full_name = f"{member['user__first_name']} {member['user__last_name']}".strip()
+        member_rows.append({
+            'user_id': member['user_id'],
+            'name': full_name or member['user__username'],
+            'username': member['user__username'],
+            'email': member['user__email'],
+            'cells': cells,
+            'logged_days': logged_days,
+            'complete_days': complete_days,
+            'compliance': round(complete_days / len(days) * 100, 1) if days else 0,
+        })
+
+    report = {
+        'group_id': group.id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'days': days,
+        'meal_types': meal_types,
+        'members': member_rows,
+    }
+    cache.set(cache_key, report, REPORT_CACHE_TIMEOUT)
+    return report
+
+
+def _share(part, total):
+    return round(part / total * 100, 1) if total else 0
+
+
+def _sessions_by_week(logs):
+    """{(user_id, lunes): sesiones} con un único GROUP BY por usuario y semana"""
+    rows = (
+        logs.annotate(week=TruncWeek('exercise_date'))
+        .values('user_id', 'week')
+        .annotate(sessions=Count('id'))
+        .order_by()
+    )
+    sessions = {}
+    for row in rows:
+        week = row['week']
+        if hasattr(week, 'date'):
+            week = week.date()
+        sessions[(row['user_id'], week)] = row['sessions']
+    return sessions
+
+
+def group_adherence(group, first_week, last_week):
+    """
+    Adherencia semanal de un grupo entre dos semanas (lunes, inclusive).
+
+    Por semana: miembros que ya pertenecían al grupo, porcentaje que llegó a
+    la meta de rutinas, miembros con al menos una sesión y mediana de
+    sesiones (contando ceros). Además, la curva de abandono: para cada semana
+    desde el ingreso, qué porcentaje de los miembros sigue entrenando.
+
+    Cada serie sale de un GROUP BY (usuario, semana) sobre ExerciseLog unido
+    a las membresías, y el resultado se guarda en caché por (grupo, rango).
+    """
+    cache_key = f'reports:group_adherence:{group.id}:{first_week:%Y%m%d}:{last_week:%Y%m%d}'
+    report = cache.get(cache_key)
+    if report is not None:
+        return report
+
+    target = ExerciseLog.STREAK_WEEK_TARGET
+    today_week = week_start(timezone.localdate())
+    joined_weeks = {
+        member['user_id']: week_start(timezone.localtime(member['joined_at']).date())
+        for member in UserGroupMembership.objects.filter(group=group, is_active=True)
+        .values('user_id', 'joined_at')
+    }
+    group_logs = ExerciseLog.objects.filter(
+        user__group_membership__group=group,
+        user__group_membership__is_active=True,
+    )
+
+    # Serie semanal en el rango pedido
+    sessions = _sessions_by_week(
+        group_logs.filter(
+            exercise_date__gte=first_week,
+            exercise_date__lte=last_week + timedelta(days=6),
+        )
+    )
+    weeks = []
+    week = first_week
+    while week <= last_week:
+        counts = [
+            sessions.get((user_id, week), 0)
+            for user_id, joined_week in joined_weeks.items()
+            if joined_week <= week
+        ]
+        on_target = sum(1 for count in counts if count >= target)
+        active = sum(1 for count in counts if count)
+        iso_year, week_number = iso_week(week)
+        weeks.append({
+            'week_start': week,
+            'week_end': week + timedelta(days=6),
+            'iso_year': iso_year,
+            'week_number': week_number,
+            'members': len(counts),
+            'on_target': on_target,
+            'active': active,
+            'adherence': _share(on_target, len(counts)),
+            'active_share': _share(active, len(counts)),
+            'median_sessions': statistics.median(counts) if counts else 0,
+        })
+        week += timedelta(weeks=1)
+
+    # Curva de abandono: sesiones en las primeras semanas de cada miembro
+    joined_date = TruncDate('user__group_membership__joined_at')
+    dropoff_sessions = _sessions_by_week(
+        group_logs.filter(
+            exercise_date__gte=joined_date,
+            exercise_date__lt=ExpressionWrapper(
+                joined_date + timedelta(weeks=DROPOFF_WEEKS + 1), output_field=DateField()
+            ),
+        )
+    )
+    dropoff = []
+    for offset in range(DROPOFF_WEEKS + 1):
+        # Solo cuentan los miembros que ya cumplieron esa semana desde su ingreso
+        eligible = [
+            user_id for user_id, joined_week in joined_weeks.items()
+            if joined_week + timedelta(weeks=offset) <= today_week
+        ]
+        counts = [
+            dropoff_sessions.get((user_id, joined_weeks[user_id] + timedelta(weeks=offset)), 0)
+            for user_id in eligible
+        ]
+        dropoff.append({
+            'offset': offset,
+            'members': len(eligible),
+            'active_share': _share(sum(1 for count in counts if count), len(eligible)),
+            'on_target_share': _share(sum(1 for count in counts if count >= target), len(eligible)),
+        })
+
+    report = {
+        'group_id': group.id,
+        'first_week': first_week,
+        'last_week': last_week,
+        'last_week_end': last_week + timedelta(days=6),
+        'target': target,
+        'member_count': len(joined_weeks),
+        'weeks': weeks,
+        'dropoff': dropoff,
+    }
+    cache.set(cache_key, report, REPORT_CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,79 @@
+"""
+Fragmento HTML del modal de detalles de una rutina.
+
+Se renderiza desde ``admin_panel/routine_details.html`` con la rutina, su
+grupo, su autor y sus videos cargados de una vez, y se guarda en caché junto
+con las versiones con que se generó: la de la rutina (cambia al editarla o al
+cambiar sus videos) y la del catálogo (cambia al editar videos, grupos o
+usuarios). Las señales de ``admin_panel.signals`` actualizan esas versiones. El
+fragmento y las versiones se leen con un solo ``get_many``, así que abrir
+varias veces la misma rutina cuesta una consulta a la caché.
+
+Solo se usa la caché si es compartida (``SHARED_CACHE``): con la caché local
+de cada worker, un cambio solo actualizaría la versión del worker que lo
+atendió y los demás seguirían sirviendo el fragmento anterior.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+
+from .models import CustomRoutine, RoutineVideo
+
+
+# Duración del fragmento en caché (las versiones lo invalidan antes)
+DETAILS_CACHE_TIMEOUT = 60 * 60
+
+_CATALOG_VERSION_KEY = 'routine_details:catalog_version'
+
+
+def _fragment_key(routine_id):
+    return f'routine_details:{routine_id}:html'
+
+
+def _version_key(routine_id):
+    return f'routine_details:{routine_id}:version'
+
+
+def touch_routine_details(routine_id):
+    """Registra un cambio de la rutina o de sus videos"""
+    cache.set(_version_key(routine_id), time.time_ns(), None)
+
+
+def touch_routine_catalog():
+    """Registra un cambio en videos, grupos o usuarios, que aparecen en todas las rutinas"""
+    cache.set(_CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def details_context(routine_id):
+    """Rutina con grupo, autor y videos precargados; lanza CustomRoutine.DoesNotExist"""
+    routine = (
+        CustomRoutine.objects.select_related('group', 'created_by')
+        .prefetch_related(Prefetch('routine_videos', queryset=RoutineVideo.objects.select_related('video')))
+        .get(pk=routine_id)
+    )
+    routine_videos = list(routine.routine_videos.all())
+    total_seconds = sum(routine_video.video.duration for routine_video in routine_videos)
+    return {
+        'routine': routine,
+        'routine_videos': routine_videos,
+        'total_duration': f"{total_seconds // 60}:{total_seconds % 60:02d}",
+    }
+
+
+def render_routine_details(routine_id):
+    """HTML del modal, leído de la caché cuando las versiones coinciden"""
+    if not getattr(settings, 'SHARED_CACHE', False):
+        return render_to_string('admin_panel/routine_details.html', details_context(routine_id))
+
+    fragment_key, version_key = _fragment_key(routine_id), _version_key(routine_id)
+    cached = cache.get_many([fragment_key, version_key, _CATALOG_VERSION_KEY])
+    versions = (cached.get(version_key, 0), cached.get(_CATALOG_VERSION_KEY, 0))
+    if fragment_key in cached and cached[fragment_key][0] == versions:
+        return cached[fragment_key][1]
+
+    html = render_to_string('admin_panel/routine_details.html', details_context(routine_id))
+    cache.set(fragment_key, (versions, html), DETAILS_CACHE_TIMEOUT)
+    return html
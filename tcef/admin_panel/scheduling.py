@@ -0,0 +1,464 @@
+"""
+Programación de rutinas: replicación y rutinas recurrentes.
+
+``plan_replication`` carga los grupos de destino y los pares (grupo, fecha)
+que ya tienen rutina con dos consultas, sin importar cuántas combinaciones se
+pidan. ``replicate_routine`` crea las rutinas y todos sus videos con dos
+``bulk_create`` en una sola transacción. El plan sirve también como vista
+previa: indica qué se creará y qué se saltará por conflicto.
+
+``clone_schedule`` copia la programación de un grupo en un rango de fechas a
+otro grupo, desplazada un número de días. En PostgreSQL usa
+``INSERT ... SELECT`` con ``ON CONFLICT DO NOTHING`` (dos sentencias en
+total); en otras bases, ``bulk_create``.
+
+Las plantillas (``RoutineTemplate``) se guardan una vez y se expanden al
+leer: ``resolve_schedule`` combina la expansión de las plantillas del grupo,
+cacheada por (grupo, mes), con las CustomRoutine explícitas del rango, que
+reemplazan a la plantilla en su fecha. La expansión solo se guarda en caché
+si es compartida entre workers (``settings.SHARED_CACHE``); en otro caso se
+calcula en cada lectura con una consulta.
+"""
+import calendar
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+
+from . import counters
+from .models import AdminActivity, CustomRoutine, RoutineTemplate, RoutineVideo, UserGroup
+
+
+BULK_BATCH_SIZE = 500
+
+# Rango máximo de fechas que se puede clonar de una vez
+MAX_CLONE_DAYS = 366
+
+# La expansión de plantillas por (grupo, mes) se invalida cambiando la versión
+TEMPLATE_CACHE_TIMEOUT = 60 * 60 * 24
+_TEMPLATES_VERSION_KEY = 'routine_templates:version'
+
+
+def parse_dates(values):
+    """Fechas ``YYYY-MM-DD`` sin repetir y ordenadas; retorna (fechas, inválidas)"""
+    dates, invalid = set(), []
+    for value in values:
+        try:
+            dates.add(datetime.strptime(value, '%Y-%m-%d').date())
+        except (TypeError, ValueError):
+            invalid.append(value)
+    return sorted(dates), invalid
+
+
+class ReplicationPlan:
+    """Combinaciones (grupo, fecha) a crear y las que ya tienen rutina"""
+
+    def __init__(self, routine, groups, dates, existing):
+        self.routine = routine
+        self.groups = groups
+        self.dates = dates
+        self.to_create = []
+        self.conflicts = []
+        for group in groups:
+            for assigned_date in dates:
+                if (group.pk, assigned_date) in existing:
+                    self.conflicts.append((group, assigned_date))
+                else:
+                    self.to_create.append((group, assigned_date))
+
+    @property
+    def total(self):
+        return len(self.groups) * len(self.dates)
+
+
+def plan_replication(routine, group_ids, dates):
+    """Plan de replicación; los IDs de grupos inexistentes se ignoran"""
+    ids = {int(group_id) for group_id in group_ids if str(group_id).isdigit()}
+    groups = list(UserGroup.objects.filter(pk__in=ids).order_by('name')) if ids else []
+    existing = set()
+    if groups and dates:
+        # Cubre el producto cruzado; lo que sobre no coincide con ninguna combinación
+        existing = set(
+            CustomRoutine.objects.filter(group__in=groups, assigned_date__in=dates)
+            .values_list('group_id', 'assigned_date')
+        )
+    return ReplicationPlan(routine, groups, dates, existing)
+
+
+def replicate_routine(plan, admin_user):
+    """
+    Crea las rutinas del plan con los videos (orden y notas) de la original;
+    retorna las rutinas creadas.
+
+    Si otra petición crea una rutina para el mismo grupo y fecha después de
+    armar el plan, el IntegrityError revierte toda la replicación.
+    """
+    routine = plan.routine
+    if not plan.to_create:
+        return []
+
+    source_videos = list(routine.routine_videos.order_by('order').values_list('video_id', 'order', 'notes'))
+
+    with transaction.atomic():
+        new_routines = CustomRoutine.objects.bulk_create(
+            [
+                CustomRoutine(
+                    title=f"{routine.title} (Replicada)",
+                    description=routine.description,
+                    group=group,
+                    assigned_date=assigned_date,
+                    created_by=admin_user,
+                )
+                for group, assigned_date in plan.to_create
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        _ensure_ids(new_routines)
+
+        RoutineVideo.objects.bulk_create(
+            [
+                RoutineVideo(routine=new_routine, video_id=video_id, order=order, notes=notes)
+                for new_routine in new_routines
+                for video_id, order, notes in source_videos
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        AdminActivity.objects.create(
+            admin_user=admin_user,
+            action='routine_replicated',
+            target_model='CustomRoutine',
+            target_id=routine.id,
+            details=f'Rutina replicada {len(new_routines)} veces: {routine.title}'
+        )
+
+        # bulk_create no dispara las señales que mantienen los contadores del dashboard
+        transaction.on_commit(_invalidate_dashboard)
+    return new_routines
+
+
+def _ensure_ids(new_routines):
+    """Completa los ids tras ``bulk_create`` cuando la base no los retorna"""
+    if new_routines[0].pk is not None:
+        return
+    ids = {
+        (group_id, assigned_date): pk
+        for pk, group_id, assigned_date in CustomRoutine.objects.filter(
+            group_id__in={routine.group_id for routine in new_routines},
+            assigned_date__in={routine.assigned_date for routine in new_routines},
+        ).values_list('pk', 'group_id', 'assigned_date')
+    }
+    for new_routine in new_routines:
+        new_routine.pk = ids[(new_routine.group_id, new_routine.assigned_date)]
+
+
+class ScheduleClonePlan:
+    """Rutinas del grupo origen en el rango y las fechas ya ocupadas en el destino"""
+
+    def __init__(self, source_group, target_group, start_date, end_date, offset_days, routines, taken_dates):
+        self.source_group = source_group
+        self.target_group = target_group
+        self.start_date = start_date
+        self.end_date = end_date
+        self.offset_days = offset_days
+        self.to_create = []
+        self.conflicts = []
+        for routine in routines:
+            routine['target_date'] = routine['assigned_date'] + timedelta(days=offset_days)
+            if routine['target_date'] in taken_dates:
+                self.conflicts.append(routine)
+            else:
+                self.to_create.append(routine)
+
+
+def plan_schedule_clone(source_group, target_group, start_date, end_date, offset_days):
+    """Plan de clonación con dos consultas: rutinas de origen y fechas ocupadas en el destino"""
+    routines = list(
+        CustomRoutine.objects.filter(
+            group=source_group, assigned_date__gte=start_date, assigned_date__lte=end_date,
+        ).order_by('assigned_date').values('pk', 'title', 'description', 'assigned_date', 'is_active')
+    )
+    offset = timedelta(days=offset_days)
+    taken_dates = set(
+        CustomRoutine.objects.filter(
+            group=target_group, assigned_date__gte=start_date + offset, assigned_date__lte=end_date + offset,
+        ).values_list('assigned_date', flat=True)
+    ) if routines else set()
+    return ScheduleClonePlan(source_group, target_group, start_date, end_date, offset_days, routines, taken_dates)
+
+
+def clone_schedule(plan, admin_user):
+    """
+    Copia las rutinas del plan (con sus videos) al grupo destino en una
+    transacción; retorna cuántas rutinas creó. Las fechas que ya tienen
+    rutina en el destino se saltan.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            created = _clone_with_insert_select(plan, admin_user)
+        else:
+            created = _clone_with_bulk_create(plan, admin_user)
+
+        if created:
+            AdminActivity.objects.create(
+                admin_user=admin_user,
+                action='routine_replicated',
+                target_model='UserGroup',
+                target_id=plan.target_group.pk,
+                details=(
+                    f'Programación clonada: {created} rutinas de {plan.source_group.name} '
+                    f'({plan.start_date:%d/%m/%Y} - {plan.end_date:%d/%m/%Y}) a {plan.target_group.name}, '
+                    f'{plan.offset_days:+d} días'
+                )
+            )
+            # Los INSERT directos y bulk_create no disparan señales
+            transaction.on_commit(_invalidate_dashboard)
+    return created
+
+
+def _clone_with_insert_select(plan, admin_user):
+    """Dos INSERT ... SELECT; ON CONFLICT salta también las fechas ocupadas después del plan"""
+    routine_table = connection.ops.quote_name(CustomRoutine._meta.db_table)
+    video_table = connection.ops.quote_name(RoutineVideo._meta.db_table)
+    params = {
+        'source': plan.source_group.pk,
+        'target': plan.target_group.pk,
+        'start': plan.start_date,
+        'end': plan.end_date,
+        'offset': plan.offset_days,
+        'admin': admin_user.pk,
+        'now': timezone.now(),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {routine_table}
+                (title, description, group_id, assigned_date, is_active, created_by_id, created_at, updated_at)
+            SELECT title, description, %(target)s, assigned_date + %(offset)s::integer, is_active,
+                   %(admin)s, %(now)s, %(now)s
+            FROM {routine_table}
+            WHERE group_id = %(source)s AND assigned_date BETWEEN %(start)s AND %(end)s
+            ORDER BY assigned_date
+            ON CONFLICT (group_id, assigned_date) DO NOTHING
+            RETURNING id
+            """,
+            params,
+        )
+        new_ids = [row[0] for row in cursor.fetchall()]
+        if new_ids:
+            cursor.execute(
+                f"""
+                INSERT INTO {video_table} (routine_id, video_id, "order", notes, created_at)
+                SELECT cloned.id, source_video.video_id, source_video."order", source_video.notes, %(now)s
+                FROM {video_table} source_video
+                JOIN {routine_table} source_routine ON source_routine.id = source_video.routine_id
+                JOIN {routine_table} cloned
+                    ON cloned.group_id = %(target)s
+                    AND cloned.assigned_date = source_routine.assigned_date + %(offset)s::integer
+                WHERE source_routine.group_id = %(source)s
+                    AND source_routine.assigned_date BETWEEN %(start)s AND %(end)s
+                    AND cloned.id = ANY(%(new_ids)s)
+                """,
+                dict(params, new_ids=new_ids),
+            )
+    return len(new_ids)
+
+
+def _clone_with_bulk_create(plan, admin_user):
+    if not plan.to_create:
+        return 0
+
+    new_routines = CustomRoutine.objects.bulk_create(
+        [
+            CustomRoutine(
+                title=routine['title'],
+                description=routine['description'],
+                group=plan.target_group,
+                assigned_date=routine['target_date'],
+                is_active=routine['is_active'],
+                created_by=admin_user,
+            )
+            for routine in plan.to_create
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    _ensure_ids(new_routines)
+
+    clone_ids = {routine['pk']: new_routine.pk for routine, new_routine in zip(plan.to_create, new_routines)}
+    RoutineVideo.objects.bulk_create(
+        [
+            RoutineVideo(routine_id=clone_ids[routine_id], video_id=video_id, order=order, notes=notes)
+            for routine_id, video_id, order, notes in RoutineVideo.objects.filter(
+                routine_id__in=clone_ids
+            ).values_list('routine_id', 'video_id', 'order', 'notes')
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    return len(new_routines)
+
+
+def _invalidate_dashboard():
+    counters.invalidate_counters('total_routines')
+    counters.invalidate_today_routines()
+
+
+def touch_routine_templates():
+    """Descarta la expansión cacheada de todas las plantillas"""
+    cache.set(_TEMPLATES_VERSION_KEY, time.time_ns(), None)
+
+
+def _format_duration(seconds):
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def _video_data(video_id, title, description, seconds, s3_url, thumbnail_url, order, notes):
+    return {
+        'id': video_id,
+        'title': title,
+        'description': description,
+        'duration': _format_duration(seconds),
+        'seconds': seconds,
+        's3_url': s3_url,
+        'thumbnail_url': thumbnail_url,
+        'order': order,
+        'notes': notes,
+    }
+
+
+def _routine_data(title, description, videos, routine_id=None, template_id=None):
+    return {
+        'id': routine_id,
+        'template_id': template_id,
+        'title': title,
+        'description': description,
+        'videos_count': len(videos),
+        'total_duration': _format_duration(sum(video['seconds'] for video in videos)),
+        'videos': videos,
+    }
+
+
+def serialize_routine(routine):
+    """Datos de una CustomRoutine con ``routine_videos`` (y su video) precargados"""
+    videos = [
+        _video_data(
+            rv.video.id, rv.video.title, rv.video.description, rv.video.duration,
+            rv.video.s3_url, rv.video.thumbnail_url, rv.order, rv.notes,
+        )
+        for rv in routine.routine_videos.all()
+    ]
+    return _routine_data(routine.title, routine.description, videos, routine_id=routine.id)
+
+
+def _months(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _load_templates(group_id, start, end):
+    """
+    Plantillas activas del grupo vigentes en el rango, con sus videos, en una
+    consulta (LEFT JOIN). Las que empiezan más tarde van primero: si dos
+    coinciden en un día gana la más reciente.
+    """
+    rows = (
+        RoutineTemplate.objects
+        .filter(group_id=group_id, is_active=True, start_date__lte=end)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=start))
+        .order_by('-start_date', 'pk', 'template_videos__order')
+        .values_list(
+            'pk', 'title', 'description', 'weekday', 'start_date', 'end_date',
+            'template_videos__order', 'template_videos__notes', 'template_videos__video_id',
+            'template_videos__video__title', 'template_videos__video__description',
+            'template_videos__video__duration', 'template_videos__video__s3_url',
+            'template_videos__video__thumbnail_url',
+        )
+    )
+    templates = {}
+    for pk, title, description, weekday, start_date, end_date, order, notes, video_id, *video in rows:
+        if pk not in templates:
+            templates[pk] = RoutineTemplate(
+                pk=pk, title=title, description=description, weekday=weekday,
+                start_date=start_date, end_date=end_date,
+            )
+            templates[pk].videos = []
+        if video_id is not None:
+            templates[pk].videos.append(_video_data(video_id, *video, order, notes))
+    return list(templates.values())
+
+
+def _expand_month(templates, year, month):
+    """{fecha: rutina} generadas por las plantillas en el mes"""
+    data = {template.pk: None for template in templates}
+    schedule = {}
+    for day_number in range(1, calendar.monthrange(year, month)[1] + 1):
+        day = date(year, month, day_number)
+        for template in templates:
+            if template.applies_on(day):
+                if data[template.pk] is None:
+                    data[template.pk] = _routine_data(
+                        template.title, template.description, template.videos, template_id=template.pk,
+                    )
+                schedule[day] = data[template.pk]
+                break
+    return schedule
+
+
+def _expand_months(group_id, months):
+    """Expansión de las plantillas del grupo en los meses dados (ordenados), con una consulta"""
+    first_year, first_month = months[0]
+    last_year, last_month = months[-1]
+    templates = _load_templates(
+        group_id,
+        date(first_year, first_month, 1),
+        date(last_year, last_month, calendar.monthrange(last_year, last_month)[1]),
+    )
+    return [_expand_month(templates, *month) for month in months]
+
+
+def _template_months(group_id, start, end):
+    """Expansión de las plantillas del grupo por mes, desde la caché si es compartida"""
+    months = list(_months(start, end))
+    if not getattr(settings, 'SHARED_CACHE', False):
+        # La versión solo cambiaría en el worker que guardó la plantilla
+        return _expand_months(group_id, months)
+
+    version = cache.get(_TEMPLATES_VERSION_KEY, 0)
+    keys = {
+        (year, month): f'routine_templates:{version}:{group_id}:{year}-{month:02d}'
+        for year, month in months
+    }
+    cached = cache.get_many(keys.values())
+    missing = [month for month in months if keys[month] not in cached]
+    if missing:
+        fresh = dict(zip((keys[month] for month in missing), _expand_months(group_id, missing)))
+        cache.set_many(fresh, TEMPLATE_CACHE_TIMEOUT)
+        cached.update(fresh)
+    return [cached[keys[month]] for month in months]
+
+
+def resolve_schedule(group_id, start, end):
+    """
+    Rutina de cada fecha del rango para el grupo: {fecha: datos de la rutina}.
+
+    Las fechas sin CustomRoutine toman la de la plantilla; una CustomRoutine
+    activa la reemplaza y una inactiva deja el día sin rutina.
+    """
+    schedule = {}
+    for month_schedule in _template_months(group_id, start, end):
+        schedule.update({day: routine for day, routine in month_schedule.items() if start <= day <= end})
+
+    overrides = CustomRoutine.objects.filter(
+        group_id=group_id, assigned_date__gte=start, assigned_date__lte=end,
+    ).prefetch_related(Prefetch('routine_videos', queryset=RoutineVideo.objects.select_related('video')))
+    for routine in overrides:
+        if routine.is_active:
+            schedule[routine.assigned_date] = serialize_routine(routine)
+        else:
+            schedule.pop(routine.assigned_date, None)
+    return schedule
+
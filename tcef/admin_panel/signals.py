@@ -0,0 +1,178 @@
+"""
+Señales del panel de administración.
+
+Cuando se crea, edita o elimina un registro de un usuario:
+- al confirmar, se marcan como desactualizadas las fotografías de métricas
+  mensuales de ese mes en adelante (desde el mes de origen si la edición
+  movió la fecha) para que ``snapshot_monthly_metrics`` las recalcule;
+- se registra la escritura para invalidar las secciones en caché del modal
+  de detalle del monitoreo.
+
+Además mantienen los contadores y listas del dashboard (``counters``), la
+expansión cacheada de las plantillas de rutina (``scheduling``) y las
+versiones del modal de detalles de rutinas (``routine_details``).
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from app.models import BodyCompositionHistory, BodyMeasurements, ExerciseLog, FoodDiary, UserProfile
+from . import counters, scheduling
+from .models import (
+    AdminActivity, CustomRoutine, MonthlyUserMetrics, RoutineTemplate, RoutineTemplateVideo, RoutineVideo, UserGroup,
+    Video,
+)
+from .routine_details import touch_routine_catalog, touch_routine_details
+from .user_detail import touch_user_detail
+
+
+# Registros que alimentan las métricas mensuales: modelo -> campo de fecha
+_METRIC_DATE_FIELDS = {
+    ExerciseLog: 'exercise_date',
+    BodyMeasurements: 'measurement_date',
+    BodyCompositionHistory: 'measurement_date',
+}
+
+
+def remember_metric_date(sender, instance, **kwargs):
+    # Usuario y fecha cargados, para marcar también el mes de origen si se editan
+    field = _METRIC_DATE_FIELDS[sender]
+    deferred = instance.get_deferred_fields()
+    if instance.pk is None or 'user_id' in deferred or field in deferred:
+        instance._metrics_loaded = None
+    else:
+        instance._metrics_loaded = (instance.user_id, getattr(instance, field))
+
+
+def metric_record_changed(sender, instance, **kwargs):
+    field = _METRIC_DATE_FIELDS[sender]
+    current = (instance.user_id, getattr(instance, field))
+    affected = {current}
+    loaded = getattr(instance, '_metrics_loaded', None)
+    if loaded is not None:
+        affected.add(loaded)
+    instance._metrics_loaded = current
+
+    def mark():
+        # mark_stale cubre el mes indicado y los siguientes: basta el más antiguo por usuario
+        earliest = {}
+        for user_id, day in affected:
+            if user_id not in earliest or day < earliest[user_id]:
+                earliest[user_id] = day
+        for user_id, day in earliest.items():
+            MonthlyUserMetrics.mark_stale(user_id, day)
+            touch_user_detail(user_id)
+
+    transaction.on_commit(mark)
+
+
+for _model in _METRIC_DATE_FIELDS:
+    post_init.connect(remember_metric_date, sender=_model)
+    post_save.connect(metric_record_changed, sender=_model)
+    post_delete.connect(metric_record_changed, sender=_model)
+
+
+@receiver([post_save, post_delete], sender=FoodDiary)
+def food_diary_changed(sender, instance, **kwargs):
+    touch_user_detail(instance.user_id)
+
+
+# Contadores en caché: modelo -> (contador, campo, valor)
+_COUNTED_MODELS = {model: (name, field, value) for name, (model, field, value) in counters.COUNTERS.items()}
+
+
+def _counted_value(instance, field, value):
+    """1/0 según el campo del contador, o None si el campo no se cargó"""
+    if field is None:
+        return 1
+    if field in instance.get_deferred_fields():
+        return None
+    return 1 if getattr(instance, field) == value else 0
+
+
+def remember_counted_value(sender, instance, **kwargs):
+    # Guardar el estado cargado para calcular el delta al guardar sin otra consulta
+    _, field, value = _COUNTED_MODELS[sender]
+    instance._dashboard_counted = _counted_value(instance, field, value)
+
+
+def _apply_counter_delta(name, delta):
+    # Al confirmar: un rollback no deja el contador desviado y un COUNT
+    # concurrente ya ve la fila
+    if delta is None:
+        transaction.on_commit(lambda: counters.invalidate_counters(name))
+    elif delta:
+        transaction.on_commit(lambda: counters.adjust_counter(name, delta))
+
+
+def counted_model_saved(sender, instance, created, **kwargs):
+    name, field, value = _COUNTED_MODELS[sender]
+    before = 0 if created else getattr(instance, '_dashboard_counted', None)
+    after = _counted_value(instance, field, value)
+    _apply_counter_delta(name, None if before is None or after is None else after - before)
+    instance._dashboard_counted = after
+
+
+def counted_model_deleted(sender, instance, **kwargs):
+    name, field, value = _COUNTED_MODELS[sender]
+    counted = _counted_value(instance, field, value)
+    _apply_counter_delta(name, None if counted is None else -counted)
+
+
+# Solo los modelos contados: post_init se dispara por cada fila cargada de
+# cualquier modelo
+for _model in _COUNTED_MODELS:
+    post_init.connect(remember_counted_value, sender=_model)
+    post_save.connect(counted_model_saved, sender=_model)
+    post_delete.connect(counted_model_deleted, sender=_model)
+
+
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+def recent_users_changed(sender, **kwargs):
+    counters.invalidate_lists('recent_users')
+
+
+@receiver([post_save, post_delete], sender=AdminActivity)
+def admin_activity_changed(sender, **kwargs):
+    counters.invalidate_lists('recent_activities')
+
+
+@receiver([post_save, post_delete], sender=CustomRoutine)
+def routine_changed(sender, instance, **kwargs):
+    counters.invalidate_today_routines()
+    # Al confirmar, así cubre también los cambios de videos de set_videos
+    # (el id se copia antes: delete() lo deja en None)
+    routine_id = instance.pk
+    transaction.on_commit(lambda: touch_routine_details(routine_id))
+
+
+@receiver([post_save, post_delete], sender=RoutineVideo)
+def routine_video_changed(sender, instance, **kwargs):
+    routine_id = instance.routine_id
+    transaction.on_commit(lambda: touch_routine_details(routine_id))
+
+
+@receiver([post_save, post_delete], sender=Video)
+@receiver([post_save, post_delete], sender=UserGroup)
+def routine_catalog_changed(sender, **kwargs):
+    transaction.on_commit(touch_routine_catalog)
+
+
+@receiver([post_save, post_delete], sender=User)
+def routine_author_changed(sender, created=False, update_fields=None, **kwargs):
+    """El autor aparece en los detalles; el login solo guarda last_login"""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    transaction.on_commit(touch_routine_catalog)
+
+
+@receiver([post_save, post_delete], sender=RoutineTemplate)
+@receiver([post_save, post_delete], sender=RoutineTemplateVideo)
+@receiver([post_save, post_delete], sender=Video)
+def routine_template_changed(sender, **kwargs):
+    # Al confirmar, así cubre también los bulk_create/bulk_update de set_videos
+    transaction.on_commit(scheduling.touch_routine_templates)
+    counters.invalidate_today_routines()
+
@@ -1,38 +1,21 @@
-// Variables globales para el filtrado
-let allUsers = [];
-let filteredUsers = [];
+// Estado de la tabla paginada en el servidor
 let currentSort = 'progress';
+let searchTimeout = null;
+let loadingPage = false;
 
-// Inicializar datos al cargar la página
+// Inicializar la tabla al cargar la página
 document.addEventListener('DOMContentLoaded', function() {
-    // Recopilar todos los usuarios de la tabla
-    const userRows = document.querySelectorAll('.user-row');
-    allUsers = Array.from(userRows).map(row => {
-        const userId = row.getAttribute('onclick').match(/\d+/)[0];
-        const userName = row.querySelector('.fw-bold').textContent.trim();
-        const userEmail = row.querySelector('.text-muted').textContent.trim();
-        const exerciseCount = parseInt(row.cells[1].querySelector('.metric-value').textContent);
-        const progress = parseFloat(row.cells[2].querySelector('small').textContent.replace('%', ''));
-        const currentStreak = parseInt(row.cells[3].querySelector('.streak-badge').textContent.replace(' semanas', ''));
-        const bestStreak = parseInt(row.cells[4].querySelector('.best-streak-badge').textContent.replace(' semanas', ''));
-        
-        return {
-            element: row,
-            userId: userId,
-            userName: userName,
-            userEmail: userEmail,
-            exerciseCount: exerciseCount,
-            progress: progress,
-            currentStreak: currentStreak,
-            bestStreak: bestStreak
-        };
-    });
-    
-    filteredUsers = [...allUsers];
+    const sortInput = document.getElementById('sortInput');
+    if (sortInput) {
+        currentSort = sortInput.value;
+    }
     
-    // Configurar eventos de búsqueda
+    // Configurar eventos de búsqueda, filtros y paginación
     setupSearch();
+    setupFilters();
     setupSorting();
+    setupLoadMore();
+    setupExport();
     
     // Definir setupTestData si no existe
     if (typeof window.setupTestData !== 'function') {
@@ -71,106 +54,56 @@ document.addEventListener('DOMContentLoaded', function() {
 function setupSearch() {
     const searchInput = document.getElementById('userSearch');
     const clearButton = document.getElementById('clearSearch');
-    const userCount = document.getElementById('userCount');
     
+    // Esperar a que el usuario deje de escribir antes de consultar al servidor
     searchInput.addEventListener('input', function() {
-        const searchTerm = this.value.toLowerCase().trim();
-        
-        if (searchTerm === '') {
-            // Restaurar todos los usuarios cuando no hay término de búsqueda
-            filteredUsers = [...allUsers];
-        } else {
-            // Filtrar usuarios según el término de búsqueda
-            filteredUsers = allUsers.filter(user => 
-                user.userName.toLowerCase().includes(searchTerm) ||
-                user.userEmail.toLowerCase().includes(searchTerm) ||
-                user.userId.toLowerCase().includes(searchTerm)
-            );
-        }
-        
-        updateTable();
-        userCount.textContent = filteredUsers.length;
-    });
-    
-    // Evento para cuando se borra el contenido del input
-    searchInput.addEventListener('keyup', function() {
-        if (this.value === '') {
-            filteredUsers = [...allUsers];
-            updateTable();
-            userCount.textContent = filteredUsers.length;
-        }
+        clearTimeout(searchTimeout);
+        searchTimeout = setTimeout(reloadTable, 300);
     });
     
     clearButton.addEventListener('click', function() {
         searchInput.value = '';
-        filteredUsers = [...allUsers];
-        updateTable();
-        userCount.textContent = filteredUsers.length;
+        reloadTable();
+    });
+}
+
+function setupFilters() {
+    const form = document.getElementById('monitoringFilters');
+    form.querySelectorAll('select, input[type="number"]').forEach(field => {
+        field.addEventListener('change', reloadTable);
     });
 }
 
 function setupSorting() {
-    const sortByProgress = document.getElementById('sortByProgress');
-    const sortByStreak = document.getElementById('sortByStreak');
-    const sortByName = document.getElementById('sortByName');
-    
-    console.log('Setting up sorting buttons...');
-    console.log('sortByProgress:', sortByProgress);
-    console.log('sortByStreak:', sortByStreak);
-    console.log('sortByName:', sortByName);
-    
-    if (sortByProgress) {
-        sortByProgress.addEventListener('click', function() {
-            console.log('Progress sort clicked');
-            currentSort = 'progress';
-            sortUsers('progress');
-            updateSortButtons(this);
-        });
-    }
-    
-    if (sortByStreak) {
-        sortByStreak.addEventListener('click', function() {
-            console.log('Streak sort clicked');
-            currentSort = 'streak';
-            sortUsers('streak');
+    document.querySelectorAll('.sort-button').forEach(button => {
+        button.addEventListener('click', function() {
+            currentSort = this.dataset.sort;
+            document.getElementById('sortInput').value = currentSort;
             updateSortButtons(this);
+            reloadTable();
         });
-    }
-    
-    if (sortByName) {
-        sortByName.addEventListener('click', function() {
-            console.log('Name sort clicked');
-            currentSort = 'name';
-            sortUsers('name');
-            updateSortButtons(this);
-        });
-    }
+    });
 }
 
+function setupLoadMore() {
+    const loadMore = document.getElementById('loadMoreUsers');
+    loadMore.addEventListener('click', function() {
+        loadPage(this.dataset.cursor);
+    });
+}
 
-function sortUsers(sortType) {
-    console.log('Sorting by:', sortType);
-    console.log('Filtered users before sort:', filteredUsers.length);
-    
-    switch(sortType) {
-        case 'progress':
-            filteredUsers.sort((a, b) => b.progress - a.progress);
-            break;
-        case 'streak':
-            filteredUsers.sort((a, b) => b.currentStreak - a.currentStreak);
-            break;
-        case 'name':
-            filteredUsers.sort((a, b) => a.userName.localeCompare(b.userName));
-            break;
-    }
-    
-    console.log('Filtered users after sort:', filteredUsers.length);
-    updateTable();
+function setupExport() {
+    // Exportar con los mismos filtros y orden que la tabla
+    const exportLink = document.getElementById('exportUsers');
+    const baseUrl = exportLink.getAttribute('href');
+    exportLink.addEventListener('click', function() {
+        this.href = `${baseUrl}?${buildQueryString()}`;
+    });
 }
 
 function updateSortButtons(activeButton) {
     // Remover clase activa de todos los botones
-    document.querySelectorAll('#sortByProgress, #sortByStreak, #sortByName').forEach(btn => {
+    document.querySelectorAll('.sort-button').forEach(btn => {
         btn.classList.remove('btn-primary');
         btn.classList.add('btn-outline-primary');
     });
@@ -180,47 +113,88 @@ function updateSortButtons(activeButton) {
     activeButton.classList.add('btn-primary');
 }
 
-function updateTable() {
-    const tbody = document.querySelector('.metrics-table tbody');
-    const noResultsRow = tbody.querySelector('tr td[colspan="10"]');
-    
-    // Remover fila de "no hay usuarios" si existe
-    if (noResultsRow) {
-        noResultsRow.parentElement.remove();
+function buildQueryString(cursor) {
+    const params = new URLSearchParams(new FormData(document.getElementById('monitoringFilters')));
+    if (cursor) {
+        params.set('cursor', cursor);
     }
+    return params.toString();
+}
+
+function reloadTable() {
+    // Mantener los filtros en la URL para poder recargar o compartir la vista
+    history.replaceState(null, '', `${window.location.pathname}?${buildQueryString()}`);
+    loadPage(null);
+}
+
+function loadPage(cursor) {
+    if (loadingPage) {
+        return;
+    }
+    loadingPage = true;
     
-    // Ocultar todas las filas primero
-    allUsers.forEach(user => {
-        user.element.style.display = 'none';
-    });
+    const tbody = document.querySelector('.metrics-table tbody');
+    const loadMore = document.getElementById('loadMoreUsers');
+    const userCount = document.getElementById('userCount');
+    loadMore.disabled = true;
     
-    // Mostrar solo los usuarios filtrados
-    if (filteredUsers.length === 0) {
-        // Crear fila de "no hay resultados" solo si hay un término de búsqueda
-        const searchInput = document.getElementById('userSearch');
-        if (searchInput && searchInput.value.trim() !== '') {
+    fetch(`${window.MONITORING_PAGE_URL}?${buildQueryString(cursor)}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Error al cargar usuarios');
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (cursor) {
+                // Página siguiente: agregar filas al final
+                tbody.insertAdjacentHTML('beforeend', data.html);
+            } else {
+                // Filtros u orden nuevos: reemplazar la tabla
+                tbody.innerHTML = data.html;
+            }
+            if (data.total !== null) {
+                userCount.textContent = data.total;
+            }
+            loadMore.dataset.cursor = data.next_cursor || '';
+            loadMore.classList.toggle('d-none', !data.next_cursor);
+        })
+        .catch(error => {
+            console.error('Error en fetch:', error);
             tbody.innerHTML = `
                 <tr>
-                    <td colspan="10" class="text-center py-4">
-                        <i class="fas fa-search fa-2x text-muted mb-3"></i>
-                        <div class="text-muted">No se encontraron usuarios que coincidan con la búsqueda</div>
+                    <td colspan="10" class="text-center py-4 text-danger">
+                        <i class="fas fa-exclamation-triangle me-2"></i>
+                        Error al cargar los usuarios.
                     </td>
                 </tr>
             `;
-        }
-    } else {
-        // Mostrar usuarios filtrados en el orden correcto
-        filteredUsers.forEach((user, index) => {
-            user.element.style.display = '';
-            // Asegurar que el orden se mantenga en el DOM
-            if (index === 0) {
-                tbody.insertBefore(user.element, tbody.firstChild);
-            } else {
-                const previousUser = filteredUsers[index - 1];
-                tbody.insertBefore(user.element, previousUser.element.nextSibling);
-            }
+        })
+        .finally(() => {
+            loadingPage = false;
+            loadMore.disabled = false;
         });
-    }
+}
+
+const LOADING_HTML = `
+    <div class="text-center py-4">
+        <div class="spinner-border text-primary" role="status">
+            <span class="visually-hidden">Cargando...</span>
+        </div>
+        <div class="mt-2">Cargando...</div>
+    </div>
+`;
+
+// Insertar HTML de una sección y ejecutar sus scripts
+function insertSectionHtml(container, html) {
+    container.innerHTML = html;
+    container.querySelectorAll('script').forEach(script => {
+        try {
+            eval(script.textContent);
+        } catch (e) {
+            console.error('Error ejecutando script:', e);
+        }
+    });
 }
 
 function openUserModal(userId) {
@@ -228,48 +202,20 @@ function openUserModal(userId) {
     const content = document.getElementById('userDetailContent');
     
     // Mostrar loading
-    content.innerHTML = `
-        <div class="text-center py-4">
-            <div class="spinner-border text-primary" role="status">
-                <span class="visually-hidden">Cargando...</span>
-            </div>
-            <div class="mt-2">Cargando detalles del usuario...</div>
-        </div>
-    `;
-    
+    content.innerHTML = LOADING_HTML;
     modal.show();
     
-    // Cargar contenido del usuario
+    // Cargar encabezado y resumen; las demás pestañas se piden al abrirlas
     fetch(`/admin-panel/monitoring/user/${userId}/details/`)
         .then(response => {
+            if (!response.ok) {
+                throw new Error('Error al cargar los datos');
+            }
             return response.text();
         })
         .then(html => {
-            // Limpiar completamente el contenido antes de insertar el nuevo
-            content.innerHTML = '';
-            
-            // Insertar el nuevo HTML
             content.innerHTML = html;
-            
-            // Forzar la ejecución del nuevo script inmediatamente
-            const scripts = content.querySelectorAll('script');
-            
-            if (scripts.length > 0) {
-                scripts.forEach((script, index) => {
-                    try {
-                        eval(script.textContent);
-                    } catch (e) {
-                        console.error('Error ejecutando script:', e);
-                    }
-                });
-                
-                // Esperar un poco y verificar si la función está disponible
-                setTimeout(() => {
-                    if (typeof window.initializeUserDetailChart === 'function') {
-                        window.initializeUserDetailChart();
-                    }
-                }, 200);
-            }
+            setupUserDetailTabs();
         })
         .catch(error => {
             console.error('Error en fetch:', error);
@@ -282,72 +228,56 @@ function openUserModal(userId) {
         });
 }
 
-// Navegación de meses en el modal
-function changeMonth(userId, year, month) {
-    const content = document.getElementById('userDetailContent');
-    
-    // Validar y normalizar mes y año
-    let normalizedYear = parseInt(year);
-    let normalizedMonth = parseInt(month);
-    
-    // Normalizar si el mes está fuera de rango
-    if (normalizedMonth < 1) {
-        normalizedMonth = 12;
-        normalizedYear -= 1;
-    } else if (normalizedMonth > 12) {
-        normalizedMonth = 1;
-        normalizedYear += 1;
-    }
-    
-    // Asegurar que el mes esté en el rango válido (1-12)
-    normalizedMonth = Math.max(1, Math.min(12, normalizedMonth));
-    
-    // Mostrar loading
-    content.innerHTML = `
-        <div class="text-center py-4">
-            <div class="spinner-border text-primary" role="status">
-                <span class="visually-hidden">Cargando...</span>
-            </div>
-            <div class="mt-2">Cargando datos del mes...</div>
-        </div>
-    `;
+function setupUserDetailTabs() {
+    document.querySelectorAll('#userDetailTabs [data-bs-toggle="tab"]').forEach(tab => {
+        tab.addEventListener('shown.bs.tab', function() {
+            const pane = document.querySelector(this.dataset.bsTarget);
+            if (pane && pane.dataset.loaded !== 'true') {
+                loadUserDetailSection(pane, pane.dataset.url);
+            }
+        });
+    });
+}
+
+function loadUserDetailSection(pane, url) {
+    pane.dataset.loaded = 'true';
+    pane.innerHTML = LOADING_HTML;
     
-    // Cargar nuevo contenido con valores normalizados
-    fetch(`/admin-panel/monitoring/user/${userId}/details/?year=${normalizedYear}&month=${normalizedMonth}`)
+    return fetch(url)
         .then(response => {
             if (!response.ok) {
-                throw new Error('Error al cargar los datos');
+                throw new Error('Error al cargar la sección');
             }
             return response.text();
         })
         .then(html => {
-            content.innerHTML = html;
-            
-            // Ejecutar scripts del nuevo contenido
-            const scripts = content.querySelectorAll('script');
-            scripts.forEach(script => {
-                try {
-                    eval(script.textContent);
-                } catch (e) {
-                    console.error('Error ejecutando script:', e);
-                }
-            });
+            insertSectionHtml(pane, html);
             
-            // Inicializar gráfico si existe
-            setTimeout(() => {
-                if (typeof window.initializeUserDetailChart === 'function') {
-                    window.initializeUserDetailChart();
-                }
-            }, 200);
+            // El gráfico necesita que su pestaña esté visible para medir el canvas
+            if (pane.dataset.section === 'charts' && typeof window.initializeUserDetailChart === 'function') {
+                window.initializeUserDetailChart();
+            }
         })
         .catch(error => {
             console.error('Error en fetch:', error);
-            content.innerHTML = `
+            pane.dataset.loaded = 'false';
+            pane.innerHTML = `
                 <div class="alert alert-danger">
                     <i class="fas fa-exclamation-triangle me-2"></i>
-                    Error al cargar los datos del mes: ${error.message}
+                    ${error.message}
                 </div>
             `;
         });
 }
 
+// Navegación de meses: solo se vuelve a pedir el calendario
+function changeMonth(userId, year, month) {
+    const pane = document.getElementById('userDetailCalendar');
+    if (!pane) {
+        return;
+    }
+    
+    // El servidor normaliza meses fuera de rango (0 -> diciembre del año anterior, etc.)
+    const params = new URLSearchParams({year: parseInt(year), month: parseInt(month)});
+    loadUserDetailSection(pane, `${pane.dataset.url}?${params.toString()}`);
+}
@@ -1,3 +1,303 @@
+from datetime import date, timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
 from django.test import TestCase
 
-# Create your tests here.
+from app.models import ExerciseLog
+from . import scheduling
+from .member_import import IMPORT_COLUMNS, MemberImportError, validate_members
+from .models import (
+    CustomRoutine, MonthlyUserMetrics, RoutineTemplate, RoutineVideo, UserGroup, Video, VideoUploadSession,
+)
+
+
+def create_video(admin, number):
+    session = VideoUploadSession.objects.create(
+        admin_user=admin, filename=f'video{number}.mp4', file_size=1000, s3_bucket='bucket',
+    )
+    return Video.objects.create(
+        title=f'Video {number}', filename=f'video{number}.mp4', s3_key=f'videos/{number}.mp4',
+        s3_url=f'https://example.com/videos/{number}.mp4', duration=60, file_size=1000,
+        upload_session=session, created_by=admin,
+    )
+
+
+class SetVideosTests(TestCase):
+    """``set_videos`` (``_sync_ordered_videos``) aplica solo la diferencia y respeta (padre, order)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw12345678', is_staff=True)
+        cls.group = UserGroup.objects.create(name='A')
+        cls.videos = [create_video(cls.admin, number) for number in range(1, 5)]
+
+    def _routine(self, *videos):
+        routine = CustomRoutine.objects.create(
+            title='Rutina', description='', group=self.group, assigned_date=date(2030, 1, 7), created_by=self.admin,
+        )
+        self._set_videos(routine, videos)
+        return routine
+
+    def _set_videos(self, parent, videos):
+        with transaction.atomic():
+            parent.set_videos(list(videos))
+
+    def _rows(self, related_manager):
+        """[(video, order)] en orden"""
+        return [(row.video, row.order) for row in related_manager.order_by('order')]
+
+    def test_reorder_keeps_rows_and_notes(self):
+        v1, v2, v3, _ = self.videos
+        routine = self._routine(v1, v2, v3)
+        routine.routine_videos.filter(video=v2).update(notes='lento')
+        ids = dict(routine.routine_videos.values_list('video_id', 'pk'))
+
+        self._set_videos(routine, [v3, v1, v2])
+
+        self.assertEqual(self._rows(routine.routine_videos), [(v3, 1), (v1, 2), (v2, 3)])
+        self.assertEqual(dict(routine.routine_videos.values_list('video_id', 'pk')), ids)
+        self.assertEqual(routine.routine_videos.get(video=v2).notes, 'lento')
+
+    def test_unchanged_list_writes_nothing(self):
+        v1, v2, _, _ = self.videos
+        routine = self._routine(v1, v2)
+
+        with self.assertNumQueries(1):
+            routine.set_videos([v1, v2])
+
+    def test_duplicate_video_ids(self):
+        v1, v2, _, _ = self.videos
+        routine = self._routine(v1, v2)
+        first_id = routine.routine_videos.get(video=v1).pk
+
+        self._set_videos(routine, [v2, v1, v1])
+        self.assertEqual(self._rows(routine.routine_videos), [(v2, 1), (v1, 2), (v1, 3)])
+        # La fila existente se reutiliza para la primera aparición
+        self.assertEqual(routine.routine_videos.get(order=2).pk, first_id)
+
+        self._set_videos(routine, [v1])
+        self.assertEqual(self._rows(routine.routine_videos), [(v1, 1)])
+
+    def test_mixed_remove_and_insert(self):
+        v1, v2, v3, v4 = self.videos
+        routine = self._routine(v1, v2, v3)
+        kept = dict(routine.routine_videos.filter(video__in=[v1, v3]).values_list('video_id', 'pk'))
+
+        self._set_videos(routine, [v4, v3, v1])
+
+        self.assertEqual(self._rows(routine.routine_videos), [(v4, 1), (v3, 2), (v1, 3)])
+        self.assertEqual(dict(routine.routine_videos.filter(video__in=[v1, v3]).values_list('video_id', 'pk')), kept)
+        self.assertFalse(routine.routine_videos.filter(video=v2).exists())
+
+    def test_shrink_and_grow(self):
+        v1, v2, v3, v4 = self.videos
+        routine = self._routine(v1, v2, v3, v4)
+
+        self._set_videos(routine, [v4])
+        self.assertEqual(self._rows(routine.routine_videos), [(v4, 1)])
+
+        self._set_videos(routine, [v2, v3, v4, v1])
+        self.assertEqual(self._rows(routine.routine_videos), [(v2, 1), (v3, 2), (v4, 3), (v1, 4)])
+
+        self._set_videos(routine, [])
+        self.assertFalse(routine.routine_videos.exists())
+
+    def test_routine_template(self):
+        v1, v2, v3, v4 = self.videos
+        template = RoutineTemplate.objects.create(
+            title='Lunes', group=self.group, weekday=0, start_date=date(2030, 1, 6), created_by=self.admin,
+        )
+        self._set_videos(template, [v1, v2, v3])
+        template.template_videos.filter(video=v3).update(notes='al final')
+
+        self._set_videos(template, [v3, v4, v1])
+
+        self.assertEqual(self._rows(template.template_videos), [(v3, 1), (v4, 2), (v1, 3)])
+        self.assertEqual(template.template_videos.get(video=v3).notes, 'al final')
+        self.assertEqual([row.video for row in template.get_videos_ordered()], [v3, v4, v1])
+
+
+class CloneScheduleTests(TestCase):
+    """
+    ``clone_schedule`` con el camino de la base en uso: INSERT ... SELECT en
+    PostgreSQL y bulk_create en las demás. Para cubrir el SQL de PostgreSQL:
+
+        DATABASE_URL=postgres://... python manage.py test admin_panel
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw12345678', is_staff=True)
+        cls.source = UserGroup.objects.create(name='A')
+        cls.target = UserGroup.objects.create(name='B')
+        cls.videos = [create_video(cls.admin, number) for number in range(1, 4)]
+        cls.monday = date(2030, 1, 7)
+
+    def _routine(self, group, day, *videos, title=None):
+        routine = CustomRoutine.objects.create(
+            title=title or f'Rutina {day:%d/%m}', description='', group=group, assigned_date=day,
+            created_by=self.admin,
+        )
+        RoutineVideo.objects.bulk_create(
+            RoutineVideo(routine=routine, video=video, order=order, notes=f'nota {order}')
+            for order, video in enumerate(videos, 1)
+        )
+        return routine
+
+    def _clone(self, source, target, start, end, offset_days):
+        plan = scheduling.plan_schedule_clone(source, target, start, end, offset_days)
+        return plan, scheduling.clone_schedule(plan, self.admin)
+
+    def _schedule(self, group):
+        """{fecha: (título, activa, [(video, orden, notas)])} del grupo"""
+        return {
+            routine.assigned_date: (
+                routine.title,
+                routine.is_active,
+                [(row.video_id, row.order, row.notes) for row in routine.routine_videos.order_by('order')],
+            )
+            for routine in CustomRoutine.objects.filter(group=group)
+        }
+
+    def test_clone_skips_conflict_dates(self):
+        v1, v2, v3 = self.videos
+        self._routine(self.source, self.monday, v1, v2)
+        self._routine(self.source, self.monday + timedelta(days=2), v3)
+        self._routine(self.source, self.monday + timedelta(days=4), v2, v3, v1)
+        CustomRoutine.objects.filter(assigned_date=self.monday + timedelta(days=4)).update(is_active=False)
+        # En el destino ya hay rutina en la fecha del miércoles + 7
+        occupied = self._routine(self.target, self.monday + timedelta(days=9), v1, title='Existente')
+
+        plan, created = self._clone(self.source, self.target, self.monday, self.monday + timedelta(days=6), 7)
+
+        self.assertEqual((len(plan.to_create), len(plan.conflicts)), (2, 1))
+        self.assertEqual(created, 2)
+        source = self._schedule(self.source)
+        target = self._schedule(self.target)
+        self.assertEqual(target[self.monday + timedelta(days=7)], source[self.monday])
+        self.assertEqual(target[self.monday + timedelta(days=11)], source[self.monday + timedelta(days=4)])
+        # La rutina que ya estaba no cambia ni recibe videos
+        self.assertEqual(
+            target[self.monday + timedelta(days=9)],
+            ('Existente', True, [(v1.pk, 1, 'nota 1')]),
+        )
+        self.assertEqual(occupied.routine_videos.count(), 1)
+        self.assertEqual(len(target), 3)
+
+    def test_clone_same_group_overlapping_range(self):
+        v1, v2, v3 = self.videos
+        # Lunes, martes y jueves; desplazar 2 días dentro del mismo rango choca con el jueves
+        self._routine(self.source, self.monday, v1, v2)
+        self._routine(self.source, self.monday + timedelta(days=1), v3)
+        self._routine(self.source, self.monday + timedelta(days=3), v2)
+        before = self._schedule(self.source)
+
+        plan, created = self._clone(self.source, self.source, self.monday, self.monday + timedelta(days=6), 2)
+
+        self.assertEqual(created, 2)
+        self.assertEqual(len(plan.conflicts), 1)
+        after = self._schedule(self.source)
+        self.assertEqual(len(after), 5)
+        self.assertEqual(after[self.monday + timedelta(days=2)], before[self.monday])
+        self.assertEqual(after[self.monday + timedelta(days=3)], before[self.monday + timedelta(days=3)])
+        self.assertEqual(after[self.monday + timedelta(days=5)], before[self.monday + timedelta(days=3)])
+        # Las originales quedan igual y las copias no se vuelven a copiar
+        for day, routine in before.items():
+            self.assertEqual(after[day], routine)
+        self.assertNotIn(self.monday + timedelta(days=4), after)
+        self.assertEqual(RoutineVideo.objects.count(), 4 + 3)
+
+    def test_clone_empty_range(self):
+        plan, created = self._clone(self.source, self.target, self.monday, self.monday + timedelta(days=6), 7)
+
+        self.assertEqual((plan.to_create, plan.conflicts, created), ([], [], 0))
+        self.assertFalse(CustomRoutine.objects.filter(group=self.target).exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'INSERT ... SELECT solo en PostgreSQL')
+    def test_postgresql_uses_insert_select_and_skips_late_conflicts(self):
+        v1, v2, _ = self.videos
+        self._routine(self.source, self.monday, v1)
+        self._routine(self.source, self.monday + timedelta(days=1), v2)
+        plan = scheduling.plan_schedule_clone(
+            self.source, self.target, self.monday, self.monday + timedelta(days=1), 7,
+        )
+        # Otra petición ocupa una fecha entre el plan y la clonación
+        self._routine(self.target, self.monday + timedelta(days=8), v1, title='Tardía')
+
+        with mock.patch.object(scheduling, '_clone_with_bulk_create', side_effect=AssertionError):
+            created = scheduling.clone_schedule(plan, self.admin)
+
+        self.assertEqual(created, 1)
+        target = self._schedule(self.target)
+        self.assertEqual(target[self.monday + timedelta(days=7)][2], [(v1.pk, 1, 'nota 1')])
+        self.assertEqual(target[self.monday + timedelta(days=8)], ('Tardía', True, [(v1.pk, 1, 'nota 1')]))
+
+
+class MonthlyMetricsStaleTests(TestCase):
+    """Las señales marcan desactualizadas las fotografías mensuales al confirmar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('socia', 'socia@example.com', 'pw12345678')
+        MonthlyUserMetrics.objects.bulk_create(
+            MonthlyUserMetrics(user=cls.user, year=2030, month=month) for month in range(1, 5)
+        )
+
+    def _stale_months(self):
+        return list(
+            MonthlyUserMetrics.objects.filter(user=self.user, is_stale=True)
+            .order_by('month').values_list('month', flat=True)
+        )
+
+    def test_marks_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            ExerciseLog.objects.create(user=self.user, exercise_date=date(2030, 3, 5))
+            self.assertEqual(self._stale_months(), [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self._stale_months(), [3, 4])
+
+    def test_moving_a_log_marks_its_original_month(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            log = ExerciseLog.objects.create(user=self.user, exercise_date=date(2030, 3, 5))
+        MonthlyUserMetrics.objects.update(is_stale=False)
+
+        log = ExerciseLog.objects.get(pk=log.pk)
+        log.exercise_date = date(2030, 4, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            log.save()
+
+        self.assertEqual(self._stale_months(), [3, 4])
+
+
+class ValidateMembersTests(TestCase):
+    """``validate_members`` aplica los validadores de los campos de User a cada fila"""
+
+    def _row(self, line, username, email, **extra):
+        row = dict.fromkeys(IMPORT_COLUMNS, '')
+        row.update(line=line, username=username, email=email, gender='F', **extra)
+        return row
+
+    def _error_lines(self, rows):
+        with self.assertRaises(MemberImportError) as raised:
+            validate_members(rows)
+        return [line for line, _ in raised.exception.errors]
+
+    def test_rejects_invalid_and_too_long_values(self):
+        rows = [
+            self._row(2, 'Bad Name!', 'bad@example.com'),
+            self._row(3, 'u' * 151, 'long@example.com'),
+            self._row(4, 'email_largo', 'e' * 250 + '@example.com'),
+            self._row(5, 'apellido', 'apellido@example.com', last_name='n' * 151),
+            self._row(6, 'valida.user', 'valida@example.com'),
+        ]
+
+        self.assertEqual(self._error_lines(rows), [2, 3, 4, 5])
+
+    def test_valid_rows_pass(self):
+        rows = [self._row(2, 'ana.perez', 'ana@example.com', first_name='Ana')]
+
+        self.assertEqual(validate_members(rows), {2: None})
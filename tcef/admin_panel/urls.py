@@ -10,6 +10,7 @@ urlpatterns = [
     # Gestión de usuarios
     path('users/', views.user_management, name='user_management'),
     path('users/create/', views.create_user, name='create_user'),
+    path('users/import/', views.import_members_csv, name='import_members'),
     path('users/<int:user_id>/edit/', views.edit_user, name='edit_user'),
     path('users/<int:user_id>/delete/', views.delete_user, name='delete_user'),
     
@@ -23,6 +24,11 @@ urlpatterns = [
     path('routines/<int:routine_id>/delete/', views.delete_routine, name='delete_routine'),
     path('routines/<int:routine_id>/details/', views.routine_details, name='routine_details'),
     path('routines/<int:routine_id>/replicate/', views.replicate_routine, name='replicate_routine'),
+    path('routines/clone/', views.clone_schedule, name='clone_schedule'),
+    path('routines/recurring/', views.routine_templates, name='routine_templates'),
+    path('routines/recurring/create/', views.create_routine_template, name='create_routine_template'),
+    path('routines/recurring/<int:template_id>/edit/', views.edit_routine_template, name='edit_routine_template'),
+    path('routines/recurring/<int:template_id>/delete/', views.delete_routine_template, name='delete_routine_template'),
     
     # Subida y gestión de videos
     path('videos/', views.video_management, name='video_management'),
@@ -32,12 +38,22 @@ urlpatterns = [
     
     # Monitoreo de usuarios
     path('monitoring/', views.user_monitoring, name='user_monitoring'),
+    path('monitoring/page/', views.user_monitoring_page, name='user_monitoring_page'),
+    path('monitoring/export/', views.user_monitoring_export, name='user_monitoring_export'),
     path('monitoring/user/<int:user_id>/details/', views.user_detail_modal, name='user_detail_modal'),
+    path('monitoring/user/<int:user_id>/details/<str:section>/', views.user_detail_section, name='user_detail_section'),
+    
+    # Reportes
+    path('reports/food-compliance/', views.food_compliance_report, name='food_compliance_report'),
+    path('reports/group-adherence/', views.group_adherence_report, name='group_adherence_report'),
     
     # Notificaciones
     path('notifications/', views.notifications, name='notifications'),
     path('notifications/password-reset/<int:approval_id>/approve/', views.approve_password_reset, name='approve_password_reset'),
     path('notifications/password-reset/<int:approval_id>/reject/', views.reject_password_reset, name='reject_password_reset'),
     path('notifications/count/', views.get_notifications_count, name='notifications_count'),
+    path('notifications/feed/', views.notifications_feed, name='notifications_feed'),
+    path('notifications/user-approvals/review/', views.bulk_review_user_approvals, name='bulk_review_user_approvals'),
+    path('notifications/feed/read/', views.notifications_mark_read, name='notifications_mark_read'),
     
 ] 
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Secciones del modal de detalle de usuario del monitoreo.
+
+Cada sección (resumen, calendario, gráficos, alimentación) se calcula y se
+renderiza por separado, y el HTML se guarda en caché con una clave que
+incluye la marca de la última escritura del usuario. Las señales de
+``admin_panel.signals`` actualizan esa marca cuando cambian sus ejercicios,
+medidas o comidas.
+
+La marca solo la ven todos los workers con una caché compartida
+(``settings.SHARED_CACHE``). Sin ella (locmem, una por proceso) las
+secciones no se guardan en caché y se calculan en cada petición.
+"""
+from datetime import date, timedelta
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Min, Q
+from django.template.loader import render_to_string
+
+from app.calendar_utils import iso_week, iso_week_bounds, month_bounds, month_calendar, monthly_progress
+from app.models import BodyCompositionHistory, BodyMeasurements, ExerciseLog, FoodDiaryArchive
+
+
+# Duración de la caché de cada sección (segundos)
+SECTION_CACHE_TIMEOUT = 60 * 15
+
+# Semanas del diario de alimentación que se muestran en el modal
+FOOD_WEEKS_BACK = 4
+FOOD_MAX_ENTRIES = 50
+
+DAY_NAMES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+SECTIONS = ('summary', 'calendar', 'charts', 'food')
+
+
+def _last_write_key(user_id):
+    return f'user_detail:{user_id}:last_write'
+
+
+def touch_user_detail(user_id):
+    """Registra una escritura del usuario para invalidar sus secciones en caché"""
+    cache.set(_last_write_key(user_id), time.time_ns(), None)
+
+
+def _section_cache_key(user_id, section, *parts):
+    last_write = cache.get(_last_write_key(user_id), 0)
+    suffix = ':'.join(str(part) for part in parts)
+    return f'user_detail:{user_id}:{last_write}:{section}:{suffix}'
+
+
+def summary_context(user, today):
+    """Totales de ejercicio, rachas y últimas medidas (mes actual)"""
+    start_date, end_date = month_bounds(today.year, today.month)
+    totals = ExerciseLog.objects.filter(user=user).aggregate(
+        total=Count('id'),
+        month=Count('id', filter=Q(exercise_date__gte=start_date, exercise_date__lte=end_date)),
+        first_date=Min('exercise_date'),
+    )
+    current_streak, best_streak = ExerciseLog.get_week_streaks([user.pk]).get(user.pk, (0, 0))
+    return {
+        'month_date': start_date,
+        'total_exercises': totals['month'],
+        'total_exercises_all_time': totals['total'],
+        'exercise_percentage': round(monthly_progress(totals['month'], today.year, today.month), 1),
+        'current_streak': current_streak,
+        'best_streak': best_streak,
+        'days_since_start': (today - totals['first_date']).days if totals['first_date'] else 0,
+        'latest_measurement': BodyMeasurements.objects.filter(user=user).order_by('-measurement_date').first(),
+        'latest_composition': BodyCompositionHistory.objects.filter(user=user).order_by('-measurement_date').first(),
+    }
+
+
+def calendar_context(user, year, month):
+    """Calendario de ejercicios y medidas detalladas del mes seleccionado"""
+    start_date, end_date = month_bounds(year, month)
+    exercise_days = set(
+        ExerciseLog.objects.filter(
+            user=user, exercise_date__gte=start_date, exercise_date__lte=end_date
+        ).values_list('exercise_date__day', flat=True)
+    )
+
+    calendar_weeks = []
+    for week in month_calendar(year, month):
+        week_days = []
+        for weekday, day in enumerate(week):
+            if day:
+                week_days.append({
+                    'day': day,
+                    'weekday': weekday,
+                    'weekday_name': DAY_NAMES[weekday],
+                    'has_exercise': day in exercise_days,
+                    'is_current_month': True,
+                })
+            else:
+                week_days.append({
+                    'day': None,
+                    'weekday': None,
+                    'weekday_name': '',
+                    'has_exercise': False,
+                    'is_current_month': False,
+                })
+        calendar_weeks.append(week_days)
+
+    # Medidas del mes; si no hay, las más recientes disponibles
+    month_measurements = list(
+        BodyMeasurements.objects.filter(
+            user=user, measurement_date__gte=start_date, measurement_date__lte=end_date
+        ).order_by('measurement_date')
+    )
+    if not month_measurements:
+        month_measurements = list(
+            BodyMeasurements.objects.filter(user=user).order_by('-measurement_date')[:10]
+        )
+
+    return {
+        'year': year,
+        'month': month,
+        'month_date': start_date,
+        'calendar_weeks': calendar_weeks,
+        'day_names': DAY_NAMES,
+        'month_exercise_count': len(exercise_days),
+        'month_measurements': month_measurements,
+    }
+
+
+def charts_context(user, today):
+    """Series históricas completas para el gráfico de evolución"""
+    weight_data = [
+        {
+            'date': measurement.measurement_date.strftime('%Y-%m-%d'),
+            'weight': float(measurement.weight),
+            'bmi': float(measurement.bmi),
+        }
+        for measurement in BodyMeasurements.objects.filter(user=user)
+        .only('measurement_date', 'weight', 'height')
+        .order_by('measurement_date')
+    ]
+
+    body_fat_data, muscle_data, ica_data = [], [], []
+    compositions = BodyCompositionHistory.objects.filter(user=user).values_list(
+        'measurement_date', 'body_fat_percentage', 'muscle_mass', 'ica'
+    ).order_by('measurement_date')
+    for measurement_date, body_fat, muscle, ica in compositions:
+        label = measurement_date.strftime('%Y-%m-%d')
+        if body_fat:
+            body_fat_data.append({'date': label, 'body_fat': float(body_fat)})
+        if muscle:
+            muscle_data.append({'date': label, 'muscle': float(muscle)})
+        if ica:
+            ica_data.append({'date': label, 'ica': float(ica)})
+
+    first_measurement_date = (
+        date.fromisoformat(weight_data[0]['date']) if weight_data else today
+    )
+    return {
+        'weight_data': json.dumps(weight_data),
+        'body_fat_data': json.dumps(body_fat_data),
+        'muscle_data': json.dumps(muscle_data),
+        'ica_data': json.dumps(ica_data),
+        'has_chart_data': bool(weight_data or body_fat_data or muscle_data or ica_data),
+        'first_measurement_date': first_measurement_date,
+        'today_date': today,
+    }
+
+
+def food_context(user, today):
+    """Comidas de las últimas semanas agrupadas por semana ISO, incluidas las ya archivadas"""
+    history = FoodDiaryArchive.get_history(
+        user, today - timedelta(weeks=FOOD_WEEKS_BACK), today, limit=FOOD_MAX_ENTRIES,
+    )
+    # get_history ordena de la más antigua a la más reciente
+    entries = [FoodDiaryArchive.deserialize_entry(entry, user) for entry in reversed(history)]
+
+    food_by_week = {}
+    for entry in entries:
+        week_year, week_num = iso_week(entry.meal_date)
+        week = food_by_week.get((week_year, week_num))
+        if week is None:
+            week_start, week_end = iso_week_bounds(week_year, week_num)
+            week = food_by_week[(week_year, week_num)] = {
+                'week_start': week_start,
+                'week_end': week_end,
+                'week_num': week_num,
+                'year': week_year,
+                'entries': [],
+            }
+        week['entries'].append(entry)
+
+    return {
+        'food_by_week': [food_by_week[key] for key in sorted(food_by_week, reverse=True)],
+        'total_food_entries': len(entries),
+    }
+
+
+def render_section(request, user, section, year=None, month=None):
+    """HTML de una sección del modal, leído de la caché cuando es posible"""
+    today = date.today()
+    cache_key = None
+    if getattr(settings, 'SHARED_CACHE', False):
+        if section == 'calendar':
+            cache_key = _section_cache_key(user.pk, section, year, month)
+        else:
+            cache_key = _section_cache_key(user.pk, section, today.isoformat())
+
+        html = cache.get(cache_key)
+        if html is not None:
+            return html
+
+    if section == 'summary':
+        context = summary_context(user, today)
+    elif section == 'calendar':
+        context = calendar_context(user, year, month)
+    elif section == 'charts':
+        context = charts_context(user, today)
+    else:
+        context = food_context(user, today)
+    context['user'] = user
+
+    html = render_to_string(f'admin_panel/user_detail_{section}.html', context, request=request)
+    if cache_key is not None:
+        cache.set(cache_key, html, SECTION_CACHE_TIMEOUT)
+    return html
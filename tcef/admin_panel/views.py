@@ -1,7 +1,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.db.models import Count, Q
@@ -11,12 +11,37 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.urls import reverse
+from django.template.loader import render_to_string
+import csv
 import json
 from datetime import datetime, timedelta
 
-from .models import UserGroup, UserGroupMembership, CustomRoutine, AdminActivity, VideoUploadSession, Video, RoutineVideo, PasswordResetApproval, UserApprovalRequest
+from .models import UserGroup, UserGroupMembership, CustomRoutine, AdminActivity, VideoUploadSession, Video, RoutineVideo, RoutineTemplate, PasswordResetApproval, UserApprovalRequest, NotificationReadState
 from app.models import UserProfile, ExerciseLog, BodyMeasurements, BodyCompositionHistory, FoodDiary
+from . import counters as dashboard_counters
+from . import scheduling
+from .monitoring import (
+    MONITORING_SORTS, build_user_metrics, filter_monitoring_queryset, iter_user_metrics,
+    monitoring_page, monitoring_queryset, parse_monitoring_filters,
+)
+from .reports import (
+    DEFAULT_ADHERENCE_WEEKS, MAX_ADHERENCE_WEEKS, clamp_report_range,
+    food_compliance_matrix, group_adherence,
+)
+from .member_import import (
+    IMPORT_COLUMNS, WEB_MAX_ROWS, MemberImportError, import_members, read_members_csv, validate_members,
+)
+from .notification_feed import (
+    FEED_KINDS, feed_cursor, is_unread, parse_feed_cursor, parse_timestamp, pending_page, pending_since,
+    resolved_since, serialize_item, unread_counts,
+)
+from .routine_details import render_routine_details
+from .user_detail import SECTIONS as USER_DETAIL_SECTIONS, render_section
+from app.throttling import throttled_today
+from app.user_context import invalidate_user_context
+from app.calendar_utils import shift_month, week_start
 
 import boto3
 from botocore.exceptions import ClientError
@@ -31,32 +56,21 @@ def is_staff_user(user):
 @user_passes_test(is_staff_user, login_url='/login/')
 def admin_dashboard(request):
     """Dashboard principal del panel de administración"""
-    # Estadísticas generales
-    total_users = User.objects.count()
-    active_users = UserProfile.objects.filter(is_approved=True).count()
-    total_groups = UserGroup.objects.filter(is_active=True).count()
-    total_routines = CustomRoutine.objects.filter(is_active=True).count()
-    
-    # Actividad reciente
-    recent_activities = AdminActivity.objects.select_related('admin_user')[:10]
-    
-    # Usuarios recientes
-    recent_users = User.objects.select_related('userprofile').order_by('-date_joined')[:5]
-    
-    # Rutinas de hoy
-    today_routines = CustomRoutine.objects.filter(
-        assigned_date=timezone.now().date(),
-        is_active=True
-    ).select_related('group')
+    # Estadísticas generales (contadores en caché mantenidos por señales)
+    stats = dashboard_counters.get_counters()
     
     context = {
-        'total_users': total_users,
-        'active_users': active_users,
-        'total_groups': total_groups,
-        'total_routines': total_routines,
-        'recent_activities': recent_activities,
-        'recent_users': recent_users,
-        'today_routines': today_routines,
+        'total_users': stats['total_users'],
+        'active_users': stats['active_users'],
+        'total_groups': stats['total_groups'],
+        'total_routines': stats['total_routines'],
+        # Actividad reciente, usuarios recientes y rutinas de hoy
+        'recent_activities': dashboard_counters.recent_activities(),
+        'recent_users': dashboard_counters.recent_users(),
+        'today_routines': dashboard_counters.today_routines(),
+        'today_template_routines': dashboard_counters.today_template_routines(),
+        # Intentos de login rechazados hoy por el límite de intentos fallidos
+        'throttled_logins': throttled_today(),
     }
     
     return render(request, 'admin_panel/dashboard.html', context)
@@ -205,6 +219,52 @@ def create_user(request):
     return render(request, 'admin_panel/create_user.html', context)
 
 
+@user_passes_test(is_staff_user, login_url='/login/')
+def import_members_csv(request):
+    """Importar miembros desde un CSV (validación completa antes de escribir)"""
+    groups = UserGroup.objects.filter(is_active=True)
+    import_errors = []
+    
+    if request.method == 'POST':
+        csv_file = request.FILES.get('csv_file')
+        group_id = request.POST.get('group', '')
+        default_group = groups.filter(id=group_id).first() if group_id.isdigit() else None
+        
+        if not csv_file:
+            messages.error(request, 'Selecciona un archivo CSV.')
+        else:
+            try:
+                rows = read_members_csv(csv_file.read())
+                if len(rows) > WEB_MAX_ROWS:
+                    # Las contraseñas se hashean en serie en este worker
+                    messages.error(
+                        request,
+                        f'El archivo tiene {len(rows)} filas; desde el panel se importan como máximo '
+                        f'{WEB_MAX_ROWS}. Divide el archivo o usa el comando import_members.'
+                    )
+                elif request.POST.get('dry_run') == 'on':
+                    validate_members(rows, default_group)
+                    messages.success(request, f'El archivo es válido: {len(rows)} miembros listos para importar.')
+                else:
+                    users = import_members(rows, request.user, default_group)
+                    messages.success(request, f'{len(users)} miembros importados exitosamente.')
+                    return redirect('admin_panel:user_management')
+            except UnicodeDecodeError:
+                messages.error(request, 'El archivo debe estar codificado en UTF-8.')
+            except MemberImportError as e:
+                import_errors = e.errors
+                messages.error(request, f'{e}; no se importó ningún miembro.')
+    
+    context = {
+        'groups': groups,
+        'import_errors': import_errors,
+        'columns': IMPORT_COLUMNS,
+        'max_rows': WEB_MAX_ROWS,
+    }
+    
+    return render(request, 'admin_panel/import_members.html', context)
+
+
 @user_passes_test(is_staff_user, login_url='/login/')
 def edit_user(request, user_id):
     """Editar usuario"""
@@ -467,6 +527,31 @@ def routine_management(request):
     return render(request, 'admin_panel/routine_management.html', context)
 
 
+def _ordered_videos_from_post(post):
+    """
+    Videos seleccionados en el formulario de rutina, ordenados por su campo
+    ``video_order_<id>`` (los IDs inexistentes se ignoran). Una sola consulta.
+    """
+    video_ids = [video_id for video_id in post.getlist('videos') if video_id and video_id.isdigit()]
+    videos_by_id = Video.objects.in_bulk([int(video_id) for video_id in video_ids])
+    
+    video_orders = []
+    for video_id in video_ids:
+        video = videos_by_id.get(int(video_id))
+        if video is None:
+            continue
+        # Obtener el orden personalizado del formulario; convertir a entero y validar
+        try:
+            order = max(int(post.get(f'video_order_{video_id}', 1)), 1)
+        except (ValueError, TypeError):
+            order = 1
+        video_orders.append((video, order))
+    
+    # Ordenar por el orden especificado
+    video_orders.sort(key=lambda x: x[1])
+    return [video for video, _ in video_orders]
+
+
 @user_passes_test(is_staff_user, login_url='/login/')
 def create_routine(request):
     """Crear nueva rutina personalizada"""
@@ -475,51 +560,26 @@ def create_routine(request):
         description = request.POST.get('description')
         group_id = request.POST.get('group')
         assigned_date = request.POST.get('assigned_date')
-        video_ids = request.POST.getlist('videos')  # Lista de IDs de videos
         
         try:
             group = UserGroup.objects.get(id=group_id)
+            videos = _ordered_videos_from_post(request.POST)
             
-            routine = CustomRoutine.objects.create(
-                title=title,
-                description=description,
-                group=group,
-                assigned_date=assigned_date,
-                created_by=request.user
-            )
-            
-            # Crear lista de videos con sus órdenes
-            video_orders = []
-            for video_id in video_ids:
-                if video_id:
-                    try:
-                        video = Video.objects.get(id=video_id)
-                        # Obtener el orden personalizado del formulario
-                        order_key = f'video_order_{video_id}'
-                        order = request.POST.get(order_key, 1)
-                        
-                        # Convertir a entero y validar
-                        try:
-                            order = int(order)
-                            if order < 1:
-                                order = 1
-                        except (ValueError, TypeError):
-                            order = 1
-                        
-                        video_orders.append((video, order))
-                    except Video.DoesNotExist:
-                        pass
-            
-            # Ordenar por el orden especificado y asignar órdenes únicos
-            video_orders.sort(key=lambda x: x[1])  # Ordenar por el orden especificado
-            
-            # Crear los RoutineVideo con órdenes únicos secuenciales
-            for index, (video, original_order) in enumerate(video_orders, 1):
-                RoutineVideo.objects.create(
-                    routine=routine,
-                    video=video,
-                    order=index  # Usar índice secuencial para evitar duplicados
+            # Rutina y videos juntos: si algo falla no queda una rutina a medias
+            with transaction.atomic():
+                routine = CustomRoutine.objects.create(
+                    title=title,
+                    description=description,
+                    group=group,
+                    assigned_date=assigned_date,
+                    created_by=request.user
                 )
+                
+                # Órdenes únicos secuenciales para evitar duplicados
+                RoutineVideo.objects.bulk_create([
+                    RoutineVideo(routine=routine, video=video, order=index)
+                    for index, video in enumerate(videos, 1)
+                ])
             
             AdminActivity.objects.create(
                 admin_user=request.user,
@@ -560,46 +620,12 @@ def edit_routine(request, routine_id):
         routine.group_id = request.POST.get('group')
         routine.assigned_date = request.POST.get('assigned_date')
         routine.is_active = request.POST.get('is_active') == 'on'
-        routine.save()
-        
-        # Manejar videos de la rutina
-        video_ids = request.POST.getlist('videos')
-        
-        # Eliminar videos existentes
-        routine.routine_videos.all().delete()
-        
-        # Crear lista de videos con sus órdenes
-        video_orders = []
-        for video_id in video_ids:
-            if video_id:
-                try:
-                    video = Video.objects.get(id=video_id)
-                    # Obtener el orden personalizado del formulario
-                    order_key = f'video_order_{video_id}'
-                    order = request.POST.get(order_key, 1)
-                    
-                    # Convertir a entero y validar
-                    try:
-                        order = int(order)
-                        if order < 1:
-                            order = 1
-                    except (ValueError, TypeError):
-                        order = 1
-                    
-                    video_orders.append((video, order))
-                except Video.DoesNotExist:
-                    pass
+        videos = _ordered_videos_from_post(request.POST)
         
-        # Ordenar por el orden especificado y asignar órdenes únicos
-        video_orders.sort(key=lambda x: x[1])  # Ordenar por el orden especificado
-        
-        # Crear los RoutineVideo con órdenes únicos secuenciales
-        for index, (video, original_order) in enumerate(video_orders, 1):
-            RoutineVideo.objects.create(
-                routine=routine,
-                video=video,
-                order=index  # Usar índice secuencial para evitar duplicados
-            )
+        with transaction.atomic():
+            routine.save()
+            # Solo inserta, elimina o renumera los videos que cambiaron
+            routine.set_videos(videos)
         
         AdminActivity.objects.create(
             admin_user=request.user,
@@ -963,73 +989,6 @@ def delete_video(request, video_id):
     return render(request, 'admin_panel/delete_video.html', context)
 
 
-@user_passes_test(is_staff_user, login_url='/login/')
-def user_monitoring(request):
-    """Monitoreo de actividad de usuarios"""
-    user_id = request.GET.get('user_id')
-    date_from = request.GET.get('date_from', '')
-    date_to = request.GET.get('date_to', '')
-    
-    if user_id:
-        # Vista específica de un usuario
-        user = get_object_or_404(User, id=user_id)
-        exercise_logs = ExerciseLog.objects.filter(user=user).order_by('-exercise_date')
-        
-        # Estadísticas del usuario
-        total_exercises = exercise_logs.count()
-        this_month = exercise_logs.filter(
-            exercise_date__month=timezone.now().month,
-            exercise_date__year=timezone.now().year
-        ).count()
-        
-        # Dificultades
-        difficulties = exercise_logs.values('difficulty').annotate(count=Count('difficulty'))
-        
-        context = {
-            'selected_user': user,
-            'exercise_logs': exercise_logs,
-            'total_exercises': total_exercises,
-            'this_month': this_month,
-            'difficulties': difficulties,
-        }
-        
-        return render(request, 'admin_panel/user_monitoring_detail.html', context)
-    
-    # Vista general de todos los usuarios
-    users = User.objects.select_related('userprofile').prefetch_related('exercise_logs')
-    
-    # Filtros de fecha
-    if date_from:
-        try:
-            from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
-            users = users.filter(exercise_logs__exercise_date__gte=from_date)
-        except ValueError:
-            pass
-    
-    if date_to:
-        try:
-            to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
-            users = users.filter(exercise_logs__exercise_date__lte=to_date)
-        except ValueError:
-            pass
-    
-    # Agregar estadísticas a cada usuario
-    for user in users:
-        user.exercise_count = user.exercise_logs.count()
-        user.last_exercise = user.exercise_logs.order_by('-exercise_date').first()
-    
-    # Ordenar por actividad
-    users = sorted(users, key=lambda x: x.exercise_count, reverse=True)
-    
-    context = {
-        'users': users,
-        'date_from': date_from,
-        'date_to': date_to,
-    }
-    
-    return render(request, 'admin_panel/user_monitoring.html', context)
-
-
 @user_passes_test(is_staff_user, login_url='/login/')
 def admin_activity_log(request):
     """Registro de actividades administrativas"""
@@ -1085,286 +1044,284 @@ def admin_activity_log(request):
 
 @user_passes_test(is_staff_user, login_url='/login/')
 def routine_details(request, routine_id):
-    """Obtener detalles de una rutina para mostrar en modal"""
+    """Obtener detalles de una rutina para mostrar en modal (fragmento en caché)"""
     try:
-        routine = get_object_or_404(CustomRoutine, id=routine_id)
-        
-        # Obtener videos de la rutina ordenados
-        routine_videos = routine.get_videos_ordered()
-        
-        # Formatear fechas manualmente
-        assigned_date_str = routine.assigned_date.strftime("%d/%m/%Y")
-        created_date_str = routine.created_at.strftime("%d/%m/%Y %H:%M")
-        
-        # Generar HTML para el modal
-        html_content = f"""
-        <div class="row">
-            <div class="col-md-6">
-                <h6 class="text-primary">Información General</h6>
-                <table class="table table-sm">
-                    <tr>
-                        <td><strong>Título:</strong></td>
-                        <td>{routine.title}</td>
-                    </tr>
-                    <tr>
-                        <td><strong>Descripción:</strong></td>
-                        <td>{routine.description}</td>
-                    </tr>
-                    <tr>
-                        <td><strong>Grupo:</strong></td>
-                        <td>
-                            <span class="badge" style="background-color: {routine.group.color}; color: white;">
-                                {routine.group.name}
-                            </span>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td><strong>Fecha:</strong></td>
-                        <td>{assigned_date_str}</td>
-                    </tr>
-                    <tr>
-                        <td><strong>Estado:</strong></td>
-                        <td>
-                            <span class="badge bg-{'success' if routine.is_active else 'secondary'}">
-                                {'Activa' if routine.is_active else 'Inactiva'}
-                            </span>
-                        </td>
-                    </tr>
-                    <tr>
-                        <td><strong>Creado por:</strong></td>
-                        <td>{routine.created_by.username}</td>
-                    </tr>
-                    <tr>
-                        <td><strong>Creado:</strong></td>
-                        <td>{created_date_str}</td>
-                    </tr>
-                </table>
-            </div>
-            <div class="col-md-6">
-                <h6 class="text-primary">Estadísticas</h6>
-                <table class="table table-sm">
-                    <tr>
-                        <td><strong>Total de videos:</strong></td>
-                        <td>{routine.get_videos_count()}</td>
-                    </tr>
-                    <tr>
-                        <td><strong>Duración total:</strong></td>
-                        <td>{routine.get_total_duration()}</td>
-                    </tr>
-                </table>
-            </div>
-        </div>
-        """
-        
-        if routine_videos:
-            html_content += f"""
-        <hr>
-        <h6 class="text-primary">Videos de la Rutina</h6>
-        <div class="table-responsive">
-            <table class="table table-sm table-hover">
-                <thead class="table-dark">
-                    <tr>
-                        <th>Orden</th>
-                        <th>Título</th>
-                        <th>Duración</th>
-                        <th>Tamaño</th>
-                        <th>Preview</th>
-                    </tr>
-                </thead>
-                <tbody>
-            """
-            
-            for routine_video in routine_videos:
-                video = routine_video.video
-                description_snippet = f'<br><small class="text-muted">{video.description[:50]}...</small>' if video.description else ''
-                html_content += f"""
-                    <tr>
-                        <td>
-                            <span class="badge bg-primary">{routine_video.order}</span>
-                        </td>
-                        <td>
-                            <strong>{video.title}</strong>
-                            {description_snippet}
-                        </td>
-                        <td>{video.get_duration_formatted()}</td>
-                        <td>{video.get_file_size_formatted()}</td>
-                        <td>
-                            <button type="button" class="btn btn-sm btn-outline-primary" 
-                                    onclick="showVideoPreview('{video.s3_url}', '{video.title}')" 
-                                    title="Ver preview del video">
-                                <i class="fas fa-play"></i>
-                            </button>
-                        </td>
-                    </tr>
-                """
-            
-            html_content += """
-                </tbody>
-            </table>
-        </div>
-            """
-        else:
-            html_content += """
-        <hr>
-        <div class="alert alert-info">
-            <i class="fas fa-info-circle me-2"></i>
-            Esta rutina no tiene videos asignados.
-        </div>
-            """
-        
-        return JsonResponse({
-            'success': True,
-            'html': html_content
-        })
-        
-    except Exception as e:
+        html_content = render_routine_details(routine_id)
+    except CustomRoutine.DoesNotExist:
         return JsonResponse({
             'success': False,
-            'error': str(e)
-        })
+            'error': 'La rutina no existe.'
+        }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'html': html_content
+    })
 
 
 @user_passes_test(is_staff_user, login_url='/login/')
 def replicate_routine(request, routine_id):
-    """Replicar rutina a otros grupos y fechas"""
+    """Replicar rutina a otros grupos y fechas (con vista previa de conflictos)"""
     routine = get_object_or_404(CustomRoutine, id=routine_id)
+    plan = None
+    selected_group_ids = []
+    selected_dates = []
     
     if request.method == 'POST':
-        group_ids = request.POST.getlist('groups')
-        dates = request.POST.getlist('dates')
+        selected_group_ids = request.POST.getlist('groups')
+        dates, _ = scheduling.parse_dates(request.POST.getlist('dates'))
+        selected_dates = [date_obj.isoformat() for date_obj in dates]
         
-        if not group_ids or not dates:
+        if not selected_group_ids or not dates:
             messages.error(request, 'Debes seleccionar al menos un grupo y una fecha.')
             return redirect('admin_panel:replicate_routine', routine_id=routine_id)
         
+        plan = scheduling.plan_replication(routine, selected_group_ids, dates)
+        
+        if 'preview' not in request.POST:
+            try:
+                replicated = scheduling.replicate_routine(plan, request.user)
+            except IntegrityError:
+                messages.error(
+                    request,
+                    'Otra rutina se asignó a uno de los grupos y fechas mientras tanto. '
+                    'Revisa la vista previa y vuelve a intentar.'
+                )
+                plan = scheduling.plan_replication(routine, selected_group_ids, dates)
+            else:
+                if replicated:
+                    skipped = f' ({len(plan.conflicts)} omitidas por conflicto)' if plan.conflicts else ''
+                    messages.success(request, f'Rutina replicada exitosamente {len(replicated)} veces{skipped}.')
+                else:
+                    messages.warning(request, 'No se pudo replicar la rutina. Verifica que los grupos y fechas sean válidos.')
+                return redirect('admin_panel:routine_management')
+    
+    groups = UserGroup.objects.filter(is_active=True)
+    
+    context = {
+        'routine': routine,
+        'groups': groups,
+        'plan': plan,
+        'selected_group_ids': [int(group_id) for group_id in selected_group_ids if group_id.isdigit()],
+        'selected_dates': selected_dates,
+    }
+    
+    return render(request, 'admin_panel/replicate_routine.html', context)
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def clone_schedule(request):
+    """Clonar la programación de un grupo en un rango de fechas a otro grupo, desplazada N días"""
+    groups = UserGroup.objects.filter(is_active=True)
+    plan = None
+    form = {
+        'source_group': request.POST.get('source_group', ''),
+        'target_group': request.POST.get('target_group', ''),
+        'start_date': request.POST.get('start_date', ''),
+        'end_date': request.POST.get('end_date', ''),
+        'offset_days': request.POST.get('offset_days', '28'),
+    }
+    
+    if request.method == 'POST':
         try:
-            replicated_count = 0
-            for group_id in group_ids:
-                for date_str in dates:
+            source_group = UserGroup.objects.get(id=form['source_group'])
+            target_group = UserGroup.objects.get(id=form['target_group'])
+            start_date = datetime.strptime(form['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(form['end_date'], '%Y-%m-%d').date()
+            offset_days = int(form['offset_days'])
+        except (UserGroup.DoesNotExist, ValueError):
+            messages.error(request, 'Selecciona los grupos, un rango de fechas válido y el desplazamiento en días.')
+        else:
+            if end_date < start_date:
+                messages.error(request, 'La fecha de fin debe ser posterior a la de inicio.')
+            elif (end_date - start_date).days >= scheduling.MAX_CLONE_DAYS:
+                messages.error(request, f'El rango no puede superar {scheduling.MAX_CLONE_DAYS} días.')
+            elif source_group == target_group and offset_days == 0:
+                messages.error(request, 'Para clonar en el mismo grupo el desplazamiento no puede ser 0.')
+            else:
+                plan = scheduling.plan_schedule_clone(source_group, target_group, start_date, end_date, offset_days)
+                
+                if 'preview' not in request.POST:
                     try:
-                        group = UserGroup.objects.get(id=group_id)
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        
-                        # Verificar si ya existe una rutina para este grupo y fecha
-                        if CustomRoutine.objects.filter(group=group, assigned_date=date_obj).exists():
-                            continue  # Saltar si ya existe
-                        
-                        # Crear nueva rutina
-                        new_routine = CustomRoutine.objects.create(
-                            title=f"{routine.title} (Replicada)",
-                            description=routine.description,
-                            group=group,
-                            assigned_date=date_obj,
-                            created_by=request.user
+                        created = scheduling.clone_schedule(plan, request.user)
+                    except IntegrityError:
+                        messages.error(
+                            request,
+                            'Otra rutina se asignó a una de las fechas de destino mientras tanto. '
+                            'Revisa la vista previa y vuelve a intentar.'
                         )
-                        
-                        # Replicar videos con el mismo orden
-                        for routine_video in routine.get_videos_ordered():
-                            RoutineVideo.objects.create(
-                                routine=new_routine,
-                                video=routine_video.video,
-                                order=routine_video.order,
-                                notes=routine_video.notes
+                        plan = scheduling.plan_schedule_clone(
+                            source_group, target_group, start_date, end_date, offset_days
+                        )
+                    else:
+                        if created:
+                            skipped = created < len(plan.to_create) + len(plan.conflicts)
+                            messages.success(
+                                request,
+                                f'Se clonaron {created} rutinas a {target_group.name}'
+                                f'{" (las fechas ocupadas se omitieron)" if skipped else ""}.'
                             )
-                        
-                        replicated_count += 1
-                        
-                    except (UserGroup.DoesNotExist, ValueError) as e:
-                        continue
+                        else:
+                            messages.warning(request, 'No había rutinas para clonar en fechas libres del grupo destino.')
+                        return redirect('admin_panel:routine_management')
+    
+    context = {
+        'groups': groups,
+        'plan': plan,
+        'form': form,
+    }
+    
+    return render(request, 'admin_panel/clone_schedule.html', context)
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def routine_templates(request):
+    """Rutinas recurrentes: plantillas semanales que se expanden al leer el calendario"""
+    group_filter = request.GET.get('group', '')
+    
+    templates = RoutineTemplate.objects.select_related('group', 'created_by').annotate(
+        videos_count=Count('template_videos')
+    ).order_by('group__name', 'weekday', 'start_date')
+    if group_filter:
+        templates = templates.filter(group_id=group_filter)
+    
+    paginator = Paginator(templates, 15)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'groups': UserGroup.objects.filter(is_active=True),
+        'group_filter': group_filter,
+    }
+    
+    return render(request, 'admin_panel/routine_templates.html', context)
+
+
+def _routine_template_from_post(template, post):
+    """Copia el formulario a la plantilla; lanza ValueError con el mensaje para el usuario"""
+    template.title = post.get('title', '').strip()
+    template.description = post.get('description', '')
+    template.is_active = post.get('is_active') == 'on'
+    
+    if not template.title:
+        raise ValueError('El título es requerido.')
+    try:
+        template.group = UserGroup.objects.get(id=post.get('group'))
+    except (UserGroup.DoesNotExist, ValueError):
+        raise ValueError('El grupo seleccionado no existe.')
+    try:
+        template.weekday = int(post.get('weekday'))
+    except (TypeError, ValueError):
+        template.weekday = None
+    if template.weekday not in dict(RoutineTemplate.WEEKDAY_CHOICES):
+        raise ValueError('Selecciona un día de la semana válido.')
+    try:
+        template.start_date = datetime.strptime(post.get('start_date', ''), '%Y-%m-%d').date()
+        end_date = post.get('end_date')
+        template.end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        raise ValueError('Las fechas no son válidas.')
+    if template.end_date and template.end_date < template.start_date:
+        raise ValueError('La fecha de fin debe ser posterior a la de inicio.')
+
+
+def _routine_template_form(request, template):
+    """Crear o editar una plantilla (``template.pk`` es None al crear)"""
+    creating = template.pk is None
+    
+    if request.method == 'POST':
+        try:
+            _routine_template_from_post(template, request.POST)
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            videos = _ordered_videos_from_post(request.POST)
+            with transaction.atomic():
+                template.save()
+                template.set_videos(videos)
             
             AdminActivity.objects.create(
                 admin_user=request.user,
-                action='routine_replicated',
-                target_model='CustomRoutine',
-                target_id=routine.id,
-                details=f'Rutina replicada {replicated_count} veces: {routine.title}'
+                action='routine_created' if creating else 'routine_updated',
+                target_model='RoutineTemplate',
+                target_id=template.id,
+                details=f'Rutina recurrente {"creada" if creating else "actualizada"}: {template.title}'
             )
             
-            if replicated_count > 0:
-                messages.success(request, f'Rutina replicada exitosamente {replicated_count} veces.')
-            else:
-                messages.warning(request, 'No se pudo replicar la rutina. Verifica que los grupos y fechas sean válidos.')
-            
-            return redirect('admin_panel:routine_management')
-            
-        except Exception as e:
-            messages.error(request, f'Error al replicar la rutina: {str(e)}')
+            messages.success(
+                request, f'Rutina recurrente {template.title} {"creada" if creating else "actualizada"} exitosamente.'
+            )
+            return redirect('admin_panel:routine_templates')
     
-    groups = UserGroup.objects.filter(is_active=True)
+    if creating:
+        current_video_ids = [int(video_id) for video_id in request.POST.getlist('videos') if video_id.isdigit()]
+    else:
+        current_video_ids = list(template.template_videos.order_by('order').values_list('video_id', flat=True))
     
     context = {
-        'routine': routine,
-        'groups': groups,
+        'template': template,
+        'creating': creating,
+        'groups': UserGroup.objects.filter(is_active=True),
+        'videos': Video.objects.filter(is_active=True).order_by('-created_at'),
+        'weekdays': RoutineTemplate.WEEKDAY_CHOICES,
+        'current_video_ids': current_video_ids,
     }
     
-    return render(request, 'admin_panel/replicate_routine.html', context)
+    return render(request, 'admin_panel/routine_template_form.html', context)
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def create_routine_template(request):
+    """Crear rutina recurrente"""
+    return _routine_template_form(
+        request, RoutineTemplate(created_by=request.user, start_date=timezone.now().date())
+    )
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def edit_routine_template(request, template_id):
+    """Editar rutina recurrente"""
+    return _routine_template_form(request, get_object_or_404(RoutineTemplate, id=template_id))
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+@require_http_methods(["POST"])
+def delete_routine_template(request, template_id):
+    """Eliminar rutina recurrente (las rutinas explícitas del grupo no cambian)"""
+    template = get_object_or_404(RoutineTemplate, id=template_id)
+    template_title = template.title
+    template.delete()
+    
+    AdminActivity.objects.create(
+        admin_user=request.user,
+        action='routine_deleted',
+        target_model='RoutineTemplate',
+        target_id=template_id,
+        details=f'Rutina recurrente eliminada: {template_title}'
+    )
+    
+    messages.success(request, f'Rutina recurrente {template_title} eliminada exitosamente.')
+    return redirect('admin_panel:routine_templates')
 
 
 @user_passes_test(is_staff_user, login_url='/login/')
 def user_monitoring(request):
     """Vista principal de monitoreo de usuarios con tabla de métricas del mes actual"""
-    from datetime import date
-    from django.db.models import Count, Q, Avg, Max
-    
     # Obtener el mes actual
     current_date = timezone.now().date()
     current_year = current_date.year
     current_month = current_date.month
     
-    # Obtener todos los usuarios con perfil aprobado
-    users = User.objects.filter(
-        userprofile__is_approved=True
-    ).select_related('userprofile').prefetch_related(
-        'exercise_logs', 'body_measurements', 'body_composition_history'
-    )
-    
-    # Calcular métricas para cada usuario del mes actual
-    user_metrics = []
-    
-    for user in users:
-        # Ejercicios del mes actual
-        month_exercises = ExerciseLog.get_month_exercises(user, current_year, current_month)
-        exercise_count = month_exercises.count()
-        
-        # Calcular días laborables del mes (lunes a viernes)
-        import calendar
-        month_days = calendar.monthrange(current_year, current_month)[1]
-        weekdays_in_month = 0
-        for day in range(1, month_days + 1):
-            if calendar.weekday(current_year, current_month, day) < 5:  # 0-4 = lunes a viernes
-                weekdays_in_month += 1
-        
-        # Racha actual (semanas consecutivas con 5+ ejercicios)
-        current_streak = ExerciseLog.get_current_week_streak(user)
-        
-        # Mejor racha (semanas consecutivas con 5+ ejercicios)
-        best_streak = ExerciseLog.get_longest_week_streak(user)
-        
-        # Medidas más recientes (sin importar el mes, las últimas que haya ingresado)
-        latest_measurement = BodyMeasurements.objects.filter(user=user).order_by('-measurement_date').first()
-        latest_composition = BodyCompositionHistory.objects.filter(user=user).order_by('-measurement_date').first()
-        
-        # Progreso mensual basado en días laborables (igual que en exercise_stats)
-        monthly_progress = min((exercise_count / weekdays_in_month * 100), 100) if weekdays_in_month > 0 else 0
-        
-        user_metrics.append({
-            'user': user,
-            'exercise_count': exercise_count,
-            'current_streak': current_streak,
-            'best_streak': best_streak,
-            'monthly_progress': round(monthly_progress, 1),
-            'latest_weight': latest_measurement.weight if latest_measurement else None,
-            'latest_bmi': latest_measurement.bmi if latest_measurement else None,
-            'latest_body_fat': latest_composition.body_fat_percentage if latest_composition else None,
-            'latest_muscle': latest_composition.muscle_mass if latest_composition else None,
-            'latest_ica': latest_composition.ica if latest_composition else None,
-        })
-    
-    # Ordenar por progreso mensual descendente
-    user_metrics.sort(key=lambda x: x['monthly_progress'], reverse=True)
+    # Filtros, orden y primera página evaluados en la base de datos
+    filters = parse_monitoring_filters(request.GET)
+    users = filter_monitoring_queryset(monitoring_queryset(current_year, current_month), filters)
+    page_users, next_cursor = monitoring_page(users, filters['sort'])
     
     context = {
-        'user_metrics': user_metrics,
+        'user_metrics': build_user_metrics(page_users),
+        'total_users': users.count(),
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'groups': UserGroup.objects.filter(is_active=True),
         'current_year': current_year,
         'current_month': current_month,
         'current_date': current_date,
@@ -1374,242 +1331,120 @@ def user_monitoring(request):
 
 
 @user_passes_test(is_staff_user, login_url='/login/')
-def user_detail_modal(request, user_id):
-    """Vista AJAX para obtener detalles de un usuario específico"""
-    from datetime import date, timedelta
-    from django.db.models import Count, Q
-    
-    user = get_object_or_404(User, id=user_id)
-    
-    # Obtener parámetros de fecha y validar/normalizar
+def user_monitoring_page(request):
+    """Página siguiente (o filtrada) de la tabla de monitoreo en formato JSON"""
     current_date = timezone.now().date()
-    year = int(request.GET.get('year', current_date.year))
-    month = int(request.GET.get('month', current_date.month))
-    
-    # Normalizar mes y año si están fuera de rango
-    if month < 1:
-        month = 12
-        year -= 1
-    elif month > 12:
-        month = 1
-        year += 1
-    
-    # Asegurar que el mes esté en el rango válido (1-12)
-    month = max(1, min(12, month))
-    
-    # Ejercicios del mes seleccionado
-    month_exercises = ExerciseLog.get_month_exercises(user, year, month)
-    exercise_dates = [ex.exercise_date.day for ex in month_exercises]  # Solo los días del mes
-    
-    # Generar calendario tradicional con semanas en filas
-    import calendar
-    cal = calendar.monthcalendar(year, month)
-    day_names = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    
-    # Crear estructura de calendario tradicional: semanas en filas
-    calendar_weeks = []
-    for week in cal:
-        week_days = []
-        for day in week:
-            if day != 0:  # Día del mes actual
-                day_date = date(year, month, day)
-                weekday = day_date.weekday()  # 0=Lunes, 6=Domingo
-                has_exercise = day in exercise_dates
-                week_days.append({
-                    'day': day,
-                    'weekday': weekday,
-                    'weekday_name': day_names[weekday],
-                    'has_exercise': has_exercise,
-                    'is_current_month': True
-                })
-            else:  # Día de otro mes (para completar la semana)
-                week_days.append({
-                    'day': None,
-                    'weekday': None,
-                    'weekday_name': '',
-                    'has_exercise': False,
-                    'is_current_month': False
-                })
-        calendar_weeks.append(week_days)
-    
-    reordered_day_names = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-    
-    # Debug: imprimir información para verificar (solo en desarrollo)
-    # print(f"Debug - User: {user.username}, Year: {year}, Month: {month}")
-    # print(f"Debug - Exercise dates found: {exercise_dates}")
-    # print(f"Debug - Total exercises: {month_exercises.count()}")
-    
-    # Estadísticas del mes
-    total_exercises = month_exercises.count()
-    days_in_month = 30  # Aproximación
-    exercise_percentage = (total_exercises / days_in_month * 100) if days_in_month > 0 else 0
-    
-    # Racha actual y mejor racha (semanas consecutivas con 5+ ejercicios)
-    current_streak = ExerciseLog.get_current_week_streak(user)
-    best_streak = ExerciseLog.get_longest_week_streak(user)
-    
-    # Medidas corporales del mes (para la tabla detallada)
-    month_measurements = BodyMeasurements.objects.filter(
-        user=user,
-        measurement_date__year=year,
-        measurement_date__month=month
-    ).order_by('measurement_date')
-    
-    # Composición corporal del mes (para la tabla detallada)
-    month_composition = BodyCompositionHistory.objects.filter(
-        user=user,
-        measurement_date__year=year,
-        measurement_date__month=month
-    ).order_by('measurement_date')
-    
-    # Obtener el ÚLTIMO registro de medidas (independiente del mes seleccionado)
-    latest_measurement = BodyMeasurements.objects.filter(
-        user=user
-    ).order_by('-measurement_date').first()
-    
-    # Obtener el ÚLTIMO registro de composición (independiente del mes seleccionado)
-    latest_composition = BodyCompositionHistory.objects.filter(
-        user=user
-    ).order_by('-measurement_date').first()
-    
-    # Si no hay datos del mes, obtener los más recientes disponibles para la tabla
-    if not month_measurements.exists():
-        month_measurements = BodyMeasurements.objects.filter(user=user).order_by('-measurement_date')[:10]
-    
-    if not month_composition.exists():
-        month_composition = BodyCompositionHistory.objects.filter(user=user).order_by('-measurement_date')[:10]
-    
-    # Datos para gráficos - OBTENER TODAS LAS MEDIDAS DESDE EL ORIGEN (no solo del mes)
-    # Esto permite ver el progreso completo del usuario desde su primera medida
-    all_measurements = BodyMeasurements.objects.filter(
-        user=user
-    ).order_by('measurement_date')  # Ordenar por fecha ascendente para ver el progreso
-    
-    all_composition = BodyCompositionHistory.objects.filter(
-        user=user
-    ).order_by('measurement_date')  # Ordenar por fecha ascendente para ver el progreso
-    
-    # Construir datos para gráficos con TODAS las medidas históricas
-    weight_data = []
-    bmi_data = []
-    body_fat_data = []
-    muscle_data = []
-    ica_data = []
-    
-    for measurement in all_measurements:
-        weight_data.append({
-            'date': measurement.measurement_date.strftime('%Y-%m-%d'),
-            'weight': float(measurement.weight),
-            'bmi': float(measurement.bmi)
-        })
-    
-    for composition in all_composition:
-        if composition.body_fat_percentage:
-            body_fat_data.append({
-                'date': composition.measurement_date.strftime('%Y-%m-%d'),
-                'body_fat': float(composition.body_fat_percentage)
-            })
-        if composition.muscle_mass:
-            muscle_data.append({
-                'date': composition.measurement_date.strftime('%Y-%m-%d'),
-                'muscle': float(composition.muscle_mass)
-            })
-        if composition.ica:
-            ica_data.append({
-                'date': composition.measurement_date.strftime('%Y-%m-%d'),
-                'ica': float(composition.ica)
-            })
+    filters = parse_monitoring_filters(request.GET)
+    users = filter_monitoring_queryset(
+        monitoring_queryset(current_date.year, current_date.month), filters
+    )
+    cursor = request.GET.get('cursor')
+    page_users, next_cursor = monitoring_page(users, filters['sort'], cursor)
     
-    # Estadísticas generales del usuario
-    total_exercises_all_time = ExerciseLog.objects.filter(user=user).count()
-    first_exercise = ExerciseLog.objects.filter(user=user).order_by('exercise_date').first()
+    html = render_to_string(
+        'admin_panel/user_monitoring_rows.html',
+        {'user_metrics': build_user_metrics(page_users)},
+        request=request,
+    )
+    return JsonResponse({
+        'html': html,
+        'next_cursor': next_cursor,
+        # El total solo hace falta al cargar la primera página
+        'total': None if cursor else users.count(),
+    })
+
+
+class _Echo:
+    """Pseudo-buffer para csv.writer: retorna cada línea en lugar de guardarla"""
+    def write(self, value):
+        return value
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def user_monitoring_export(request):
+    """Exporta a CSV las métricas de monitoreo del mes con los filtros de la tabla"""
     current_date = timezone.now().date()
-    days_since_start = (current_date - first_exercise.exercise_date).days if first_exercise else 0
-    
-    # Crear objeto de fecha para el mes actual
-    from datetime import date
-    month_date = date(year, month, 1)
-    
-    # Obtener la primera fecha de medida del usuario
-    first_measurement = BodyMeasurements.objects.filter(user=user).order_by('measurement_date').first()
-    first_measurement_date = first_measurement.measurement_date if first_measurement else date.today()
-    
-    # Fecha de hoy
-    today_date = date.today()
-    
-    # Obtener alimentos registrados en las últimas semanas (últimas 4 semanas)
-    weeks_back = 4
-    start_date = today_date - timedelta(weeks=weeks_back)
-    recent_food_entries = FoodDiary.objects.filter(
-        user=user,
-        meal_date__gte=start_date
-    ).order_by('-meal_date', '-meal_time')[:50]  # Limitar a 50 entradas más recientes
-    
-    # Agrupar alimentos por semana
-    food_by_week = {}
-    for entry in recent_food_entries:
-        week_num = FoodDiary.get_current_week_number(entry.meal_date)
-        week_key = f"{entry.meal_date.year}-W{week_num}"
-        if week_key not in food_by_week:
-            week_start, week_end = FoodDiary.get_week_dates(entry.meal_date.year, week_num)
-            food_by_week[week_key] = {
-                'week_start': week_start,
-                'week_end': week_end,
-                'week_num': week_num,
-                'year': entry.meal_date.year,
-                'entries': []
-            }
-        food_by_week[week_key]['entries'].append(entry)
-    
-    # Ordenar semanas por fecha (más reciente primero)
-    food_by_week_list = sorted(food_by_week.values(), key=lambda x: (x['year'], x['week_num']), reverse=True)
-    
-    # Debug: imprimir información de datos
-    print(f"Debug - Usuario: {user.username}")
-    print(f"Debug - Medidas del mes: {month_measurements.count()}")
-    print(f"Debug - Composición del mes: {month_composition.count()}")
-    print(f"Debug - TOTAL medidas históricas para gráficos: {all_measurements.count()}")
-    print(f"Debug - TOTAL composición histórica para gráficos: {all_composition.count()}")
-    print(f"Debug - weight_data (histórico completo): {len(weight_data)} registros")
-    print(f"Debug - body_fat_data (histórico completo): {len(body_fat_data)} registros")
-    print(f"Debug - muscle_data (histórico completo): {len(muscle_data)} registros")
-    print(f"Debug - ica_data (histórico completo): {len(ica_data)} registros")
-    print(f"Debug - Entradas de alimentos: {recent_food_entries.count()}")
-    
-    # Serializar datos para JavaScript
-    import json
+    filters = parse_monitoring_filters(request.GET)
+    users = filter_monitoring_queryset(
+        monitoring_queryset(current_date.year, current_date.month), filters
+    )
+    field, descending = MONITORING_SORTS[filters['sort']]
+    if field == 'sort_name':
+        users = users.order_by('first_name', 'last_name', 'username', 'id')
+    else:
+        users = users.order_by(f'-{field}' if descending else field, 'id')
+    
+    def rows():
+        writer = csv.writer(_Echo())
+        yield writer.writerow([
+            'usuario', 'nombre', 'email', 'grupo', 'ejercicios_mes', 'progreso_mensual',
+            'racha_actual', 'mejor_racha', 'peso', 'imc', 'grasa_corporal', 'musculo', 'ica',
+        ])
+        for metric in iter_user_metrics(users):
+            user = metric['user']
+            yield writer.writerow([
+                user.username,
+                user.get_full_name(),
+                user.email,
+                user.group_name or '',
+                metric['exercise_count'],
+                metric['monthly_progress'],
+                metric['current_streak'],
+                metric['best_streak'],
+                metric['latest_weight'] if metric['latest_weight'] is not None else '',
+                metric['latest_bmi'] if metric['latest_bmi'] is not None else '',
+                metric['latest_body_fat'] if metric['latest_body_fat'] is not None else '',
+                metric['latest_muscle'] if metric['latest_muscle'] is not None else '',
+                metric['latest_ica'] if metric['latest_ica'] is not None else '',
+            ])
+    
+    response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+    filename = f'monitoreo_{current_date:%Y_%m}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def user_detail_modal(request, user_id):
+    """Vista AJAX con el encabezado del modal y la sección de resumen"""
+    user = get_object_or_404(User, id=user_id)
     
     context = {
         'user': user,
-        'year': year,
-        'month': month,
-        'month_date': month_date,  # Objeto de fecha para el template
-        'exercise_dates': exercise_dates,
-        'calendar_weeks': calendar_weeks,  # Calendario tradicional con semanas en filas
-        'day_names': reordered_day_names,  # Nombres de días
-        'total_exercises': total_exercises,
-        'exercise_percentage': round(exercise_percentage, 1),
-        'current_streak': current_streak,
-        'best_streak': best_streak,
-        'month_measurements': month_measurements,
-        'month_composition': month_composition,
-        'latest_measurement': latest_measurement,
-        'latest_composition': latest_composition,
-        'weight_data': json.dumps(weight_data),
-        'body_fat_data': json.dumps(body_fat_data),
-        'muscle_data': json.dumps(muscle_data),
-        'ica_data': json.dumps(ica_data),
-        'total_exercises_all_time': total_exercises_all_time,
-        'days_since_start': days_since_start,
-        'first_measurement_date': first_measurement_date,
-        'today_date': today_date,
-        'food_by_week': food_by_week_list,
-        'total_food_entries': recent_food_entries.count(),
+        'summary_html': render_section(request, user, 'summary'),
+        # Las demás secciones se piden al abrir su pestaña
+        'lazy_sections': [
+            ('calendar', 'userDetailCalendar'),
+            ('charts', 'userDetailCharts'),
+            ('food', 'userDetailFood'),
+        ],
     }
     
     return render(request, 'admin_panel/user_detail_modal.html', context)
 
 
+@user_passes_test(is_staff_user, login_url='/login/')
+def user_detail_section(request, user_id, section):
+    """Vista AJAX con una sección del modal de detalle (HTML en caché)"""
+    if section not in USER_DETAIL_SECTIONS:
+        return HttpResponse(status=404)
+    
+    user = get_object_or_404(User, id=user_id)
+    
+    year = month = None
+    if section == 'calendar':
+        # Obtener parámetros de fecha y validar/normalizar
+        current_date = timezone.now().date()
+        try:
+            year = int(request.GET.get('year', current_date.year))
+            month = int(request.GET.get('month', current_date.month))
+        except ValueError:
+            year, month = current_date.year, current_date.month
+        year, month = shift_month(year, 1, month - 1)
+    
+    return HttpResponse(render_section(request, user, section, year, month))
+
+
 @user_passes_test(is_staff_user, login_url='/login/')
 def create_test_data(request):
     """Función temporal para crear datos de prueba"""
@@ -1690,26 +1525,134 @@ def create_test_data(request):
 
 @user_passes_test(is_staff_user, login_url='/login/')
 def notifications(request):
-    """Vista para mostrar todas las notificaciones pendientes"""
-    # Obtener solicitudes de reseteo de contraseña pendientes
-    password_reset_pending = PasswordResetApproval.objects.filter(
-        status='pending'
-    ).select_related('reset_request__user').order_by('-reset_request__requested_at')
+    """
+    Vista para mostrar las notificaciones pendientes.
+    
+    Solo renderiza la primera página de cada lista; el resto se pide al feed
+    y las solicitudes nuevas llegan como deltas cuando cambian los conteos.
+    """
+    last_read_at = NotificationReadState.last_read(request.user)
+    seen_at = timezone.now()
+    counts = dashboard_counters.notification_counts()
+    
+    sections = {}
+    for kind in FEED_KINDS:
+        approvals, next_cursor = pending_page(kind)
+        for approval in approvals:
+            approval.unread = is_unread(approval, last_read_at)
+        sections[kind] = {
+            'approvals': approvals,
+            'next_cursor': json.dumps(next_cursor),
+            'since_cursor': json.dumps(feed_cursor(approvals[0]) if approvals else None),
+        }
     
-    # Obtener solicitudes de aprobación de usuarios pendientes
-    user_approval_pending = UserApprovalRequest.objects.filter(
-        status='pending'
-    ).select_related('user', 'user__userprofile').order_by('-requested_at')
+    # Lo que se muestra ahora queda leído para las próximas visitas
+    NotificationReadState.mark_read(request.user, seen_at)
     
     context = {
-        'password_reset_pending': password_reset_pending,
-        'user_approval_pending': user_approval_pending,
-        'total_pending': password_reset_pending.count() + user_approval_pending.count(),
+        'password_reset': sections['password_reset'],
+        'user_approval': sections['user_approval'],
+        'password_reset_count': counts['password_reset'],
+        'user_approval_count': counts['user_approval'],
+        'total_pending': counts['total'],
+        'checked_at': seen_at.isoformat(),
     }
     
     return render(request, 'admin_panel/notifications.html', context)
 
 
+@user_passes_test(is_staff_user, login_url='/login/')
+def notifications_feed(request):
+    """
+    Feed JSON de solicitudes pendientes de un tipo (``kind``).
+    
+    Con ``since_ts``/``since_id`` retorna solo las solicitudes posteriores a
+    ese cursor y los ids resueltos desde ``checked_at``; con
+    ``before_ts``/``before_id`` retorna la página anterior de la lista.
+    """
+    kind = request.GET.get('kind')
+    if kind not in FEED_KINDS:
+        return JsonResponse({'success': False, 'error': 'Tipo de notificación inválido'}, status=400)
+    try:
+        since = parse_feed_cursor(request.GET, 'since')
+        before = parse_feed_cursor(request.GET, 'before')
+        checked_at = parse_timestamp(request.GET.get('checked_at'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    last_read_at = NotificationReadState.last_read(request.user)
+    now = timezone.now()
+    data = {'success': True, 'kind': kind, 'checked_at': now.isoformat()}
+    if before is not None:
+        approvals, next_cursor = pending_page(kind, before)
+        data['next_cursor'] = next_cursor
+    else:
+        approvals, has_more = pending_since(kind, since)
+        data['has_more'] = has_more
+        # None: el cliente conserva su cursor
+        data['since_cursor'] = feed_cursor(approvals[-1]) if approvals else None
+        data['resolved'] = resolved_since(kind, checked_at) if checked_at else []
+        # Las más nuevas primero, igual que en la tabla
+        approvals.reverse()
+    
+    for approval in approvals:
+        approval.unread = is_unread(approval, last_read_at)
+    data['items'] = [serialize_item(kind, approval, last_read_at) for approval in approvals]
+    data['html'] = render_to_string(
+        f'admin_panel/notification_{kind}_rows.html', {'approvals': approvals}, request=request
+    )
+    data['unread'] = unread_counts(last_read_at)
+    return JsonResponse(data)
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def notifications_mark_read(request):
+    """Marca como leídas las notificaciones del administrador hasta ahora"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'})
+    state = NotificationReadState.mark_read(request.user)
+    return JsonResponse({'success': True, 'last_read_at': state.last_read_at.isoformat()})
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def bulk_review_user_approvals(request):
+    """Aprobar o rechazar de una vez las solicitudes de registro seleccionadas"""
+    if request.method != 'POST':
+        return redirect('admin_panel:notifications')
+    
+    action = request.POST.get('action')
+    # Sin repetidos, para que el conteo de omitidas sea exacto
+    request_ids = list(dict.fromkeys(int(value) for value in request.POST.getlist('approval_ids') if value.isdigit()))
+    if action not in ('approve', 'reject') or not request_ids:
+        messages.error(request, 'Selecciona al menos una solicitud y una acción.')
+        return redirect('admin_panel:notifications')
+    
+    notes = request.POST.get('notes', '')
+    if action == 'approve':
+        reviewed = UserApprovalRequest.bulk_approve(request_ids, request.user, notes)
+        verb = 'aprobadas'
+    else:
+        reviewed = UserApprovalRequest.bulk_reject(request_ids, request.user, notes)
+        verb = 'rechazadas'
+    
+    if reviewed:
+        # Los UPDATE masivos no disparan las señales que mantienen las cachés
+        user_ids = [user_id for _, user_id, _ in reviewed]
+        transaction.on_commit(lambda: _invalidate_reviewed_approvals(user_ids))
+    
+    skipped = len(request_ids) - len(reviewed)
+    messages.success(request, f'{len(reviewed)} solicitudes de registro {verb}.')
+    if skipped:
+        messages.warning(request, f'{skipped} solicitudes ya habían sido revisadas.')
+    return redirect('admin_panel:notifications')
+
+
+def _invalidate_reviewed_approvals(user_ids):
+    dashboard_counters.invalidate_counters('active_users', 'pending_user_approvals')
+    dashboard_counters.invalidate_lists('recent_users', 'recent_activities')
+    invalidate_user_context(*user_ids)
+
+
 @user_passes_test(is_staff_user, login_url='/login/')
 def approve_password_reset(request, approval_id):
     """Aprobar solicitud de reseteo de contraseña"""
@@ -1809,12 +1752,104 @@ def reject_password_reset(request, approval_id):
 @user_passes_test(is_staff_user, login_url='/login/')
 def get_notifications_count(request):
     """Vista AJAX para obtener el conteo de notificaciones pendientes"""
-    password_reset_count = PasswordResetApproval.objects.filter(status='pending').count()
-    user_approval_count = UserApprovalRequest.objects.filter(status='pending').count()
-    total = password_reset_count + user_approval_count
+    return JsonResponse(dashboard_counters.notification_counts())
+
+
+def _parse_report_dates(request, default_days=28):
+    """Obtiene el rango de fechas (start, end) de los parámetros GET del reporte"""
+    today = timezone.now().date()
+    try:
+        end_date = datetime.strptime(request.GET.get('end', ''), '%Y-%m-%d').date()
+    except ValueError:
+        end_date = today
+    try:
+        start_date = datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+    except ValueError:
+        start_date = end_date - timedelta(days=default_days - 1)
+    return clamp_report_range(start_date, end_date)
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def food_compliance_report(request):
+    """Reporte de cumplimiento del diario de alimentación por grupo (usuario × día × comida)"""
+    groups = UserGroup.objects.filter(is_active=True)
+    start_date, end_date = _parse_report_dates(request)
     
-    return JsonResponse({
-        'total': total,
-        'password_reset': password_reset_count,
-        'user_approval': user_approval_count,
-    })
+    group = None
+    group_id = request.GET.get('group', '')
+    if group_id:
+        group = UserGroup.objects.filter(id=group_id).first() if group_id.isdigit() else None
+        if group is None:
+            messages.error(request, 'El grupo seleccionado no existe.')
+    
+    report = food_compliance_matrix(group, start_date, end_date) if group else None
+    
+    if report and request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        filename = f'cumplimiento_alimentacion_{group.id}_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        writer = csv.writer(response)
+        writer.writerow(['usuario', 'nombre', 'email', 'fecha'] + report['meal_types'])
+        for member in report['members']:
+            for day, cell in zip(report['days'], member['cells']):
+                writer.writerow(
+                    [member['username'], member['name'], member['email'], day.isoformat()] + list(cell)
+                )
+        return response
+    
+    context = {
+        'groups': groups,
+        'group': group,
+        'group_filter': group_id,
+        'start_date': start_date,
+        'end_date': end_date,
+        'report': report,
+        'meal_labels': dict(FoodDiary.MEAL_TYPE_CHOICES),
+    }
+    
+    return render(request, 'admin_panel/food_compliance_report.html', context)
+
+
+@user_passes_test(is_staff_user, login_url='/login/')
+def group_adherence_report(request):
+    """Reporte de adherencia semanal por grupo y curva de abandono desde el ingreso"""
+    groups = UserGroup.objects.filter(is_active=True)
+    
+    try:
+        weeks = int(request.GET.get('weeks', DEFAULT_ADHERENCE_WEEKS))
+    except ValueError:
+        weeks = DEFAULT_ADHERENCE_WEEKS
+    weeks = max(1, min(weeks, MAX_ADHERENCE_WEEKS))
+    
+    # El rango termina en la semana actual
+    last_week = week_start(timezone.localdate())
+    first_week = last_week - timedelta(weeks=weeks - 1)
+    
+    group = None
+    group_id = request.GET.get('group', '')
+    if group_id:
+        group = UserGroup.objects.filter(id=group_id).first() if group_id.isdigit() else None
+        if group is None:
+            messages.error(request, 'El grupo seleccionado no existe.')
+    
+    report = group_adherence(group, first_week, last_week) if group else None
+    
+    context = {
+        'groups': groups,
+        'group': group,
+        'group_filter': group_id,
+        'weeks': weeks,
+        'week_options': [4, 8, 12, 26, 52],
+        'report': report,
+        'chart_data': json.dumps({
+            'labels': [f"S{week['week_number']}" for week in report['weeks']],
+            'adherence': [week['adherence'] for week in report['weeks']],
+            'active': [week['active_share'] for week in report['weeks']],
+            'median': [week['median_sessions'] for week in report['weeks']],
+            'dropoff_labels': [f"Semana {point['offset']}" for point in report['dropoff']],
+            'dropoff_active': [point['active_share'] for point in report['dropoff']],
+            'dropoff_on_target': [point['on_target_share'] for point in report['dropoff']],
+        }) if report else None,
+    }
+    
+    return render(request, 'admin_panel/group_adherence_report.html', context)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, ExerciseLog, WeeklyRoutine, BodyMeasurements, BodyCompositionHistory, FoodDiary
+from .models import UserProfile, ExerciseLog, WeeklyRoutine, BodyMeasurements, BodyCompositionHistory, FoodDiary, FoodDiaryArchive
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -201,3 +201,30 @@ class FoodDiaryAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('user')
 
 admin.site.register(FoodDiary, FoodDiaryAdmin)
+
+class FoodDiaryArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'year', 'entry_count', 'first_date', 'last_date', 'updated_at')
+    list_filter = ('year',)
+    search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    ordering = ('user__username', '-year')
+    fields = ('user', 'year', 'entry_count', 'first_date', 'last_date', 'get_entries_preview', 'created_at', 'updated_at')
+    readonly_fields = fields
+    
+    def get_entries_preview(self, obj):
+        entries = obj.get_entries()
+        lines = [f"{e['meal_date']} {e['meal_time'][:5]} {e['meal_type']}: {e['description']}" for e in entries[:100]]
+        if len(entries) > 100:
+            lines.append(f'... y {len(entries) - 100} entradas más')
+        return '\n'.join(lines)
+    get_entries_preview.short_description = 'Entradas archivadas'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+admin.site.register(FoodDiaryArchive, FoodDiaryArchiveAdmin)
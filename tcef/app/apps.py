@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self):
+        # Registrar las señales que invalidan el contexto del usuario en caché
+        from . import signals  # noqa: F401
@@ -1,38 +1,65 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Lower
 
 
 class EmailOrUsernameModelBackend(ModelBackend):
     """
-    Backend de autenticación personalizado que permite login con email o username
+    Backend de autenticación personalizado que permite login con email o username.
+
+    Decide por el texto ingresado si buscar por email o por username y
+    compara en minúsculas, así la búsqueda usa los índices funcionales
+    ``LOWER(email)`` y ``LOWER(username)`` de ``auth_user`` (migración
+    ``app.0012``) en lugar de recorrer la tabla.
     """
-    
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Buscar usuario por username o email
-            user = User.objects.get(
-                Q(username=username) | Q(email=username)
-            )
-            
-            # Verificar la contraseña
-            if user.check_password(password):
-                return user
-                
-        except User.DoesNotExist:
-            # Si no se encuentra el usuario, retornar None
+        if username is None or password is None:
             return None
-        except User.MultipleObjectsReturned:
-            # Si hay múltiples usuarios (caso muy raro), tomar el primero
-            user = User.objects.filter(
-                Q(username=username) | Q(email=username)
-            ).first()
-            if user and user.check_password(password):
-                return user
+
+        user = None
+        if '@' in username:
+            user = self._get_by_email(username)
+        if user is None:
+            # Un username también puede contener '@'
+            user = self._get_by_username(username)
+
+        if user is None:
+            # Igualar el tiempo de respuesta con el de una contraseña incorrecta
+            User().set_password(password)
             return None
-        
+
+        # Verificar la contraseña
+        if user.check_password(password):
+            return user
         return None
-    
+
+    def _get_by_email(self, email):
+        """
+        Usuario con ese email (sin distinguir mayúsculas).
+
+        Si varios usuarios comparten el email gana el más antiguo, en la misma consulta.
+        """
+        return (
+            User.objects.alias(email_lower=Lower('email'))
+            .filter(email_lower=email.lower())
+            .order_by('pk')
+            .first()
+        )
+
+    def _get_by_username(self, username):
+        """Usuario con ese username; la coincidencia exacta gana a la de mayúsculas"""
+        return (
+            User.objects.alias(username_lower=Lower('username'))
+            .filter(username_lower=username.lower())
+            .order_by(
+                Case(When(username=username, then=Value(0)), default=Value(1), output_field=IntegerField()),
+                'pk',
+            )
+            .first()
+        )
+
     def get_user(self, user_id):
         try:
             return User.objects.get(pk=user_id)
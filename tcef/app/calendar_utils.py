@@ -0,0 +1,159 @@
+"""
+Utilidades de calendario compartidas por modelos y vistas.
+
+Toda la aritmética de semanas ISO, días laborables y rangos de calendario
+mensual vive aquí. Las funciones son puras y están memoizadas con
+``lru_cache``, por lo que las vistas que las llaman una vez por usuario
+(como el monitoreo del panel admin) solo pagan el cálculo la primera vez.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+import calendar
+
+from django.conf import settings
+
+
+# Rango de años por defecto para la tabla precalculada de meses
+DEFAULT_CALENDAR_TABLE_YEARS = (2020, 2040)
+
+MonthInfo = namedtuple('MonthInfo', [
+    'year',
+    'month',
+    'first_day',    # Primer día del mes
+    'last_day',     # Último día del mes
+    'days',         # Número de días del mes
+    'workdays',     # Días laborables (lunes a viernes)
+    'grid_start',   # Lunes de la semana que contiene el primer día
+    'grid_end',     # Domingo de la semana que contiene el último día
+])
+
+
+def week_start(date_obj):
+    """Retorna el lunes de la semana que contiene la fecha"""
+    return date_obj - timedelta(days=date_obj.weekday())
+
+
+@lru_cache(maxsize=1024)
+def iso_week_bounds(year, week):
+    """
+    Retorna (lunes, domingo) de la semana ISO 8601 indicada. Las semanas fuera
+    de rango se desplazan desde la semana 1 en lugar de lanzar un error.
+    """
+    # La semana 1 es la que contiene el 4 de enero
+    monday = week_start(date(year, 1, 4)) + timedelta(weeks=week - 1)
+    return monday, monday + timedelta(days=6)
+
+
+def iso_week(date_obj):
+    """Retorna (año ISO, número de semana ISO) para una fecha"""
+    iso_year, iso_week_number, _ = date_obj.isocalendar()
+    return iso_year, iso_week_number
+
+
+def recent_iso_weeks(date_obj, count):
+    """
+    Retorna las últimas ``count`` semanas ISO hasta la que contiene la fecha,
+    ordenadas de la más antigua a la más reciente, como tuplas (año, semana).
+    """
+    monday = week_start(date_obj)
+    return [
+        iso_week(monday - timedelta(weeks=offset))
+        for offset in range(count - 1, -1, -1)
+    ]
+
+
+@lru_cache(maxsize=None)
+def _build_month_info(year, month):
+    days = calendar.monthrange(year, month)[1]
+    first_day = date(year, month, 1)
+    last_day = date(year, month, days)
+    # Los días laborables salen de las semanas completas más el resto
+    full_weeks, remainder = divmod(days, 7)
+    workdays = full_weeks * 5 + sum(
+        1 for offset in range(remainder) if (first_day.weekday() + offset) % 7 < 5
+    )
+    return MonthInfo(
+        year=year,
+        month=month,
+        first_day=first_day,
+        last_day=last_day,
+        days=days,
+        workdays=workdays,
+        grid_start=week_start(first_day),
+        grid_end=last_day + timedelta(days=6 - last_day.weekday()),
+    )
+
+
+@lru_cache(maxsize=8)
+def month_table(first_year, last_year):
+    """Tabla precalculada {(año, mes): MonthInfo} para el rango de años indicado"""
+    return {
+        (year, month): _build_month_info(year, month)
+        for year in range(first_year, last_year + 1)
+        for month in range(1, 13)
+    }
+
+
+def calendar_table_years():
+    """Rango de años configurado para la tabla precalculada"""
+    return tuple(getattr(settings, 'CALENDAR_TABLE_YEARS', DEFAULT_CALENDAR_TABLE_YEARS))
+
+
+def month_info(year, month):
+    """Información del mes, leída de la tabla precalculada cuando está en rango"""
+    info = month_table(*calendar_table_years()).get((year, month))
+    if info is None:
+        info = _build_month_info(year, month)
+    return info
+
+
+def month_bounds(year, month):
+    """Retorna (primer día, último día) del mes"""
+    info = month_info(year, month)
+    return info.first_day, info.last_day
+
+
+def workdays_in_month(year, month):
+    """Número de días laborables (lunes a viernes) del mes"""
+    return month_info(year, month).workdays
+
+
+def month_grid_range(year, month):
+    """Retorna (lunes inicial, domingo final) del calendario mensual extendido"""
+    info = month_info(year, month)
+    return info.grid_start, info.grid_end
+
+
+@lru_cache(maxsize=256)
+def month_grid(year, month):
+    """
+    Calendario extendido del mes: tupla de semanas (lunes a domingo), cada una
+    con las 7 fechas, incluyendo los días de los meses vecinos.
+    """
+    start, end = month_grid_range(year, month)
+    total_days = (end - start).days + 1
+    return tuple(
+        tuple(start + timedelta(days=week * 7 + day) for day in range(7))
+        for week in range(total_days // 7)
+    )
+
+
+@lru_cache(maxsize=256)
+def month_calendar(year, month):
+    """Equivalente inmutable de ``calendar.monthcalendar`` (0 = día de otro mes)"""
+    return tuple(tuple(week) for week in calendar.monthcalendar(year, month))
+
+
+def shift_month(year, month, delta):
+    """Desplaza (año, mes) ``delta`` meses hacia adelante o atrás"""
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def monthly_progress(exercise_count, year, month):
+    """Porcentaje de días laborables del mes cubiertos por los ejercicios (máx. 100)"""
+    workdays = workdays_in_month(year, month)
+    if workdays <= 0:
+        return 0
+    return min(exercise_count / workdays * 100, 100)
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_add_hipopresivos_field'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodDiaryArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField(help_text='Año de las entradas archivadas')),
+                ('payload', models.BinaryField(help_text='Entradas del año en JSON comprimido con zlib')),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+                ('first_date', models.DateField(blank=True, null=True)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='food_diary_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archivo de Diario de Alimentación',
+                'verbose_name_plural': 'Archivos de Diario de Alimentación',
+                'ordering': ['user', '-year'],
+                'unique_together': {('user', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Índices funcionales para el login con email o username (app.backends)
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_fooddiaryarchive'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_email_lower_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_username_lower_idx;',
+        ),
+    ]
@@ -6,7 +6,7 @@ from .user import UserProfile, PasswordResetRequest
 from .exercise import ExerciseLog
 from .routine import WeeklyRoutine
 from .body_measurements import BodyMeasurements, BodyCompositionHistory
-from .food_diary import FoodDiary
+from .food_diary import FoodDiary, FoodDiaryArchive
 
 __all__ = [
     'UserProfile',
@@ -16,5 +16,6 @@ __all__ = [
     'BodyMeasurements',
     'BodyCompositionHistory',
     'FoodDiary',
+    'FoodDiaryArchive',
 ]
 
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from app.calendar_utils import month_bounds, week_start, workdays_in_month
+
 
 class ExerciseLog(models.Model):
     DIFFICULTY_CHOICES = [
@@ -34,24 +36,18 @@ class ExerciseLog(models.Model):
     @classmethod
     def get_month_exercises(cls, user, year, month):
         """Obtiene todos los ejercicios de un mes específico para un usuario"""
-        from datetime import date
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1)
-        else:
-            end_date = date(year, month + 1, 1)
+        start_date, end_date = month_bounds(year, month)
         
         return cls.objects.filter(
             user=user,
             exercise_date__gte=start_date,
-            exercise_date__lt=end_date
+            exercise_date__lte=end_date
         )
     
     @classmethod
     def get_user_stats(cls, user, year=None, month=None):
         """Obtiene estadísticas del usuario"""
-        from datetime import datetime, date
-        import calendar
+        from datetime import datetime
         
         # Si no se especifica año/mes, usar el actual
         if year is None or month is None:
@@ -60,22 +56,10 @@ class ExerciseLog(models.Model):
             month = now.month
             
         # Total de ejercicios del mes que se está mostrando
-        total_exercises_this_month = cls.objects.filter(
-            user=user,
-            exercise_date__year=year,
-            exercise_date__month=month
-        ).count()
+        total_exercises_this_month = cls.get_month_exercises(user, year, month).count()
         
-        # Calcular días laborales (lunes a viernes) del mes
-        # Obtener el último día del mes
-        last_day = calendar.monthrange(year, month)[1]
-        
-        weekdays_count = 0
-        for day in range(1, last_day + 1):
-            current_day = date(year, month, day)
-            # weekday() devuelve 0 para lunes, 1 para martes, etc.
-            if current_day.weekday() < 5:  # 0-4 son lunes a viernes
-                weekdays_count += 1
+        # Días laborales (lunes a viernes) del mes
+        weekdays_count = workdays_in_month(year, month)
                 
         # Calcular el porcentaje de días laborales completados
         if weekdays_count > 0:
@@ -84,8 +68,7 @@ class ExerciseLog(models.Model):
             progress_percentage = 0
         
         total_exercises = cls.objects.filter(user=user).count()
-        current_streak = cls.get_current_week_streak(user)
-        longest_streak = cls.get_longest_week_streak(user)
+        current_streak, longest_streak = cls.get_week_streaks([user.pk]).get(user.pk, (0, 0))
         
         return {
             'total_exercises': total_exercises,
@@ -96,116 +79,97 @@ class ExerciseLog(models.Model):
             'progress_percentage': progress_percentage,
         }
     
-    @classmethod
-    def get_current_week_streak(cls, user):
-        """Calcula la última racha de semanas con 5+ rutinas obtenida (sin límite de año)"""
-        from datetime import date, timedelta
-        
-        today = date.today()
-        streak = 0
-        current_week_start = today - timedelta(days=today.weekday())
-        
-        # Límite de seguridad: máximo 10 años hacia atrás
-        min_date = date(today.year - 10, 1, 1)
-        min_week_start = min_date - timedelta(days=min_date.weekday())
-        
-        # Verificar si la semana actual tiene 5+ rutinas
-        week_end = current_week_start + timedelta(days=6)
-        week_exercises = cls.objects.filter(
-            user=user,
-            exercise_date__gte=current_week_start,
-            exercise_date__lte=week_end
-        ).count()
-        
-        # Si la semana actual no tiene 5+ rutinas, buscar la última racha completa
-        if week_exercises < 5:
-            # Retroceder una semana y buscar la última racha completa
-            current_week_start -= timedelta(weeks=1)
-            
-            while current_week_start >= min_week_start:
-                week_end = current_week_start + timedelta(days=6)
-                week_exercises = cls.objects.filter(
-                    user=user,
-                    exercise_date__gte=current_week_start,
-                    exercise_date__lte=week_end
-                ).count()
-                
-                if week_exercises >= 5:
-                    streak += 1
-                    current_week_start -= timedelta(weeks=1)
-                else:
-                    break
-        else:
-            # Si la semana actual tiene 5+ rutinas, contar desde ahí hacia atrás
-            while current_week_start >= min_week_start:
-                week_end = current_week_start + timedelta(days=6)
-                week_exercises = cls.objects.filter(
-                    user=user,
-                    exercise_date__gte=current_week_start,
-                    exercise_date__lte=week_end
-                ).count()
-                
-                if week_exercises >= 5:
-                    streak += 1
-                    current_week_start -= timedelta(weeks=1)
-                else:
-                    break
-        
-        return streak
+    # Número mínimo de rutinas para que una semana cuente en la racha
+    STREAK_WEEK_TARGET = 5
+    
+    # Límite de seguridad: máximo 10 años hacia atrás
+    STREAK_YEARS_BACK = 10
     
     @classmethod
-    def get_longest_week_streak(cls, user):
-        """Calcula la racha más larga de semanas con 5+ rutinas (sin límite de año)"""
-        from datetime import date, timedelta
-        
-        exercises = cls.objects.filter(user=user).order_by('exercise_date')
-        if not exercises:
-            return 0
+    def get_week_streaks(cls, users, today=None):
+        """
+        Calcula en una sola consulta las rachas semanales de varios usuarios.
+        
+        ``users`` puede ser una lista de IDs o un queryset de usuarios.
+        Si se indica ``today``, solo cuentan los registros hasta esa fecha
+        (rachas al cierre de un mes pasado).
+        Retorna {user_id: (racha actual, racha más larga)}; los usuarios sin
+        semanas completas no aparecen en el diccionario.
+        """
+        from datetime import date
+        from django.db.models import Count
+        from django.db.models.functions import TruncWeek
         
-        # Obtener el rango completo de fechas con ejercicios
-        first_exercise = exercises.first().exercise_date
-        last_exercise = exercises.last().exercise_date
+        logs = cls.objects.all()
+        if today is None:
+            today = date.today()
+        else:
+            logs = logs.filter(exercise_date__lte=today)
+        min_date = date(today.year - cls.STREAK_YEARS_BACK, 1, 1)
+        
+        if isinstance(users, models.QuerySet):
+            users = users.values('pk')
+        
+        # Solo las semanas con 5+ rutinas, agrupadas en la base de datos
+        full_weeks = (
+            logs.filter(user_id__in=users, exercise_date__gte=week_start(min_date))
+            .annotate(week=TruncWeek('exercise_date'))
+            .values('user_id', 'week')
+            .annotate(exercises=Count('id'))
+            .filter(exercises__gte=cls.STREAK_WEEK_TARGET)
+            .order_by('user_id', 'week')
+        )
         
-        # Límite de seguridad: máximo 10 años hacia atrás desde hoy
-        today = date.today()
-        min_date = date(today.year - 10, 1, 1)
+        weeks_by_user = {}
+        for row in full_weeks:
+            week = row['week']
+            if hasattr(week, 'date'):
+                week = week.date()
+            weeks_by_user.setdefault(row['user_id'], []).append(week)
         
-        # Asegurar que no vayamos más atrás del límite
-        if first_exercise < min_date:
-            first_exercise = min_date
+        return {
+            user_id: cls._streaks_from_weeks(weeks, today)
+            for user_id, weeks in weeks_by_user.items()
+        }
+    
+    @staticmethod
+    def _streaks_from_weeks(weeks, today):
+        """Calcula (racha actual, racha más larga) a partir de los lunes de las semanas completas"""
+        from datetime import timedelta
         
-        # Calcular todas las semanas desde la primera hasta la última
-        # Empezar desde el lunes de la semana que contiene el primer ejercicio
-        first_week_start = first_exercise - timedelta(days=first_exercise.weekday())
-        last_week_start = last_exercise - timedelta(days=last_exercise.weekday())
+        one_week = timedelta(weeks=1)
         
-        # Iterar semana por semana desde la primera hasta la última
-        current_week_start = first_week_start
+        # Racha más larga: mayor secuencia de semanas consecutivas
         longest_streak = 0
+        current_run = 0
+        previous = None
+        for week in weeks:
+            current_run = current_run + 1 if previous and week - previous == one_week else 1
+            longest_streak = max(longest_streak, current_run)
+            previous = week
+        
+        # Racha actual: desde la semana actual, o desde la anterior si la actual
+        # todavía no tiene 5+ rutinas
+        week_set = set(weeks)
+        cursor = week_start(today)
+        if cursor not in week_set:
+            cursor -= one_week
         current_streak = 0
+        while cursor in week_set:
+            current_streak += 1
+            cursor -= one_week
         
-        while current_week_start <= last_week_start:
-            week_end = current_week_start + timedelta(days=6)
-            
-            # Contar ejercicios de esta semana
-            week_count = cls.objects.filter(
-                user=user,
-                exercise_date__gte=current_week_start,
-                exercise_date__lte=week_end
-            ).count()
-            
-            # Si la semana tiene 5+ ejercicios, incrementar la racha
-            if week_count >= 5:
-                current_streak += 1
-                longest_streak = max(longest_streak, current_streak)
-            else:
-                # Si no tiene 5+ ejercicios, reiniciar la racha
-                current_streak = 0
-            
-            # Avanzar a la siguiente semana
-            current_week_start += timedelta(weeks=1)
-        
-        return longest_streak
+        return current_streak, longest_streak
+    
+    @classmethod
+    def get_current_week_streak(cls, user):
+        """Calcula la última racha de semanas con 5+ rutinas obtenida (sin límite de año)"""
+        return cls.get_week_streaks([user.pk]).get(user.pk, (0, 0))[0]
+    
+    @classmethod
+    def get_longest_week_streak(cls, user):
+        """Calcula la racha más larga de semanas con 5+ rutinas (sin límite de año)"""
+        return cls.get_week_streaks([user.pk]).get(user.pk, (0, 0))[1]
     
     @classmethod
     def get_current_streak(cls, user):
@@ -1,8 +1,14 @@
+from datetime import date, datetime, time
+import json
+import zlib
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from app.calendar_utils import iso_week, iso_week_bounds
+
 
 class FoodDiary(models.Model):
     MEAL_TYPE_CHOICES = [
@@ -78,17 +84,8 @@ class FoodDiary(models.Model):
     
     @classmethod
     def get_week_entries(cls, user, year, week):
-        """Obtiene todas las entradas de una semana específica"""
-        from datetime import date, timedelta
-        
-        # Calcular el primer día de la semana (lunes)
-        jan1 = date(year, 1, 1)
-        days_offset = (jan1.weekday() + 1) % 7  # Ajustar para que lunes sea 0
-        first_monday = jan1 - timedelta(days=days_offset)
-        
-        # Calcular la fecha del lunes de la semana solicitada
-        week_start = first_monday + timedelta(weeks=week - 1)
-        week_end = week_start + timedelta(days=6)
+        """Obtiene todas las entradas de una semana ISO específica"""
+        week_start, week_end = iso_week_bounds(year, week)
         
         return cls.objects.filter(
             user=user,
@@ -99,49 +96,130 @@ class FoodDiary(models.Model):
     @classmethod
     def get_current_week_number(cls, date_obj=None):
         """Obtiene el número de semana del año para una fecha (ISO 8601)"""
-        from datetime import date, timedelta
+        from datetime import date
         
         if date_obj is None:
             date_obj = date.today()
         
-        # ISO 8601: Semana comienza en lunes, primera semana contiene el 4 de enero
-        jan4 = date(date_obj.year, 1, 4)
-        jan4_weekday = jan4.weekday()  # 0=Lunes, 6=Domingo
-        
-        # Calcular el lunes de la semana que contiene el 4 de enero
-        first_monday = jan4 - timedelta(days=jan4_weekday)
-        
-        # Calcular la diferencia en días desde el primer lunes
-        days_diff = (date_obj - first_monday).days
-        
-        # Calcular el número de semana (1-indexed)
-        if days_diff < 0:
-            # Si la fecha está antes del primer lunes, calcular semana del año anterior
-            prev_jan4 = date(date_obj.year - 1, 1, 4)
-            prev_jan4_weekday = prev_jan4.weekday()
-            prev_first_monday = prev_jan4 - timedelta(days=prev_jan4_weekday)
-            days_diff = (date_obj - prev_first_monday).days
-            week_number = (days_diff // 7) + 1
-        else:
-            week_number = (days_diff // 7) + 1
-        
-        return week_number
+        return iso_week(date_obj)[1]
     
     @classmethod
     def get_week_dates(cls, year, week):
         """Obtiene las fechas de inicio y fin de una semana específica (ISO 8601)"""
-        from datetime import date, timedelta
-        
-        # ISO 8601: Semana comienza en lunes, primera semana contiene el 4 de enero
-        jan4 = date(year, 1, 4)
-        jan4_weekday = jan4.weekday()  # 0=Lunes, 6=Domingo
+        return iso_week_bounds(year, week)
+
+
+class FoodDiaryArchive(models.Model):
+    """
+    Histórico comprimido del diario de alimentación: una fila por (usuario, año).
+
+    Las entradas antiguas se mueven aquí con el comando ``archive_food_diary``
+    para que la tabla FoodDiary y su índice (user, meal_date) solo contengan
+    las semanas recientes que usa la interfaz del miembro.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='food_diary_archives')
+    year = models.PositiveIntegerField(help_text="Año de las entradas archivadas")
+    payload = models.BinaryField(help_text="Entradas del año en JSON comprimido con zlib")
+    entry_count = models.PositiveIntegerField(default=0)
+    first_date = models.DateField(null=True, blank=True)
+    last_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Archivo de Diario de Alimentación'
+        verbose_name_plural = 'Archivos de Diario de Alimentación'
+        unique_together = ['user', 'year']
+        ordering = ['user', '-year']
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.year} ({self.entry_count} entradas)"
+    
+    @staticmethod
+    def serialize_entry(entry):
+        """Convierte una entrada de FoodDiary en un diccionario serializable"""
+        return {
+            'id': entry.id,
+            'meal_date': entry.meal_date.isoformat(),
+            'meal_time': entry.meal_time.isoformat(),
+            'meal_type': entry.meal_type,
+            'description': entry.description,
+            'created_at': entry.created_at.isoformat(),
+            'updated_at': entry.updated_at.isoformat(),
+        }
+    
+    @staticmethod
+    def deserialize_entry(entry, user):
+        """Entrada serializada como FoodDiary sin guardar, para las mismas plantillas que las activas"""
+        return FoodDiary(
+            id=entry['id'],
+            user=user,
+            meal_date=date.fromisoformat(entry['meal_date']),
+            meal_time=time.fromisoformat(entry['meal_time']),
+            meal_type=entry['meal_type'],
+            description=entry['description'],
+            created_at=datetime.fromisoformat(entry['created_at']),
+            updated_at=datetime.fromisoformat(entry['updated_at']),
+        )
+    
+    def get_entries(self):
+        """Retorna la lista de entradas archivadas (diccionarios) ordenadas por fecha y hora"""
+        if not self.payload:
+            return []
+        return json.loads(zlib.decompress(bytes(self.payload)).decode('utf-8'))
+    
+    def set_entries(self, entries):
+        """Comprime y guarda la lista de entradas, actualizando los metadatos"""
+        entries = sorted(entries, key=lambda e: (e['meal_date'], e['meal_time'], e['id']))
+        raw = json.dumps(entries, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.payload = zlib.compress(raw, 9)
+        self.entry_count = len(entries)
+        self.first_date = date.fromisoformat(entries[0]['meal_date']) if entries else None
+        self.last_date = date.fromisoformat(entries[-1]['meal_date']) if entries else None
+    
+    def merge_entries(self, entries):
+        """Agrega entradas al archivo ignorando las que ya estaban archivadas (por id)"""
+        merged = {entry['id']: entry for entry in self.get_entries()}
+        for entry in entries:
+            merged[entry['id']] = entry
+        self.set_entries(list(merged.values()))
+    
+    @classmethod
+    def get_history(cls, user, start_date, end_date, limit=None):
+        """
+        Historial del diario entre dos fechas combinando la tabla activa y los archivos.
         
-        # Calcular el lunes de la semana que contiene el 4 de enero
-        first_monday = jan4 - timedelta(days=jan4_weekday)
+        Retorna una lista de diccionarios (mismo formato que ``serialize_entry``)
+        ordenada por fecha y hora. Con ``limit`` retorna solo las ``limit``
+        entradas más recientes. La usa la sección de alimentación del modal
+        de detalle del monitoreo (``admin_panel.user_detail``).
+        """
+        history = []
+        # Solo se descomprimen los archivos cuyas fechas se cruzan con el rango
+        archives = cls.objects.filter(
+            user=user,
+            year__gte=start_date.year,
+            year__lte=end_date.year,
+            first_date__lte=end_date,
+            last_date__gte=start_date,
+        )
+        start_iso, end_iso = start_date.isoformat(), end_date.isoformat()
+        for archive in archives:
+            history.extend(
+                entry for entry in archive.get_entries()
+                if start_iso <= entry['meal_date'] <= end_iso
+            )
         
-        # Calcular la fecha del lunes de la semana solicitada
-        week_start = first_monday + timedelta(weeks=week - 1)
-        week_end = week_start + timedelta(days=6)
+        live_entries = FoodDiary.objects.filter(
+            user=user,
+            meal_date__gte=start_date,
+            meal_date__lte=end_date,
+        ).order_by('-meal_date', '-meal_time')
+        if limit is not None:
+            live_entries = live_entries[:limit]
+        history.extend(cls.serialize_entry(entry) for entry in live_entries)
         
-        return week_start, week_end
-
+        history.sort(key=lambda e: (e['meal_date'], e['meal_time']))
+        if limit is not None:
+            history = history[-limit:] if limit else []
+        return history
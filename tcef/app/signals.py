@@ -0,0 +1,24 @@
+"""
+Señales de la app de miembros.
+
+Invalidan el contexto en caché del usuario (``app.user_context``) cuando
+cambian su perfil, su membresía o el grupo al que pertenece.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from admin_panel.models import UserGroup, UserGroupMembership
+from .models import UserProfile
+from .user_context import invalidate_user_context
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=UserGroupMembership)
+def user_context_changed(sender, instance, **kwargs):
+    invalidate_user_context(instance.user_id)
+
+
+@receiver(post_save, sender=UserGroup)
+def user_group_changed(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_context(*instance.members.values_list('user_id', flat=True))
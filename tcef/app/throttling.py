@@ -0,0 +1,121 @@
+"""
+Límite de intentos de login fallidos por IP y por cuenta.
+
+Cada intento fallido suma en un contador de ventana deslizante guardado en
+caché (la ventana actual más la anterior ponderada por el tiempo que aún
+se solapa). Cuando la IP o la cuenta superan su límite, ``custom_login``
+rechaza la petición antes de autenticar, así un ataque de fuerza bruta no
+consume CPU en hashes PBKDF2.
+
+Los límites se configuran en settings (``LOGIN_THROTTLE_*``). Con varios
+workers la caché debe ser compartida (``CACHE_URL``) para que los
+contadores sean globales.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+_KEY_PREFIX = 'login_throttle:'
+
+# Intentos fallidos permitidos por ventana (segundos)
+DEFAULT_LOGIN_THROTTLE_WINDOW = 300
+DEFAULT_LOGIN_THROTTLE_IP_LIMIT = 20
+DEFAULT_LOGIN_THROTTLE_ACCOUNT_LIMIT = 5
+
+
+def _window():
+    return getattr(settings, 'LOGIN_THROTTLE_WINDOW', DEFAULT_LOGIN_THROTTLE_WINDOW)
+
+
+def _limits():
+    return (
+        ('ip', getattr(settings, 'LOGIN_THROTTLE_IP_LIMIT', DEFAULT_LOGIN_THROTTLE_IP_LIMIT)),
+        ('account', getattr(settings, 'LOGIN_THROTTLE_ACCOUNT_LIMIT', DEFAULT_LOGIN_THROTTLE_ACCOUNT_LIMIT)),
+    )
+
+
+def client_ip(request):
+    """IP del cliente; detrás de un proxy se lee del header configurado"""
+    header = getattr(settings, 'LOGIN_THROTTLE_IP_HEADER', None)
+    if header and request.META.get(header):
+        # En X-Forwarded-For cada proxy agrega al final la IP que se le conectó;
+        # las entradas anteriores las envía el cliente y puede falsearlas. La
+        # última es la que agregó nuestro proxy (con X-Real-IP hay una sola)
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _account(username):
+    # El texto ingresado puede tener caracteres no válidos en claves de caché
+    username = (username or '').strip().lower()
+    return hashlib.sha256(username.encode()).hexdigest()[:32] if username else ''
+
+
+def _subjects(request, username):
+    return {
+        'ip': client_ip(request),
+        'account': _account(username),
+    }
+
+
+def _bucket_keys(kind, subject, now):
+    window = _window()
+    current = int(now // window)
+    return f'{_KEY_PREFIX}{kind}:{subject}:{current}', f'{_KEY_PREFIX}{kind}:{subject}:{current - 1}'
+
+
+def _sliding_count(kind, subject, now):
+    current_key, previous_key = _bucket_keys(kind, subject, now)
+    counts = cache.get_many([current_key, previous_key])
+    overlap = 1 - (now % _window()) / _window()
+    return counts.get(current_key, 0) + counts.get(previous_key, 0) * overlap
+
+
+def _incr(key, timeout):
+    # add() crea el contador; si ya existe (o expiró entre add e incr) se suma
+    if not cache.add(key, 1, timeout):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout)
+
+
+def is_login_throttled(request, username):
+    """
+    True si la IP o la cuenta superaron su límite de intentos fallidos.
+
+    Cada rechazo se suma al contador diario que muestra el dashboard.
+    """
+    now = time.time()
+    subjects = _subjects(request, username)
+    for kind, limit in _limits():
+        if subjects[kind] and _sliding_count(kind, subjects[kind], now) >= limit:
+            _incr(_rejected_key(timezone.localdate()), 60 * 60 * 48)
+            return True
+    return False
+
+
+def record_login_failure(request, username):
+    """Suma un intento fallido a la IP y a la cuenta"""
+    now = time.time()
+    for kind, subject in _subjects(request, username).items():
+        if subject:
+            _incr(_bucket_keys(kind, subject, now)[0], _window() * 2)
+
+
+def reset_login_failures(username):
+    """Tras un login correcto la cuenta vuelve a empezar (la IP no)"""
+    cache.delete_many(_bucket_keys('account', _account(username), time.time()))
+
+
+def _rejected_key(day):
+    return f'{_KEY_PREFIX}rejected:{day.isoformat()}'
+
+
+def throttled_today():
+    """Intentos de login rechazados hoy por el límite"""
+    return cache.get(_rejected_key(timezone.localdate()), 0)
@@ -0,0 +1,112 @@
+"""
+Perfil, membresía y grupo del usuario autenticado, cargados una sola vez.
+
+``UserContextMiddleware`` agrega ``request.user_context``, que se carga al
+primer uso con una sola consulta (``select_related``) y se guarda en caché
+por usuario. Las señales de ``app.signals`` la invalidan cuando cambian el
+perfil, la membresía o el grupo, así que la mayoría de las peticiones no
+consultan estas tablas.
+
+La invalidación solo llega a todos los workers con una caché compartida
+(``CACHE_URL``). Sin ella (locmem, una por proceso) ``USER_CONTEXT_CACHE_TIMEOUT``
+es 0 y el contexto se carga en cada petición, igual que ``SESSION_STORE``
+elige 'db' en lugar de 'cached_db'.
+
+Al cargarse también deja el perfil y la membresía en la caché de relaciones
+de ``request.user``, así ``request.user.userprofile`` y
+``request.user.group_membership`` tampoco consultan la base.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+
+
+# Duración de la caché por usuario (las señales la invalidan antes); 0 la desactiva
+DEFAULT_USER_CONTEXT_CACHE_TIMEOUT = 60 * 30
+
+
+def _cache_key(user_id):
+    return f'user_context:{user_id}'
+
+
+def invalidate_user_context(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+class UserContext:
+    """Datos del usuario que usan casi todas las vistas de miembros"""
+
+    def __init__(self, profile, membership):
+        self.profile = profile
+        self.membership = membership
+
+    @property
+    def group(self):
+        return self.membership.group if self.membership else None
+
+    @property
+    def hipopresivos(self):
+        return bool(self.profile.hipopresivos)
+
+    @property
+    def gender(self):
+        return self.profile.gender
+
+
+def _load(user):
+    """Lee perfil, membresía y grupo con una consulta; crea el perfil si falta"""
+    loaded = User.objects.select_related('userprofile', 'group_membership__group').get(pk=user.pk)
+    try:
+        profile = loaded.userprofile
+    except UserProfile.DoesNotExist:
+        profile = UserProfile.objects.create(user=user)
+    membership = getattr(loaded, 'group_membership', None)
+
+    # No guardar en caché la copia del usuario que cuelga de cada relación
+    for instance in (profile, membership):
+        if instance is not None:
+            instance._state.fields_cache.pop('user', None)
+    return profile, membership
+
+
+def get_user_context(user):
+    """Contexto del usuario desde la caché; None para usuarios anónimos"""
+    if not user.is_authenticated:
+        return None
+
+    timeout = getattr(settings, 'USER_CONTEXT_CACHE_TIMEOUT', DEFAULT_USER_CONTEXT_CACHE_TIMEOUT)
+    if not timeout:
+        profile, membership = _load(user)
+    else:
+        key = _cache_key(user.pk)
+        cached = cache.get(key)
+        if cached is None:
+            cached = _load(user)
+            cache.set(key, cached, timeout)
+        profile, membership = cached
+
+    User.userprofile.related.set_cached_value(user, profile)
+    User.group_membership.related.set_cached_value(user, membership)
+    for instance in (profile, membership):
+        if instance is not None:
+            instance._state.fields_cache['user'] = user
+    return UserContext(profile, membership)
+
+
+class UserContextMiddleware:
+    """Agrega ``request.user_context`` (perezoso); va después de AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_context = SimpleLazyObject(lambda: get_user_context(request.user))
+        return self.get_response(request)
+
+
+def user_context(request):
+    """Context processor: expone ``user_context`` a las plantillas"""
+    return {'user_context': getattr(request, 'user_context', None)}
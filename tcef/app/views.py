@@ -6,19 +6,24 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from datetime import datetime, date, timedelta
-import calendar
 import math  # Agregar esta importación
 from .forms import UserRegistrationForm, CustomLoginForm, FoodDiaryForm
 from .models import UserProfile, ExerciseLog, WeeklyRoutine, PasswordResetRequest, FoodDiary
-from admin_panel.models import CustomRoutine, UserGroupMembership
+from admin_panel.scheduling import resolve_schedule
 from .forms import BodyMeasurementsForm
+from .throttling import is_login_throttled, record_login_failure, reset_login_failures
 from .models import BodyMeasurements
+from .calendar_utils import (
+    iso_week, iso_week_bounds, month_grid, month_grid_range, monthly_progress,
+    recent_iso_weeks, shift_month, week_start,
+)
 import json
 
 def home(request):
@@ -43,10 +48,16 @@ def custom_login(request):
             password = form.cleaned_data['password']
             remember_me = form.cleaned_data.get('remember_me', False)
             
+            # Rechazar antes de hashear la contraseña si hubo demasiados intentos fallidos
+            if is_login_throttled(request, username):
+                messages.error(request, 'Demasiados intentos fallidos. Espera unos minutos antes de volver a intentarlo.')
+                return render(request, 'app/login.html', {'form': form}, status=429)
+            
             # Autenticar usuario usando nuestro backend personalizado
             user = authenticate(request, username=username, password=password)
             
             if user is not None:
+                reset_login_failures(username)
                 if user.is_active:
                     login(request, user)
                     
@@ -73,6 +84,7 @@ def custom_login(request):
                 else:
                     messages.error(request, 'Tu cuenta está desactivada.')
             else:
+                record_login_failure(request, username)
                 messages.error(request, 'Credenciales inválidas. Verifica tu nombre de usuario/email y contraseña.')
     else:
         form = CustomLoginForm()
@@ -128,7 +140,9 @@ def request_password_reset(request):
                 
                 # Crear solicitud de aprobación
                 from admin_panel.models import PasswordResetApproval
-                PasswordResetApproval.objects.create(reset_request=reset_request)
+                PasswordResetApproval.objects.create(
+                    reset_request=reset_request, requested_at=reset_request.requested_at
+                )
                 
                 messages.success(request, 'Solicitud de reseteo enviada. El administrador la revisará y te notificará.')
             
@@ -174,10 +188,7 @@ def reset_password_with_token(request, token):
 @login_required
 def profile(request):
     """Vista del perfil del usuario"""
-    try:
-        profile = request.user.userprofile
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=request.user)
+    profile = request.user_context.profile
     
     # Obtener estadísticas básicas
     exercise_stats = ExerciseLog.get_user_stats(request.user)
@@ -192,10 +203,7 @@ def profile(request):
 @login_required
 def hipopresivos(request):
     """Vista de talleres de hipopresivos - Solo para usuarios con hipopresivos activado"""
-    try:
-        profile = request.user.userprofile
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=request.user)
+    profile = request.user_context.profile
     
     # Verificar si el usuario tiene acceso a hipopresivos
     if not profile.hipopresivos:
@@ -252,40 +260,24 @@ def exercise_calendar(request, year=None, month=None):
         year = today.year
         month = today.month
     
-    # Obtener el primer día del mes
-    first_day = date(year, month, 1)
-    
-    # Obtener el lunes de la semana que contiene el primer día del mes
-    days_since_monday = first_day.weekday()
-    calendar_start = first_day - timedelta(days=days_since_monday)
-    
-    # Obtener el último día del mes
-    if month == 12:
-        last_day = date(year + 1, 1, 1) - timedelta(days=1)
-    else:
-        last_day = date(year, month + 1, 1) - timedelta(days=1)
-    
-    # Obtener el domingo de la semana que contiene el último día del mes
-    days_until_sunday = 6 - last_day.weekday()
-    calendar_end = last_day + timedelta(days=days_until_sunday)
+    # Rango del calendario extendido: del lunes de la primera semana al domingo de la última
+    calendar_start, calendar_end = month_grid_range(year, month)
     
     # Crear el calendario extendido semana por semana
+    today = date.today()
     extended_calendar = []
-    current_date = calendar_start
-    
-    while current_date <= calendar_end:
+    for grid_week in month_grid(year, month):
         week = []
-        for i in range(7):  # 7 días por semana (Lunes a Domingo)
+        for current_date in grid_week:  # 7 días por semana (Lunes a Domingo)
             day_info = {
                 'day': current_date.day,
                 'month': current_date.month,
                 'year': current_date.year,
                 'is_current_month': current_date.month == month and current_date.year == year,
-                'is_today': current_date == date.today(),
+                'is_today': current_date == today,
                 'date': current_date,
             }
             week.append(day_info)
-            current_date += timedelta(days=1)
         extended_calendar.append(week)
     
     # Obtener ejercicios del rango extendido para el usuario
@@ -296,57 +288,19 @@ def exercise_calendar(request, year=None, month=None):
     )
     exercise_dates = {ex.exercise_date: ex for ex in extended_exercises}
     
-    # Obtener rutinas asignadas para el rango del calendario
+    # Rutinas del grupo para el rango del calendario: las explícitas y las
+    # generadas por las plantillas recurrentes
     assigned_routines = {}
-    try:
-        user_membership = request.user.group_membership
-        user_group = user_membership.group
-        group_routines = CustomRoutine.objects.filter(
-            group=user_group,
-            is_active=True,
-            assigned_date__gte=calendar_start,
-            assigned_date__lte=calendar_end
-        ).prefetch_related('routine_videos__video')
-        
-        for routine in group_routines:
-            videos_data = []
-            for rv in routine.get_videos_ordered():
-                videos_data.append({
-                    'id': rv.video.id,
-                    'title': rv.video.title,
-                    'description': rv.video.description,
-                    'duration': rv.video.get_duration_formatted(),
-                    's3_url': rv.video.s3_url,
-                    'thumbnail_url': rv.video.thumbnail_url,
-                    'order': rv.order,
-                    'notes': rv.notes
-                })
-            
-            assigned_routines[routine.assigned_date] = {
-                'id': routine.id,
-                'title': routine.title,
-                'description': routine.description,
-                'videos_count': routine.get_videos_count(),
-                'total_duration': routine.get_total_duration(),
-                'videos': videos_data
-            }
-    except UserGroupMembership.DoesNotExist:
-        # Usuario no está en ningún grupo
-        pass
+    user_group = request.user_context.group
+    if user_group is not None:
+        assigned_routines = resolve_schedule(user_group.pk, calendar_start, calendar_end)
     
     # Obtener estadísticas del usuario
     user_stats = ExerciseLog.get_user_stats(request.user)
     
     # Calcular navegación de meses
-    if month == 1:
-        prev_month, prev_year = 12, year - 1
-    else:
-        prev_month, prev_year = month - 1, year
-    
-    if month == 12:
-        next_month, next_year = 1, year + 1
-    else:
-        next_month, next_year = month + 1, year
+    prev_year, prev_month = shift_month(year, month, -1)
+    next_year, next_month = shift_month(year, month, 1)
     
     # Nombres de los meses
     month_names = [
@@ -355,16 +309,7 @@ def exercise_calendar(request, year=None, month=None):
     ]
     
     # Verificar si el usuario tiene hipopresivos activado
-    try:
-        profile = request.user.userprofile
-        has_hipopresivos = bool(profile.hipopresivos) if profile.hipopresivos is not None else False
-    except UserProfile.DoesNotExist:
-        # Si no existe el perfil, crear uno (no debería pasar, pero por seguridad)
-        profile = UserProfile.objects.create(user=request.user)
-        has_hipopresivos = False
-    except AttributeError:
-        # Si hay algún problema con el atributo
-        has_hipopresivos = False
+    has_hipopresivos = request.user_context.hipopresivos
     
     context = {
         'calendar': extended_calendar,
@@ -470,10 +415,7 @@ def exercise_stats(request):
     }
     
     # Obtener el género del usuario
-    try:
-        user_gender = request.user.userprofile.gender
-    except:
-        user_gender = 'F'  # Por defecto usar fórmula de mujer si no tiene género
+    user_gender = request.user_context.gender or 'F'  # Por defecto usar fórmula de mujer si no tiene género
     
     # Calcular métricas para cada medición
     for m in measurements:
@@ -591,18 +533,16 @@ def exercise_stats(request):
     exercises = ExerciseLog.objects.filter(user=request.user).order_by('exercise_date')
     
     # Calcular rachas
-    current_streak = ExerciseLog.get_current_week_streak(request.user)
-    longest_streak = ExerciseLog.get_longest_week_streak(request.user)
+    current_streak, longest_streak = ExerciseLog.get_week_streaks([request.user.pk]).get(request.user.pk, (0, 0))
     
     # Calcular progreso semanal
     today = date.today()
-    week_start = today - timedelta(days=today.weekday())
-    week_end = week_start + timedelta(days=6)
+    current_week_start = week_start(today)
     
     current_week_exercises = ExerciseLog.objects.filter(
         user=request.user,
-        exercise_date__gte=week_start,
-        exercise_date__lte=week_end
+        exercise_date__gte=current_week_start,
+        exercise_date__lte=current_week_start + timedelta(days=6)
     ).count()
     
     weekly_progress = min((current_week_exercises / 5) * 100, 100)
@@ -610,44 +550,19 @@ def exercise_stats(request):
     # Calcular distribución por dificultad del mes actual
     current_month = datetime.now().month
     current_year = datetime.now().year
+    month_exercises = ExerciseLog.get_month_exercises(request.user, current_year, current_month)
     
     difficulty_data = {
-        'facil': ExerciseLog.objects.filter(
-            user=request.user,
-            exercise_date__year=current_year,
-            exercise_date__month=current_month,
-            difficulty='facil'
-        ).count(),
-        'medio': ExerciseLog.objects.filter(
-            user=request.user,
-            exercise_date__year=current_year,
-            exercise_date__month=current_month,
-            difficulty='medio'
-        ).count(),
-        'dificil': ExerciseLog.objects.filter(
-            user=request.user,
-            exercise_date__year=current_year,
-            exercise_date__month=current_month,
-            difficulty='dificil'
-        ).count(),
+        'facil': month_exercises.filter(difficulty='facil').count(),
+        'medio': month_exercises.filter(difficulty='medio').count(),
+        'dificil': month_exercises.filter(difficulty='dificil').count(),
     }
     
     # Calcular progreso mensual
-    total_exercises_this_month = ExerciseLog.objects.filter(
-        user=request.user,
-        exercise_date__year=current_year,
-        exercise_date__month=current_month
-    ).count()
-
-    # Calcular días laborables del mes (lunes a viernes)
-    month_days = calendar.monthrange(current_year, current_month)[1]
-    weekdays_in_month = 0
-    for day in range(1, month_days + 1):
-        if calendar.weekday(current_year, current_month, day) < 5:  # 0-4 = lunes a viernes
-            weekdays_in_month += 1
+    total_exercises_this_month = month_exercises.count()
 
     # Progreso mensual basado en días laborables
-    progress_percentage = min((total_exercises_this_month / weekdays_in_month) * 100, 100) if weekdays_in_month > 0 else 0
+    progress_percentage = monthly_progress(total_exercises_this_month, current_year, current_month)
 
     user_stats = {
         'total_exercises': ExerciseLog.objects.filter(user=request.user).count(),
@@ -729,7 +644,7 @@ def add_body_measurements(request):
             import math
             
             # Obtener género del usuario
-            user_gender = getattr(request.user.userprofile, 'gender', 'M') if hasattr(request.user, 'userprofile') else 'M'
+            user_gender = request.user_context.gender
             
             # Calcular IMC
             height_m = float(measurement.height) / 100
@@ -836,36 +751,28 @@ def calculate_body_fat_us_navy(weight, height, waist, hip, neck, age, gender):
 @login_required
 def food_diary(request, year=None, week=None):
     """Vista de agenda semanal del diario de alimentación"""
-    from datetime import date, timedelta
-    
-    # Obtener año y semana actual si no se especifican
+    # Obtener año y semana ISO actual si no se especifican
     today = date.today()
-    current_year = today.year
-    current_week = FoodDiary.get_current_week_number(today)
+    current_year, current_week = iso_week(today)
+    
+    # Semanas disponibles: máximo 5 semanas (4 anteriores + 1 actual)
+    recent_weeks = recent_iso_weeks(today, 5)
     
     # Usar parámetros o valores por defecto
     selected_year = int(year) if year else current_year
     selected_week = int(week) if week else current_week
     
-    # Validar que solo se puedan ver semanas anteriores o la actual
-    if selected_year > current_year or (selected_year == current_year and selected_week > current_week):
-        selected_year = current_year
-        selected_week = current_week
-    
-    # Validar que solo se puedan ver máximo 5 semanas hacia atrás
-    min_week = max(1, current_week - 4)  # Máximo 5 semanas (4 anteriores + 1 actual)
-    if selected_year == current_year and selected_week < min_week:
-        selected_week = min_week
+    # Validar que solo se puedan ver las semanas disponibles
+    if (selected_year, selected_week) > (current_year, current_week):
+        selected_year, selected_week = current_year, current_week
+    elif (selected_year, selected_week) < recent_weeks[0]:
+        selected_year, selected_week = recent_weeks[0]
     
     # Obtener fechas de inicio y fin de la semana
-    week_start, week_end = FoodDiary.get_week_dates(selected_year, selected_week)
+    week_start, week_end = iso_week_bounds(selected_year, selected_week)
     
     # Obtener todas las entradas de la semana
-    week_entries = FoodDiary.objects.filter(
-        user=request.user,
-        meal_date__gte=week_start,
-        meal_date__lte=week_end
-    ).order_by('meal_date', 'meal_time')
+    week_entries = FoodDiary.get_week_entries(request.user, selected_year, selected_week)
     
     # Organizar entradas por día
     entries_by_day = {}
@@ -878,25 +785,22 @@ def food_diary(request, year=None, week=None):
     # Generar lista de días de la semana
     day_names_es = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
     week_days = []
-    current_date = week_start
-    while current_date <= week_end:
-        weekday_num = current_date.weekday()  # 0=Lunes, 6=Domingo
+    for weekday_num in range(7):  # 0=Lunes, 6=Domingo
+        current_date = week_start + timedelta(days=weekday_num)
         week_days.append({
             'date': current_date,
             'entries': entries_by_day.get(current_date, []),
             'is_today': current_date == today,
             'day_name': day_names_es[weekday_num]
         })
-        current_date += timedelta(days=1)
     
-    # Obtener lista de semanas disponibles (máximo 5 semanas hacia atrás, incluyendo la actual)
+    # Obtener lista de semanas disponibles
     available_weeks = []
-    start_week = max(1, current_week - 4)  # Máximo 5 semanas (4 anteriores + 1 actual)
-    for w in range(start_week, current_week + 1):
-        ws, we = FoodDiary.get_week_dates(current_year, w)
+    for w_year, w in recent_weeks:
+        ws, we = iso_week_bounds(w_year, w)
         available_weeks.append({
             'week': w,
-            'year': current_year,
+            'year': w_year,
             'start': ws,
             'end': we,
             'label': f"Semana {w} ({ws.strftime('%d/%m')} - {we.strftime('%d/%m/%Y')})"
@@ -940,8 +844,8 @@ def add_food_entry(request):
                 entry.save()
                 messages.success(request, 'Comida registrada exitosamente.')
                 # Redirigir a la semana correspondiente
-                week_num = FoodDiary.get_current_week_number(entry.meal_date)
-                return redirect('app:food_diary_week', year=entry.meal_date.year, week=week_num)
+                week_year, week_num = iso_week(entry.meal_date)
+                return redirect('app:food_diary_week', year=week_year, week=week_num)
             except ValidationError as e:
                 for field, errors in e.error_dict.items():
                     for error in errors:
@@ -974,8 +878,8 @@ def edit_food_entry(request, entry_id):
             try:
                 form.save()
                 messages.success(request, 'Comida actualizada exitosamente.')
-                week_num = FoodDiary.get_current_week_number(entry.meal_date)
-                return redirect('app:food_diary_week', year=entry.meal_date.year, week=week_num)
+                week_year, week_num = iso_week(entry.meal_date)
+                return redirect('app:food_diary_week', year=week_year, week=week_num)
             except ValidationError as e:
                 for field, errors in e.error_dict.items():
                     for error in errors:
@@ -994,9 +898,9 @@ def delete_food_entry(request, entry_id):
     """Vista para eliminar una entrada del diario"""
     entry = get_object_or_404(FoodDiary, id=entry_id, user=request.user)
     meal_date = entry.meal_date
-    week_num = FoodDiary.get_current_week_number(meal_date)
+    week_year, week_num = iso_week(meal_date)
     
     entry.delete()
     messages.success(request, 'Comida eliminada exitosamente.')
     
-    return redirect('app:food_diary_week', year=meal_date.year, week=week_num)
\ No newline at end of file
+    return redirect('app:food_diary_week', year=week_year, week=week_num)
\ No newline at end of file
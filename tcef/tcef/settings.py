@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'app.user_context.UserContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,6 +72,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.user_context.user_context',
             ],
         },
     },
@@ -87,6 +89,26 @@ DATABASES = {
 }
 
 
+# Caché compartida (reportes y contadores del panel admin)
+# En producción usar un backend compartido entre workers, p. ej. CACHE_URL=rediscache://127.0.0.1:6379/1
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# True si la caché es compartida entre workers (locmem es una por proceso). Los datos en caché que
+# las señales invalidan solo se guardan con una caché compartida: en otro caso la invalidación
+# llegaría solo al worker que hizo el cambio y los demás servirían datos viejos
+SHARED_CACHE = env.bool('SHARED_CACHE', default=CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+))
+
+# Segundos que se guarda en caché el perfil/membresía/grupo de cada usuario (app.user_context).
+# Las señales lo invalidan solo en el worker que hizo el cambio si la caché no es compartida,
+# así que sin CACHE_URL por defecto no se guarda (0)
+USER_CONTEXT_CACHE_TIMEOUT = env.int('USER_CONTEXT_CACHE_TIMEOUT', default=60 * 30 if env('CACHE_URL', default='') else 0)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -152,7 +174,13 @@ EMAIL_HOST_PASSWORD = ''
 DEFAULT_FROM_EMAIL = 'noreply@tcef.com'
 
 # Configuración de mensajes
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# MESSAGE_STORE: 'fallback' (cookie y, si no cabe, sesión), 'cookie' o 'session'.
+# Con 'session' cada mensaje agrega y luego borra datos de la sesión (dos escrituras por redirect)
+MESSAGE_STORAGE = {
+    'fallback': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'cookie': 'django.contrib.messages.storage.cookie.CookieStorage',
+    'session': 'django.contrib.messages.storage.session.SessionStorage',
+}[env('MESSAGE_STORE', default='fallback')]
 
 # Configuración de login/logout
 LOGIN_URL = '/login/'
@@ -163,7 +191,21 @@ LOGOUT_REDIRECT_URL = '/'
 LANGUAGE_CODE = 'es-es'
 TIME_ZONE = 'America/Mexico_City'
 
+# Rango de años (inclusive) de la tabla precalculada de app.calendar_utils
+CALENDAR_TABLE_YEARS = (2020, 2040)
+
+# Antigüedad (días) a partir de la cual archive_food_diary comprime el diario de alimentación
+FOOD_DIARY_ARCHIVE_DAYS = 180
+
 # Configuración de sesiones
+# SESSION_STORE: 'db', 'cached_db' (lee de la caché, requiere un CACHE_URL compartido entre
+# workers) o 'signed_cookies' (la sesión viaja firmada en la cookie, sin escrituras en la base).
+# Ver el comando benchmark_session_writes para comparar las escrituras por petición.
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[env('SESSION_STORE', default='cached_db' if env('CACHE_URL', default='') else 'db')]
 SESSION_COOKIE_AGE = 3600  # 1 hora
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
@@ -179,10 +221,18 @@ AWS_S3_OBJECT_PARAMETERS = {
 AWS_DEFAULT_ACL = 'public-read'
 AWS_QUERYSTRING_AUTH = False
 
+# Límite de intentos de login fallidos (app.throttling): por IP y por cuenta en una ventana deslizante
+LOGIN_THROTTLE_WINDOW = env.int('LOGIN_THROTTLE_WINDOW', default=300)  # segundos
+LOGIN_THROTTLE_IP_LIMIT = env.int('LOGIN_THROTTLE_IP_LIMIT', default=20)
+LOGIN_THROTTLE_ACCOUNT_LIMIT = env.int('LOGIN_THROTTLE_ACCOUNT_LIMIT', default=5)
+# Header con la IP real del cliente detrás de nginx, p. ej. 'HTTP_X_REAL_IP' (None: REMOTE_ADDR).
+# Con HTTP_X_FORWARDED_FOR se usa la última entrada, la que agrega el proxy
+LOGIN_THROTTLE_IP_HEADER = env('LOGIN_THROTTLE_IP_HEADER', default=None)
+
 # Backend de autenticación personalizado
+# (ya cubre el username exacto; un ModelBackend de respaldo repetiría la búsqueda en cada login fallido)
 AUTHENTICATION_BACKENDS = [
     'app.backends.EmailOrUsernameModelBackend',
-    'django.contrib.auth.backends.ModelBackend',  # Mantener el backend por defecto como fallback
 ]
 
 # Configuración de manejo de errores (solo para producción)